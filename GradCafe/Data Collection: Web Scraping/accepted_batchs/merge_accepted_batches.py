@@ -1,37 +1,31 @@
-import glob
-import csv
+# merge_accepted_batches.py
+
+"""
+accepted_batch_*.csv -> accepted_full.csv
+
+The merge now lives in ../merge_gradcafe.py (byte-range copy, duplicate
+entries dropped); this script is kept so the old step still works from this folder.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from merge_gradcafe import batch_files, merge_files  # noqa: E402
+
 
 def merge_batches(
     pattern="accepted_batch_*.csv",
     output_path="accepted_full.csv"
 ):
-    files = sorted(glob.glob(pattern))
+    files = batch_files(pattern)
     print("Bulunan dosyalar:")
     for f in files:
         print(" -", f)
-
-    first = True
-    with open(output_path, "w", newline="", encoding="utf-8") as out_f:
-        writer = None
-
-        for file in files:
-            with open(file, "r", encoding="utf-8") as in_f:
-                reader = csv.reader(in_f)
-                header = next(reader, None)
-
-                # İlk dosyada header yaz, diğerlerinde atla
-                if first:
-                    writer = csv.writer(out_f)
-                    if header:
-                        writer.writerow(header)
-                    first = False
-
-                for row in reader:
-                    if row:   # boş satırları at
-                        writer.writerow(row)
-
+    merge_files(files, output_path, kind="raw")
     print(f"Bitti! Çıktı: {output_path}")
 
+
 if __name__ == "__main__":
     merge_batches()
-
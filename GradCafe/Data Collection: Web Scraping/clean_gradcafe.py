@@ -0,0 +1,483 @@
+# clean_gradcafe.py
+
+"""
+Streaming raw -> clean parser for both GradCafe decisions.
+
+Replaces the list-based clean_accepted.py / clean_rejected.py: the raw CSV is
+read row by row with a one-row lookahead (entry row -> its meta block on the
+next row), every entry becomes a typed CleanRecord, and records are written in
+chunks of CHUNK_ROWS. Memory stays flat no matter how many batches
+accepted_full.csv / rejected_full.csv accumulate. The decision is read from
+the entry row itself, so one parser handles both files (and mixed files).
+The rows sync_gradcafe.py appended (accepted_sync.csv / rejected_sync.csv)
+are cleaned after them, so a rebuild keeps the synced entries.
+
+Output columns and values are the same as the old scripts wrote.
+
+Meta blocks are tokenized by one compiled regex (META_TOKEN); fields that
+cannot be read are counted per PARSE_ERRORS key instead of being dropped
+silently.
+
+Benchmarks:
+    python clean_gradcafe.py --bench 10000000   # streaming, synthetic 10M-row raw file
+    python clean_gradcafe.py --bench-meta       # tokenizer vs the old parser, saved batches
+"""
+
+import argparse
+import csv
+import random
+import re
+import resource
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
+# =========================
+# CONFIG
+# =========================
+HERE = Path(__file__).resolve().parent
+# raw inputs in order: the merged batches, then the entries sync_gradcafe.py appended since
+JOBS = [
+    ([HERE / "accepted_batchs" / "accepted_full.csv", HERE / "accepted_batchs" / "accepted_sync.csv"],
+     HERE / "accepted_batchs" / "gradcafe_accepted_clean.csv"),
+    ([HERE / "rejected_batchs" / "rejected_full.csv", HERE / "rejected_batchs" / "rejected_sync.csv"],
+     HERE / "rejected_batchs" / "gradcafe_rejected_clean.csv"),
+]
+CHUNK_ROWS = 50_000
+BENCH_PATH = Path("/tmp/gradcafe_bench_raw.csv")
+BENCH_SEED = 42
+BATCH_GLOB = "*_batchs/*_batch_*.csv"
+META_BENCH_REPEATS = 20
+META_CHECK_VARIANTS = 20_000
+
+CLEAN_COLUMNS = ["university", "program", "decision", "term", "citizenship",
+                 "gpa_raw", "gre_total", "gre_q", "gre_v", "gre_aw"]
+
+# fields parse_meta_block could not read (counted, not raised: the values stay raw / None)
+PARSE_ERRORS = (
+    "no_meta_block",            # entry without a meta row after it
+    "unrecognized_line",        # meta line that is none of term / citizenship / GPA / GRE
+    "extra_term",               # second term line (the first one is kept)
+    "gpa_not_numeric",          # GPA kept as raw text
+    "gre_total_not_numeric",    # "GRE <x>" with a non-number: gre_total stays None
+    "gre_section_not_numeric",  # Q / V / AW kept as raw text
+    "gre_unknown_section",      # "GRE <tag> <x>" with a tag other than Q / V / AW: dropped
+    "gre_empty",                # bare "GRE"
+)
+
+Score = Union[float, str, None]
+
+
+class CleanRecord(NamedTuple):
+    university: str
+    program: str
+    decision: str
+    term: Optional[str]
+    citizenship: Optional[str]
+    gpa_raw: Optional[str]      # raw text, e.g. "3.80" (range checks happen in preprocessing)
+    gre_total: Optional[float]
+    gre_q: Score                # float, or the raw text when it is not a number
+    gre_v: Score
+    gre_aw: Score
+
+
+# every line boundary str.splitlines() knows (the old parser split on these);
+# _SP is whitespace that is none of them, so a block using any other break never fullmatches
+LINE_BREAKS = re.compile(r"\r\n|[\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]")
+_SP = r"[^\S\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]"
+
+# fast path: the layout GradCafe renders (term, citizenship, GRE total / Q / V / AW, GPA,
+# each optional, in this order, numbers only) is read by a single fullmatch of the cell
+_NUM = r"(\d+(?:\.\d+)?)"
+_EOL = r"(?:\n|\Z)"
+META_BLOCK = re.compile(
+    r"(?:([FSW]\d{2}|(?:Fall|Spring|Summer|Winter)" + _SP + r"+\d{4})" + _EOL + ")?"
+    r"(?:(International|American)" + _EOL + ")?"
+    r"(?:GRE" + _SP + "+" + _NUM + _EOL + ")?"
+    r"(?:GRE" + _SP + "+Q" + _SP + "+" + _NUM + _EOL + ")?"
+    r"(?:GRE" + _SP + "+V" + _SP + "+" + _NUM + _EOL + ")?"
+    r"(?:GRE" + _SP + "+AW" + _SP + "+" + _NUM + _EOL + ")?"
+    r"(?:GPA" + _SP + "+" + _NUM + _EOL + ")?"
+)
+
+# anything else: one match per line, after LINE_BREAKS became "\n"
+# (term, citizenship, GPA line, GRE line, anything else) — exactly one group is non-empty
+META_TOKEN = re.compile(
+    r"^[^\S\n]*(?:"
+    r"([FSW]\d{2}|(?:Fall|Spring|Summer|Winter)[^\S\n]+\d{4})[^\S\n]*$"
+    r"|(International|American)[^\S\n]*$"
+    r"|(GPA[^\n]*)"
+    r"|(GRE[^\n]*)"
+    r"|([^\n]*))",
+    re.M,
+)
+
+GRE_SECTIONS = {"Q": 4, "V": 5, "AW": 6}  # position in the parse_meta_block tuple
+
+
+def parse_meta_block(meta_text: str, errors: Optional[Counter] = None):
+    """
+    Tek hücre içindeki multi-line metinden:
+    - term
+    - citizenship
+    - gpa_raw
+    - GRE total / Q / V / AW
+    ham şekilde ayırır — hiçbir düzeltme yapmaz.
+
+    Normal düzendeki hücreler tek bir META_BLOCK eşleşmesiyle okunur; diğerleri
+    META_TOKEN ile satır satır. Okunamayan / sayı olmayan alanlar sessizce
+    yutulmaz: `errors` verilirse PARSE_ERRORS anahtarlarıyla sayılır.
+    Diğer satır sonları ("\r", "\u2028", ...) hızlı yolda eşleşmez; satır satır
+    okumadan önce "\n" yapılır, splitlines() gibi.
+    """
+    m = META_BLOCK.fullmatch(meta_text)
+    if m is not None:
+        term, citizenship, total, q, v, aw, gpa = m.groups()
+        return (term, citizenship, gpa,
+                None if total is None else float(total),
+                None if q is None else float(q),
+                None if v is None else float(v),
+                None if aw is None else float(aw))
+
+    out = [None] * 7  # term, citizenship, gpa_raw, gre_total, gre_q, gre_v, gre_aw
+    for term, citizenship, gpa, gre, other in META_TOKEN.findall(LINE_BREAKS.sub("\n", meta_text)):
+        if term:
+            if out[0] is None:
+                out[0] = term   # ilk term kazanır
+            elif errors is not None:
+                errors["extra_term"] += 1
+        elif citizenship:
+            out[1] = citizenship
+        elif gpa:
+            out[2] = gpa = gpa.replace("GPA", "").strip()
+            if errors is not None:
+                try:
+                    float(gpa)
+                except ValueError:
+                    errors["gpa_not_numeric"] += 1
+        elif gre:
+            parts = gre.split()
+            if len(parts) == 2:
+                # Total GRE (Örn: "GRE 324")
+                try:
+                    out[3] = float(parts[1])
+                except ValueError:
+                    if errors is not None:
+                        errors["gre_total_not_numeric"] += 1
+            elif len(parts) >= 3:
+                # GRE Q / V / AW — sayı değilse ham olarak bırak
+                pos = GRE_SECTIONS.get(parts[1])
+                try:
+                    score = float(parts[2])
+                except ValueError:
+                    score = parts[2]
+                    if errors is not None and pos is not None:
+                        errors["gre_section_not_numeric"] += 1
+                if pos is not None:
+                    out[pos] = score
+                elif errors is not None:
+                    errors["gre_unknown_section"] += 1
+            elif errors is not None:
+                errors["gre_empty"] += 1
+        elif errors is not None and other.strip():
+            errors["unrecognized_line"] += 1
+    return tuple(out)
+
+
+def is_entry_row(row: list) -> bool:
+    return len(row) >= 4 and (row[3].startswith("Accepted on") or row[3].startswith("Rejected on"))
+
+
+def entry_record(row: list, meta_row: Optional[list], errors: Optional[Counter] = None) -> CleanRecord:
+    """One entry row + the row right after it (None at end of file)."""
+    meta = (None,) * 7
+    if meta_row and meta_row[0].strip():
+        meta = parse_meta_block(meta_row[0], errors)
+    elif errors is not None:
+        errors["no_meta_block"] += 1
+    decision = "Accepted" if "Accepted on" in row[3] else "Rejected"
+    return CleanRecord(row[0].strip(), row[1].strip(), decision, *meta)
+
+
+def iter_entries(rows: Iterable[list]) -> Iterator[tuple]:
+    """
+    Single pass with a one-row lookahead: (entry row, the row after it or None).
+    The row after an entry is always handed to it as the meta block (as the
+    old scripts did with rows[i + 1]), and is still checked for being an entry itself.
+    """
+    pending = None
+    for row in rows:
+        if pending is not None:
+            yield pending, row
+            pending = None
+        if is_entry_row(row):
+            pending = row
+    if pending is not None:
+        yield pending, None
+
+
+def iter_records(rows: Iterable[list], errors: Optional[Counter] = None) -> Iterator[CleanRecord]:
+    """One CleanRecord per entry of iter_entries(rows)."""
+    for row, meta_row in iter_entries(rows):
+        yield entry_record(row, meta_row, errors)
+
+
+def _entry_key(row: list, meta_row: Optional[list]) -> tuple:
+    # entry row + meta row, as sync_gradcafe.fingerprint: comment rows can be edited later
+    return tuple(row), tuple(meta_row or ())
+
+
+def clean_file(input_paths, output_path, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Streams one raw file, or several in order (missing later ones are skipped),
+    into output_path; returns the files read, row / entry counts per decision + parse errors.
+    An entry of a later file that an earlier file already holds (a synced
+    entry that a scrape fetched again) is counted as "repeated" and skipped.
+    """
+    paths = [input_paths] if isinstance(input_paths, (str, Path)) else list(input_paths)
+    paths = paths[:1] + [p for p in paths[1:] if Path(p).exists()]
+    stats = {"inputs": [Path(p).name for p in paths], "raw_rows": 0, "Accepted": 0, "Rejected": 0,
+             "repeated": 0, "parse_errors": Counter()}
+
+    # keys of the later (delta) files only, so memory stays flat on the big first one
+    delta_keys = set()
+    for path in paths[1:]:
+        with open(path, newline="", encoding="utf-8") as f:
+            delta_keys.update(_entry_key(r, m) for r, m in iter_entries(csv.reader(f)))
+    seen = set()
+
+    def counted(reader):
+        for row in reader:
+            stats["raw_rows"] += 1
+            yield row
+
+    with open(output_path, "w", newline="", encoding="utf-8") as f_out:
+        writer = csv.writer(f_out)
+        writer.writerow(CLEAN_COLUMNS)
+        chunk = []
+        for i, path in enumerate(paths):
+            with open(path, newline="", encoding="utf-8") as f_in:
+                for row, meta_row in iter_entries(counted(csv.reader(f_in))):
+                    if delta_keys:
+                        key = _entry_key(row, meta_row)
+                        if i and key in seen:
+                            stats["repeated"] += 1
+                            continue
+                        if key in delta_keys:
+                            seen.add(key)
+                    rec = entry_record(row, meta_row, stats["parse_errors"])
+                    stats[rec.decision] += 1
+                    chunk.append(rec)
+                    if len(chunk) >= chunk_rows:
+                        writer.writerows(chunk)
+                        chunk.clear()
+        writer.writerows(chunk)
+    return stats
+
+
+# =========================
+# benchmark
+# =========================
+def _parse_meta_block_lines(meta_text: str):
+    """
+    Eski satır satır parser (re.match + startswith + float denemeleri).
+    Sadece --bench-meta eşdeğerlik kontrolü ve hız karşılaştırması için duruyor.
+    """
+    term = None
+    citizenship = None
+    gpa_raw = None
+    gre_total = None
+    gre_q = None
+    gre_v = None
+    gre_aw = None
+
+    lines = [l.strip() for l in meta_text.splitlines() if l.strip()]
+
+    for line in lines:
+
+        # TERM — F19, S20 ya da Fall 2025
+        if term is None:
+            if re.match(r'^[FSW]\d{2}$', line):
+                term = line
+                continue
+            if re.match(r'^(Fall|Spring|Summer|Winter)\s+\d{4}$', line):
+                term = line
+                continue
+
+        # CITIZENSHIP
+        if line in ("International", "American"):
+            citizenship = line
+            continue
+
+        # GPA — Ham bırak
+        if line.startswith("GPA"):
+            gpa_raw = line.replace("GPA", "").strip()
+            continue
+
+        # GRE ham ayrıştırma
+        if line.startswith("GRE"):
+            parts = line.split()
+
+            # Total GRE (Örn: "GRE 324")
+            if len(parts) == 2:
+                try:
+                    gre_total = float(parts[1])
+                except ValueError:
+                    pass
+
+            # GRE Q / V / AW
+            elif len(parts) >= 3:
+                tag = parts[1]
+                val = parts[2]
+
+                try:
+                    score = float(val)
+                except ValueError:
+                    score = val  # sayı değilse bile ham olarak bırak
+
+                if tag == "Q":
+                    gre_q = score
+                elif tag == "V":
+                    gre_v = score
+                elif tag == "AW":
+                    gre_aw = score
+
+    return term, citizenship, gpa_raw, gre_total, gre_q, gre_v, gre_aw
+
+
+def load_meta_cells(pattern: str = BATCH_GLOB) -> list:
+    """Meta-block texts of every entry in the saved batch CSVs."""
+    cells = []
+    for path in sorted(HERE.glob(pattern)):
+        with open(path, newline="", encoding="utf-8") as f:
+            prev = None
+            for row in csv.reader(f):
+                if prev is not None and is_entry_row(prev) and row and row[0].strip():
+                    cells.append(row[0])
+                prev = row
+    return cells
+
+
+def off_layout_variants(cells: list, n: int, seed: int = BENCH_SEED) -> list:
+    """Saved blocks with shuffled lines, padding, CRLF / lone CR / U+2028 breaks and junk lines (META_TOKEN path)."""
+    junk = ["GRE", "GRE Q abc", "GRE X 3", "GRE 3 4", "GREAT 5", "GPA n/a", "GPA", "GPA 3.5 GPA",
+            "F20", "Fall 2021", "Winter   2020", " American ", "Foo bar", "\t"]
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        lines = rng.choice(cells).split("\n")
+        if rng.random() < 0.3:
+            rng.shuffle(lines)
+        if rng.random() < 0.5:
+            lines.insert(rng.randrange(len(lines) + 1), rng.choice(junk))
+        if rng.random() < 0.3:
+            lines = [" " * rng.randrange(3) + line + " " * rng.randrange(3) for line in lines]
+        out.append(rng.choice(["\n", "\r\n", "\n\n", "\r", "\u2028", "\x0b\x85"]).join(lines))
+    return out
+
+
+def bench_meta(repeats: int = META_BENCH_REPEATS):
+    """Compiled tokenizer vs the old line-by-line parser on the saved batches (same output required)."""
+    cells = load_meta_cells()
+    for name, blocks in [("saved", cells), ("off-layout", off_layout_variants(cells, META_CHECK_VARIANTS))]:
+        mismatches = sum(parse_meta_block(c) != _parse_meta_block_lines(c) for c in blocks)
+        if mismatches:
+            raise AssertionError(f"{mismatches} of {len(blocks)} {name} meta blocks parse differently")
+
+    timings = {}
+    for name, fn in [("line-by-line", _parse_meta_block_lines), ("compiled", parse_meta_block)]:
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            for c in cells:
+                fn(c)
+        timings[name] = (time.perf_counter() - t0) / (repeats * len(cells))
+    errors = Counter()
+    for c in cells:
+        parse_meta_block(c, errors)
+
+    print(f"[OK] {len(cells)} meta blocks from the saved batches (+{META_CHECK_VARIANTS} off-layout variants) "
+          f"parse identically")
+    for name, dt in timings.items():
+        print(f"[OK] {name:<13} {dt * 1e6:6.2f} µs/block | {1 / dt:,.0f} blocks/s")
+    print(f"[OK] Speedup: {timings['line-by-line'] / timings['compiled']:.2f}x | "
+          f"parse errors: {dict(errors) or 'none'}")
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def make_synthetic(path: Path, n_rows: int, seed: int = BENCH_SEED) -> int:
+    """Raw file of ~n_rows rows built by resampling the saved entries (entry + meta + comment rows)."""
+    entries = []
+    for (raw, *_), _ in JOBS:
+        with open(raw, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if is_entry_row(row):
+                    entries.append([row])
+                elif entries:
+                    entries[-1].append(row)
+    rng = random.Random(seed)
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        while written < n_rows:
+            block = [rng.choice(entries) for _ in range(10_000)]
+            rows = [r for e in block for r in e]
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+
+def bench(n_rows: int, path: Path = BENCH_PATH):
+    t0 = time.perf_counter()
+    make_synthetic(path, n_rows)
+    size_mb = path.stat().st_size / 1024 ** 2
+    print(f"[INFO] Synthetic raw file: {path} ({size_mb:,.0f} MB) built in {time.perf_counter() - t0:.1f}s")
+
+    out = path.with_name(path.stem + "_clean.csv")
+    rss_before = _peak_rss_mb()
+    t0 = time.perf_counter()
+    stats = clean_file(path, out)
+    dt = time.perf_counter() - t0
+    n_entries = stats["Accepted"] + stats["Rejected"]
+    print(f"[OK] Streamed {stats['raw_rows']:,} raw rows -> {n_entries:,} records in {dt:.1f}s | "
+          f"{stats['raw_rows'] / dt:,.0f} rows/s, {size_mb / dt:.1f} MB/s | "
+          f"peak RSS {_peak_rss_mb():.0f} MB (+{_peak_rss_mb() - rss_before:.0f} MB while parsing)")
+    path.unlink()
+    out.unlink()
+
+
+def main(jobs=JOBS, chunk_rows: int = CHUNK_ROWS):
+    for input_paths, output_path in jobs:
+        stats = clean_file(input_paths, output_path, chunk_rows)
+        print(f"[OK] {' + '.join(stats['inputs'])}: {stats['raw_rows']} raw rows -> "
+              f"Accepted={stats['Accepted']} Rejected={stats['Rejected']} | written to: {output_path}")
+        if stats["repeated"]:
+            print(f"[INFO] {stats['repeated']} synced entries already in {stats['inputs'][0]} were skipped")
+        if stats["parse_errors"]:
+            print(f"[WARN] Parse errors: {dict(stats['parse_errors'])}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Raw GradCafe CSVs -> clean CSVs (both decisions, streaming).")
+    ap.add_argument("--input", help="clean one raw file instead of accepted_full.csv + rejected_full.csv")
+    ap.add_argument("--output", help="output path for --input")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--bench", type=int, metavar="N_ROWS", help="benchmark on a synthetic raw file of N_ROWS rows")
+    ap.add_argument("--bench-meta", action="store_true",
+                    help="compare parse_meta_block with the old line-by-line parser on the saved batches")
+    args = ap.parse_args()
+
+    if args.bench_meta:
+        bench_meta()
+    elif args.bench:
+        bench(args.bench)
+    elif args.input:
+        main([(args.input, args.output or Path(args.input).with_name(Path(args.input).stem + "_clean.csv"))],
+             args.chunk_rows)
+    else:
+        main(chunk_rows=args.chunk_rows)
@@ -0,0 +1,314 @@
+# gradcafe_standin.py
+
+"""
+Local stand-in for thegradcafe.com/survey to test and benchmark
+scrape_gradcafe.py offline.
+
+Fixture pages are rendered from the raw batch CSVs we already scraped (20
+entries per page, GradCafe-like markup with nested divs, an svg, a script),
+saved as fixtures/<Decision>_<page>.html, and served by a local HTTP server
+that answers the same ?decision=...&page=... URLs. Saved real pages can be
+dropped into the same folder. The server can add per-request latency and
+answer some first requests with 429, so concurrency and retries are exercised.
+
+Running this file scrapes the fixtures twice (one page at a time like the
+old loop, then concurrently), checks the parsed rows equal the source rows,
+and prints pages/sec for both. It then checks checkpointing: a run killed
+halfway, a torn last line, a resume that only fetches the missing pages, and
+a --refresh that rewrites only the page whose fixture changed. Last, the
+incremental sync (sync_gradcafe.py): after N new entries are posted it must
+pick up exactly those N from the first pages, and nothing on a second run.
+"""
+
+import argparse
+import asyncio
+import csv
+import glob
+import html
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import scrape_gradcafe as sg
+
+# =========================
+# CONFIG
+# =========================
+BATCH_PATTERNS = {
+    "Accepted": "accepted_batchs/accepted_batch_*.csv",
+    "Rejected": "rejected_batchs/rejected_batch_*.csv",
+}
+ENTRIES_PER_PAGE = 20
+N_PAGES = 100          # per decision
+LATENCY_MS = 50        # simulated server/network time per page
+THROTTLE_EVERY = 10    # every n-th page answers 429 on its first request (0 = never)
+SYNC_NEW_ENTRIES = 25  # entries "posted" between the full scrape and the sync check
+
+
+# =========================
+# fixtures
+# =========================
+def load_entries(pattern: str) -> list:
+    """Raw rows grouped per entry (the 5-cell row + its meta/comment rows)."""
+    entries = []
+    # accepted_batch_2_51-100.csv -> 2; numeric order, newest pages first
+    for path in sorted(glob.glob(pattern), key=lambda p: int(Path(p).stem.split("_")[2])):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.reader(f):
+                if not row:
+                    continue
+                if len(row) >= 4 or not entries:
+                    entries.append([row])
+                else:
+                    entries[-1].append(row)
+    return entries
+
+
+def _cell_html(text: str) -> str:
+    lines = text.split("\n")
+    if len(lines) == 1:
+        return f"<td class=\"tw-px-3 tw-py-5\">\n  {html.escape(text)}\n</td>"
+    inner = "".join(f"<div class=\"tw-inline-flex\"><span>{html.escape(l)}</span></div>" for l in lines)
+    return f"<td class=\"tw-px-3\"><div class=\"tw-flex tw-gap-2\">{inner}</div></td>"
+
+
+def render_page(entries: list) -> str:
+    body = []
+    for entry in entries:
+        for row in entry:
+            cells = "".join(_cell_html(c) for c in row)
+            body.append(f"<tr class=\"tw-border-none\">{cells}</tr>")
+    return (
+        "<!DOCTYPE html><html><head><title>GradCafe survey</title>"
+        "<script>window.__data = {\"rows\": \"<td>not a row</td>\"};</script></head><body>"
+        "<div class=\"tw-overflow-x-auto\"><table class=\"tw-min-w-full tw-divide-y\">"
+        "<thead><tr><th>Institution</th><th>Program</th><th>Added On</th><th>Decision</th><th></th></tr></thead>"
+        f"<tbody>{''.join(body)}</tbody></table></div>"
+        "<svg viewBox=\"0 0 20 20\"><path d=\"M0 0h20\"/></svg></body></html>"
+    )
+
+
+def build_fixtures(out_dir, n_pages=N_PAGES, per_page=ENTRIES_PER_PAGE, skip=0) -> dict:
+    """
+    Writes fixture pages; returns {decision: {page: expected rows}}.
+    skip drops the newest entries, i.e. the site as it looked before they were posted.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    expected = {}
+    for decision, pattern in BATCH_PATTERNS.items():
+        entries = load_entries(pattern)[skip:]
+        expected[decision] = {}
+        for page in range(1, n_pages + 1):
+            chunk = entries[(page - 1) * per_page: page * per_page]
+            if not chunk:
+                break
+            (out_dir / f"{decision}_{page}.html").write_text(render_page(chunk), encoding="utf-8")
+            expected[decision][page] = [row for entry in chunk for row in entry]
+    return expected
+
+
+# =========================
+# server
+# =========================
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # clients that go away mid-response (the killed run in check_resume) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def make_server(fixtures_dir, port=0, latency_ms=LATENCY_MS, throttle_every=THROTTLE_EVERY):
+    fixtures_dir = Path(fixtures_dir)
+    seen = set()
+    lock = threading.Lock()
+    empty = render_page([])
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            qs = parse_qs(url.query, keep_blank_values=True)
+            decision = qs.get("decision", [""])[0]
+            page = int(qs.get("page", ["1"])[0] or 1)
+            time.sleep(latency_ms / 1000)
+
+            if throttle_every and page % throttle_every == 0:
+                with lock:
+                    first = (decision, page) not in seen
+                    seen.add((decision, page))
+                if first:
+                    return self._send(429, b"slow down", {"Retry-After": "0"})
+
+            path = fixtures_dir / f"{decision}_{page}.html"
+            body = path.read_text(encoding="utf-8") if path.exists() else empty  # past the last page
+            self._send(200, body.encode("utf-8"), {"Content-Type": "text/html; charset=utf-8"})
+
+        def _send(self, status, body, headers):
+            self.send_response(status)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = _Server(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# =========================
+# check + benchmark
+# =========================
+def run(fixtures_dir=None, n_pages=N_PAGES, concurrency=sg.CONCURRENCY, latency_ms=LATENCY_MS):
+    tmp = None
+    if fixtures_dir is None:
+        tmp = tempfile.TemporaryDirectory()
+        fixtures_dir = tmp.name
+    expected = build_fixtures(fixtures_dir, n_pages)
+    last_page = min(len(p) for p in expected.values())
+
+    server = make_server(fixtures_dir, latency_ms=latency_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/survey/"
+    print(f"[INFO] Stand-in server at {base_url} | {last_page} pages per decision | latency {latency_ms} ms")
+
+    for label, conc in [("sequential", 1), (f"concurrent (c={concurrency})", concurrency)]:
+        results, stats = asyncio.run(sg.scrape(
+            sg.DECISIONS, 1, last_page, base_url, concurrency=conc, rate=0, burst=1, browser_fallback=False,
+        ))
+        for decision in sg.DECISIONS:
+            for page in range(1, last_page + 1):
+                if results[decision].get(page) != expected[decision][page]:
+                    raise AssertionError(f"{label}: parsed rows differ from fixture on {decision} page {page}")
+        print(f"[OK] {label:<20} {stats['pages']} pages, {stats['rows']} rows in {stats['seconds']:.2f}s "
+              f"→ {stats['pages_per_sec']:.1f} pages/sec (rows match fixtures)")
+
+    check_resume(fixtures_dir, base_url, expected, last_page, concurrency)
+    server.shutdown()
+
+    check_sync(Path(fixtures_dir) / "sync", n_pages, latency_ms)
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+def check_resume(fixtures_dir, base_url, expected, last_page, concurrency):
+    store_dir = Path(fixtures_dir) / "store"
+    total = len(sg.DECISIONS) * last_page
+
+    def scrape(store, refresh=False, kill_after=None):
+        coro = sg.scrape(sg.DECISIONS, 1, last_page, base_url, concurrency=concurrency, rate=0, burst=1,
+                         browser_fallback=False, store=store, refresh=refresh)
+        if kill_after is None:
+            return asyncio.run(coro)[1]
+        try:
+            asyncio.run(asyncio.wait_for(coro, kill_after))
+        except asyncio.TimeoutError:
+            pass
+
+    # 1) crash partway, plus a half-written line in both files
+    store = sg.PageStore(store_dir)
+    scrape(store, kill_after=0.5)
+    stored = len(store.manifest)
+    store.close()
+    for name in ("pages.jsonl", "manifest.csv"):
+        with open(store_dir / name, "a", encoding="utf-8") as f:
+            f.write('{"decision": "Accepted", "page": 1, "ha' if name.endswith("jsonl") else "Accepted,1,")
+
+    # 2) restart: only the missing pages are fetched
+    store = sg.PageStore(store_dir)
+    stats = scrape(store)
+    if stats["skipped"] != stored or stats["pages"] != total - stored:
+        raise AssertionError(f"resume fetched {stats['pages']} pages, expected {total - stored}")
+    for decision in sg.DECISIONS:
+        if store.pages(decision) != expected[decision]:
+            raise AssertionError(f"store content differs from fixtures for {decision}")
+    store.close()
+    print(f"[OK] resume: {stored}/{total} pages stored before the crash, restart fetched {stats['pages']}, "
+          f"store matches fixtures")
+
+    # 3) one page changes upstream -> refresh rewrites only that page
+    changed = Path(fixtures_dir) / "Accepted_2.html"
+    changed.write_text(render_page(load_entries(BATCH_PATTERNS["Accepted"])[:5]), encoding="utf-8")
+    store = sg.PageStore(store_dir)
+    stats = scrape(store, refresh=True)
+    store.close()
+    if stats["changed"] != 1 or stats["unchanged"] != total - 1:
+        raise AssertionError(f"refresh: changed={stats['changed']} unchanged={stats['unchanged']}")
+    print(f"[OK] refresh: {stats['pages']} pages re-fetched, changed={stats['changed']} "
+          f"unchanged={stats['unchanged']}")
+
+
+def check_sync(work_dir, n_pages=N_PAGES, latency_ms=LATENCY_MS, n_new=SYNC_NEW_ENTRIES):
+    import shutil
+    import sync_gradcafe as sync
+
+    work_dir = Path(work_dir)
+    paths = sync.default_paths(work_dir)
+    paths["qs"].parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy(sync.default_paths()["qs"], paths["qs"])
+
+    # already ingested: the site before the newest n_new entries were posted
+    old = build_fixtures(work_dir / "old_site", n_pages, skip=n_new)
+    for decision, pages in old.items():
+        sg.write_raw_csv(pages, paths["raw_full"][decision])
+
+    new_site = work_dir / "new_site"
+    build_fixtures(new_site, n_pages)
+    server = make_server(new_site, latency_ms=latency_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/survey/"
+    try:
+        t0 = time.perf_counter()
+        first = sync.sync(base_url, sg.DECISIONS, paths, rate=0, browser_fallback=False)
+        first_s = time.perf_counter() - t0
+        second = sync.sync(base_url, sg.DECISIONS, paths, rate=0, browser_fallback=False)
+    finally:
+        server.shutdown()
+
+    for d in sg.DECISIONS:
+        # a new post identical to an older one cannot be told apart, so it is not expected
+        old_fps = {sync.fingerprint(e) for e in sync.group_entries([r for p in old[d].values() for r in p])}
+        want = sum(sync.fingerprint(e) not in old_fps for e in load_entries(BATCH_PATTERNS[d])[:n_new])
+        if first[d]["new_entries"] != want or second[d]["new_entries"] != 0:
+            raise AssertionError(f"sync {d}: {first[d]['new_entries']} then {second[d]['new_entries']} new entries, "
+                                 f"expected {want} then 0")
+    pages = sum(first[d]["pages"] for d in sg.DECISIONS)
+    print(f"[OK] sync: {n_new} posted per decision, found {first['Accepted']['new_entries']} + "
+          f"{first['Rejected']['new_entries']} new in {pages} pages ({first_s:.2f}s, "
+          f"vs {2 * n_pages} for a full walk); second sync found 0 in "
+          f"{sum(second[d]['pages'] for d in sg.DECISIONS)} pages | appended {first['appended']}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Offline check + pages/sec benchmark for scrape_gradcafe.py.")
+    ap.add_argument("--fixtures", default=None, help="folder to write/keep fixture pages (default: temp dir)")
+    ap.add_argument("--pages", type=int, default=N_PAGES, help="pages per decision")
+    ap.add_argument("--concurrency", type=int, default=sg.CONCURRENCY)
+    ap.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    ap.add_argument("--serve", action="store_true", help="only serve the fixtures until Ctrl+C")
+    args = ap.parse_args()
+
+    if args.serve:
+        folder = Path(args.fixtures or "fixtures")
+        if not any(folder.glob("*.html")):  # keep saved pages if there are any
+            build_fixtures(folder, args.pages)
+        srv = make_server(folder, port=8765, latency_ms=args.latency_ms)
+        print(f"[OK] Serving {folder} at http://127.0.0.1:8765/survey/ (Ctrl+C to stop)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            srv.shutdown()
+    else:
+        run(args.fixtures, args.pages, args.concurrency, args.latency_ms)
+
@@ -0,0 +1,251 @@
+# merge_gradcafe.py
+
+"""
+One merge tool for the GradCafe CSVs, replacing merge_accepted_batches.py,
+merge_rejected_batches.py (+ its copy in scrape_rejected.py) and
+merge_clean_accepted_rejected.py.
+
+Nothing is rewritten through csv.writer. Each input is read once (one file in
+memory at a time), entry
+rows are found by one compiled regex over the whole buffer (a line start only
+counts when the quotes before it are balanced, i.e. it is not inside a quoted
+multi-line cell), and the byte ranges that are kept are copied into the
+output as they are (os.copy_file_range where available). With no duplicates a
+whole file body is a single copy.
+
+Duplicates are dropped by a 64-bit hash key held in a set, never by keeping
+rows around:
+  raw   = an entry (its 4+ cell row + the meta / comment rows under it); the
+          key covers all of its rows. Overlapping page ranges and re-scrapes
+          repeat entries exactly, comments included. Entries that only share
+          school / program / date / term (common when there are no scores)
+          are different applicants and are kept.
+  clean = one row per entry. Clean rows have no date, so two applicants with
+          the same school / program / term / scores look identical: they are
+          only counted, and dropped with --dedup.
+
+Raw batch files have no header. The old scripts skipped the first row of
+every batch after the first as a "header", which was a real entry.
+"""
+
+import argparse
+import csv
+import glob
+import hashlib
+import io
+import os
+import re
+from pathlib import Path
+
+# =========================
+# CONFIG
+# =========================
+HERE = Path(__file__).resolve().parent
+RAW_JOBS = {
+    "Accepted": (HERE / "accepted_batchs" / "accepted_batch_*.csv", HERE / "accepted_batchs" / "accepted_full.csv"),
+    "Rejected": (HERE / "rejected_batchs" / "rejected_batch_*.csv", HERE / "rejected_batchs" / "rejected_full.csv"),
+}
+CLEAN_INPUTS = [
+    HERE / "accepted_batchs" / "gradcafe_accepted_clean.csv",
+    HERE / "rejected_batchs" / "gradcafe_rejected_clean.csv",
+]
+CLEAN_OUTPUT = HERE / "gradcafe_cs_ms_all.csv"
+KEY_BYTES = 8              # 64-bit keys: ~1e-7 collision odds at 1M entries
+COPY_CHUNK = 1 << 20
+EOL = b"\r\n"              # csv.writer's terminator, used when an input does not end with one
+
+# CSV grammar as bytes patterns: a cell is quoted ("" escapes a quote, newlines allowed) or plain
+_CELL = rb'(?:"(?:[^"]|"")*"[^,\r\n]*|[^",\r\n][^,\r\n]*|)'
+_RECORD = _CELL + rb"(?:," + _CELL + rb")*(?:\r?\n|\Z)"
+# same test as clean_gradcafe.is_entry_row: the 4th cell starts with "Accepted on" / "Rejected on"
+_ENTRY = _CELL + rb"(?:," + _CELL + rb'){2},"?(?:Accepted|Rejected) on'
+
+RECORD = re.compile(rb"(?!\Z)" + _RECORD)
+ENTRY_ROW = re.compile(_ENTRY)
+DECISION = re.compile(rb"(?:Accepted|Rejected) on")  # literal search; each hit is checked with ENTRY_ROW
+# rows with no content ("", ",,,,"): the scraper leaves them around, so they are not part of a key
+BLANK_ROWS = re.compile(rb'^(?:""|,)*\r?\n', re.M)
+
+
+def batch_files(pattern) -> list:
+    """
+    Batch CSVs in page order (batch_2 before batch_10, unlike a plain sorted glob);
+    unnumbered ones (scrape_gradcafe.py's *_batch_store.csv) come last, so only
+    their entries missing from the saved batches are added.
+    """
+    def batch_no(path):
+        m = re.search(r"_batch_(\d+)", Path(path).name)
+        return (int(m.group(1)) if m else float("inf"), path)
+    return sorted(glob.glob(str(pattern)), key=batch_no)
+
+
+def unit_key(unit: bytes) -> int:
+    data = BLANK_ROWS.sub(b"", unit) if b"\n," in unit or b'\n""' in unit else unit
+    data = data.replace(b"\r\n", b"\n")
+    if not data.endswith(b"\n"):  # last row of a file without a final newline
+        data += b"\n"
+    return int.from_bytes(hashlib.blake2b(data, digest_size=KEY_BYTES).digest(), "little")
+
+
+def iter_units(data, kind: str, name: str = "input"):
+    """
+    Splits a CSV buffer into merge units: (is_header, start, end).
+    raw: an entry row + the rows after it; rows before the first entry are header rows.
+    clean: one row each; the first row is the header.
+    """
+    if kind == "raw":
+        prev, first_is_entry = 0, None
+        for m in DECISION.finditer(data):
+            start = data.rfind(b"\n", 0, m.start()) + 1
+            if start == prev and first_is_entry is not None:
+                continue  # a second hit on the same line
+            row = ENTRY_ROW.match(data, start)
+            if row is None or row.end() != m.end() or data.count(b'"', prev, start) % 2:
+                continue  # "Accepted on" in another cell, or a line inside a quoted cell
+            if first_is_entry is None:
+                first_is_entry = start == 0
+            if start > prev:
+                yield prev == 0 and not first_is_entry, prev, start
+            prev = start
+        if prev < len(data):
+            yield prev == 0 and not first_is_entry, prev, len(data)
+        return
+
+    pos = 0
+    for m in RECORD.finditer(data):
+        if m.start() != pos:
+            raise ValueError(f"{name}: not valid CSV near byte {pos}")
+        yield pos == 0, m.start(), m.end()
+        pos = m.end()
+    if pos != len(data):
+        raise ValueError(f"{name}: not valid CSV near byte {pos}")
+
+
+def _parse_row(rec: bytes) -> list:
+    return next(csv.reader([rec.decode("utf-8")]), [])
+
+
+def _copy_range(src, dst, start: int, length: int):
+    if hasattr(os, "copy_file_range"):
+        try:
+            while length > 0:
+                n = os.copy_file_range(src.fileno(), dst.fileno(), length, start)
+                if n == 0:
+                    break
+                start += n
+                length -= n
+        except OSError:
+            pass  # e.g. unsupported filesystem: fall back to read/write
+    src.seek(start)
+    while length > 0:
+        buf = src.read(min(COPY_CHUNK, length))
+        if not buf:
+            break
+        dst.write(buf)
+        length -= len(buf)
+
+
+def _copy_ranges(src, dst, ranges: list, ends_with_newline: bool):
+    """Copies the ranges (adjacent ones as one copy); terminates a last line that had no newline."""
+    if not ranges:
+        return
+    start, end = ranges[0]
+    for s, e in ranges[1:]:
+        if s != end:
+            _copy_range(src, dst, start, end - start)
+            start = s
+        end = e
+    _copy_range(src, dst, start, end - start)
+    if not ends_with_newline:
+        dst.write(EOL)
+
+
+def merge_files(paths: list, output_path, kind: str = "raw", dedup: bool = True) -> dict:
+    """
+    Merges `paths` (in this order) into output_path by copying byte ranges.
+    The header (clean) / rows before the first entry (raw) come from the first file only.
+    Returns totals: entries, duplicates, written, and per-file counts.
+    """
+    if kind not in ("raw", "clean"):
+        raise ValueError(f"kind must be 'raw' or 'clean', got {kind!r}")
+    if not paths:
+        raise FileNotFoundError("No input files to merge.")
+
+    seen = set()
+    header = None
+    totals = {"entries": 0, "duplicates": 0, "written": 0, "files": {}}
+    with open(output_path, "wb", buffering=0) as out:
+        for i, path in enumerate(paths):
+            name = Path(path).name
+            n_entries = n_dups = 0
+            ranges, eol, order = [], True, None
+            with open(path, "rb") as src:
+                data = src.read()
+                for is_header, start, end in iter_units(data, kind, name):
+                    unit = data[start:end]
+                    if is_header:
+                        if i == 0:
+                            header = header or _parse_row(unit)
+                            ranges.append((start, end))
+                            eol = unit.endswith(b"\n")
+                        elif kind == "clean" and _parse_row(unit) != header:
+                            cols = _parse_row(unit)
+                            missing = set(header) - set(cols)
+                            if missing:
+                                raise ValueError(f"{path}: header lacks columns {sorted(missing)}")
+                            order = [cols.index(c) for c in header]
+                            print(f"[WARN] {name}: different column order, its rows are "
+                                  f"rewritten in the first file's order")
+                        continue
+
+                    n_entries += 1
+                    if order is not None:
+                        # slow path: this file's rows go through csv in the first file's column order
+                        row = _parse_row(unit)
+                        buf = io.StringIO()
+                        csv.writer(buf).writerow([row[j] for j in order])
+                        unit = buf.getvalue().encode("utf-8")
+                    key = unit_key(unit)
+                    if key in seen:
+                        n_dups += 1
+                        if dedup:
+                            continue
+                    seen.add(key)
+                    totals["written"] += 1
+
+                    if order is not None:
+                        out.write(unit)
+                    else:
+                        ranges.append((start, end))
+                        eol = unit.endswith(b"\n")
+                _copy_ranges(src, out, ranges, eol)
+
+            totals["entries"] += n_entries
+            totals["duplicates"] += n_dups
+            totals["files"][name] = {"entries": n_entries, "duplicates": n_dups}
+            print(f"[OK] {name}: {n_entries} entries | {n_dups} duplicate(s)"
+                  + (" dropped" if dedup and n_dups else ""))
+
+    print(f"[OK] Merged {len(paths)} file(s) -> {output_path} | {totals['written']} of "
+          f"{totals['entries']} entries written, {totals['duplicates']} duplicate(s) found")
+    return totals
+
+
+def main(clean: bool = False, dedup_clean: bool = False):
+    if clean:
+        merge_files(CLEAN_INPUTS, CLEAN_OUTPUT, kind="clean", dedup=dedup_clean)
+        return
+    for decision, (pattern, output_path) in RAW_JOBS.items():
+        files = batch_files(pattern)
+        print(f"[INFO] {decision}: {len(files)} batch file(s)")
+        merge_files(files, output_path, kind="raw")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Merge GradCafe batch / clean CSVs by byte ranges, dropping duplicates.")
+    ap.add_argument("--clean", action="store_true",
+                    help="merge gradcafe_accepted_clean.csv + gradcafe_rejected_clean.csv instead of the raw batches")
+    ap.add_argument("--dedup", action="store_true", help="with --clean: also drop identical clean rows")
+    args = ap.parse_args()
+
+    main(args.clean, args.dedup)
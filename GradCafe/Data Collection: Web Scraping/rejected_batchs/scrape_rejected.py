@@ -7,7 +7,6 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 import time
 import csv
-import glob
 
 
 def scrape_gradcafe_rejected_batch(
@@ -98,43 +97,8 @@ def scrape_gradcafe_rejected_batch(
     print("======================================================")
 
 
-def merge_rejected_batches(
-    pattern="rejected_batch_*.csv",
-    output_path="rejected_full.csv"
-):
-    """
-    rejected_batch_*.csv dosyalarını tek bir rejected_full.csv'de birleştirir.
-    Header varsa ilk dosyadan alınır, sonrakilerde atlanır.
-    """
-    files = sorted(glob.glob(pattern))
-    print("Bulunan REJECTED batch dosyaları:")
-    for f in files:
-        print(" -", f)
-
-    if not files:
-        print("[WARN] Hiç dosya bulunamadı, pattern doğru mu? (rejected_batch_*.csv)")
-        return
-
-    first = True
-    with open(output_path, "w", newline="", encoding="utf-8") as out_f:
-        writer = None
-
-        for file in files:
-            with open(file, "r", encoding="utf-8") as in_f:
-                reader = csv.reader(in_f)
-                header = next(reader, None)
-
-                if first:
-                    writer = csv.writer(out_f)
-                    if header:
-                        writer.writerow(header)
-                    first = False
-
-                for row in reader:
-                    if row:   # boş satırları at
-                        writer.writerow(row)
-
-    print(f"[OK] REJECTED full dataset created → {output_path}")
+# Batch'leri birleştirme: merge_rejected_batches.py (../merge_gradcafe.py)
+from merge_rejected_batches import merge_rejected_batches  # noqa: E402,F401
 
 
 if __name__ == "__main__":
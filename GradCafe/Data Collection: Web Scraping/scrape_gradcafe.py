@@ -0,0 +1,488 @@
+# scrape_gradcafe.py
+
+"""
+Accepted + Rejected GradCafe survey pages in one run.
+
+Pages are fetched concurrently with one pooled aiohttp session (bounded
+concurrency + token-bucket rate limit) and the results table is parsed from
+the HTML directly. Only pages where the plain HTTP fetch does not return the
+table (JS challenge, blocked request) go to a small Selenium browser pool.
+Output rows are the same raw cell texts the old batch scripts wrote, so
+clean_gradcafe.py keeps working unchanged.
+
+Each page is checkpointed into scrape_store/ as soon as it is parsed (see
+PageStore): a restarted run skips pages already fetched, and --refresh
+re-fetches them but only rewrites pages whose content changed. Every stored
+page is written to one batch file per decision (OUTPUT_PATHS); the full CSVs
+stay merge_gradcafe.py's output, so a partial or first run never replaces
+the saved batches.
+
+Offline check + benchmark against saved pages: gradcafe_standin.py
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+
+import aiohttp
+
+# =========================
+# CONFIG
+# =========================
+BASE_URL = "https://www.thegradcafe.com/survey/"
+QUERY = (
+    "?q=&sort=newest"
+    "&institution="
+    "&program=Computer+Science"
+    "&degree=Masters"
+    "&season="
+    "&decision={decision}"
+    "&decision_start=&decision_end=&added_start=&added_end="
+    "&page={page}"
+)
+DECISIONS = ["Accepted", "Rejected"]
+START_PAGE, END_PAGE = 1, 500
+
+# one more batch file: merge_gradcafe.py (stage merge_batches) merges it after the
+# saved batches into accepted_full.csv / rejected_full.csv, dropping repeated entries
+OUTPUT_PATHS = {
+    "Accepted": "accepted_batchs/accepted_batch_store.csv",
+    "Rejected": "rejected_batchs/rejected_batch_store.csv",
+}
+STORE_DIR = "scrape_store"   # pages.jsonl + manifest.csv
+
+CONCURRENCY = 8      # open connections / pages in flight
+RATE = 2.0           # requests per second (token bucket), 0 = no limit
+BURST = 4
+TIMEOUT_S = 30
+MAX_RETRIES = 4
+BROWSER_POOL = 2     # Chrome instances for the fallback, created only if needed
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+
+TABLE_CLASS = "tw-min-w-full"
+
+
+def page_url(base_url: str, decision: str, page: int) -> str:
+    return base_url + QUERY.format(decision=decision, page=page)
+
+
+# =========================
+# HTML -> rows
+# =========================
+class SurveyTableParser(HTMLParser):
+    """
+    Rows of <table class="tw-min-w-full"><tbody> as lists of cell texts.
+    Cell text follows Selenium's .text: block elements start a new line,
+    whitespace is collapsed, empty lines are dropped.
+    """
+
+    BLOCK_TAGS = {"div", "p", "br", "li", "ul", "ol", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section"}
+    SKIP_TAGS = {"script", "style", "template", "noscript"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found_table = False
+        self.rows = []
+        self._table_depth = 0   # nesting inside the results table
+        self._in_tbody = False
+        self._row = None
+        self._cell = None
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip += 1
+            return
+        if tag == "table":
+            if self._table_depth:
+                self._table_depth += 1
+            elif TABLE_CLASS in (dict(attrs).get("class") or "").split():
+                self._table_depth = 1
+                self.found_table = True
+            return
+        if not self._table_depth:
+            return
+        if tag == "tbody" and self._table_depth == 1:
+            self._in_tbody = True
+        elif tag == "tr" and self._in_tbody and self._table_depth == 1:
+            self._row = []
+        elif tag == "td" and self._row is not None and self._cell is None:
+            self._cell = []
+        elif self._cell is not None and tag in self.BLOCK_TAGS:
+            self._cell.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+            return
+        if not self._table_depth:
+            return
+        if tag == "table":
+            self._table_depth -= 1
+        elif tag == "tbody" and self._table_depth == 1:
+            self._in_tbody = False
+        elif tag == "td" and self._cell is not None:
+            self._row.append(_cell_text("".join(self._cell)))
+            self._cell = None
+        elif tag == "tr" and self._row is not None and self._table_depth == 1:
+            if self._row:
+                self.rows.append(self._row)
+            self._row = None
+        elif self._cell is not None and tag in self.BLOCK_TAGS:
+            self._cell.append("\n")
+
+    def handle_data(self, data):
+        if self._cell is not None and not self._skip:
+            self._cell.append(data)
+
+
+def _cell_text(raw: str) -> str:
+    lines = (" ".join(line.split()) for line in raw.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def parse_rows(html: str):
+    """Table rows of a survey page; None if the page has no results table."""
+    parser = SurveyTableParser()
+    parser.feed(html)
+    parser.close()
+    return parser.rows if parser.found_table else None
+
+
+# =========================
+# politeness + fetching
+# =========================
+class TokenBucket:
+    """At most `rate` requests per second on average, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def fetch_html(session: aiohttp.ClientSession, url: str, bucket: TokenBucket, retries=MAX_RETRIES):
+    """Page HTML, or None if the site keeps refusing (-> browser fallback)."""
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    return await resp.text()
+                if resp.status not in (429, 500, 502, 503, 504):
+                    print(f"[WARN] HTTP {resp.status} for {url}")
+                    return None
+                retry_after = resp.headers.get("Retry-After", "")
+                delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"[WARN] {type(e).__name__} for {url} (attempt {attempt + 1})")
+            delay = 2 ** attempt
+        await asyncio.sleep(delay * (0.5 + random.random()))
+    return None
+
+
+class BrowserPool:
+    """
+    Selenium fallback for pages the HTTP client cannot read. Chrome instances
+    are started lazily (at most `size`) and reused; each page still goes
+    through parse_rows so rows look the same as on the HTTP path.
+    """
+
+    def __init__(self, size=BROWSER_POOL, wait_seconds=15):
+        self.size = size
+        self.wait_seconds = wait_seconds
+        self._executor = ThreadPoolExecutor(max_workers=size)
+        self._idle = []
+        self._all = []
+
+    def _driver(self):
+        if self._idle:
+            return self._idle.pop()
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        driver = webdriver.Chrome(options=options)
+        self._all.append(driver)
+        return driver
+
+    def _fetch(self, url: str):
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        driver = self._driver()
+        try:
+            driver.get(url)
+            try:
+                WebDriverWait(driver, self.wait_seconds).until(
+                    EC.visibility_of_element_located((By.CSS_SELECTOR, f"table.{TABLE_CLASS}"))
+                )
+            except TimeoutException:
+                return None
+            return parse_rows(driver.page_source)
+        finally:
+            self._idle.append(driver)
+
+    async def rows(self, url: str):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._fetch, url)
+
+    def close(self):
+        for d in self._all:
+            d.quit()
+        self._executor.shutdown()
+
+
+# =========================
+# checkpoint store
+# =========================
+MANIFEST_FIELDS = ["decision", "page", "row_count", "hash", "fetched_at"]
+
+
+def content_hash(rows: list) -> str:
+    return hashlib.sha1(json.dumps(rows, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _open_append(path: Path, **kw):
+    """Opens for appending; a half-written last line is terminated so the next record starts clean."""
+    torn = False
+    if path.exists() and path.stat().st_size > 0:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+    f = open(path, "a", encoding="utf-8", **kw)
+    if torn:
+        f.write("\n")
+    return f
+
+
+def _append_line(f, line: str):
+    f.write(line)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+class PageStore:
+    """
+    Append-only page store: every fetched page is written to pages.jsonl and
+    then recorded in manifest.csv (decision, page, row_count, hash, fetched_at)
+    as soon as it arrives, so a crash loses at most the pages in flight. For
+    each page the last manifest line wins; the data is written first, so a
+    manifest entry always has its rows. A half-written last line (crash during
+    the write) is ignored on load.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.pages_path = self.root / "pages.jsonl"
+        self.manifest_path = self.root / "manifest.csv"
+        self.manifest = {}
+        if self.manifest_path.exists():
+            with open(self.manifest_path, newline="", encoding="utf-8") as f:
+                for rec in csv.DictReader(f):
+                    if rec.get("fetched_at"):  # complete line
+                        self.manifest[(rec["decision"], int(rec["page"]))] = rec
+        new_manifest = not self.manifest_path.exists() or self.manifest_path.stat().st_size == 0
+        self._pages_f = _open_append(self.pages_path)
+        self._manifest_f = _open_append(self.manifest_path, newline="")
+        if new_manifest:
+            _append_line(self._manifest_f, ",".join(MANIFEST_FIELDS) + "\n")
+
+    def has(self, decision: str, page: int) -> bool:
+        return (decision, page) in self.manifest
+
+    def put(self, decision: str, page: int, rows: list) -> bool:
+        """Records a fetched page; returns False if its content did not change."""
+        h = content_hash(rows)
+        old = self.manifest.get((decision, page))
+        fetched_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        changed = old is None or old["hash"] != h
+        if changed:
+            rec = {"decision": decision, "page": page, "hash": h, "rows": rows}
+            _append_line(self._pages_f, json.dumps(rec, ensure_ascii=False) + "\n")
+        entry = {"decision": decision, "page": page, "row_count": len(rows), "hash": h, "fetched_at": fetched_at}
+        buf = io.StringIO()
+        csv.writer(buf).writerow([entry[k] for k in MANIFEST_FIELDS])
+        _append_line(self._manifest_f, buf.getvalue())
+        self.manifest[(decision, page)] = {k: str(v) for k, v in entry.items()}
+        return changed
+
+    def pages(self, decision: str) -> dict:
+        """{page: rows} for the current version of every stored page of a decision."""
+        want = {p: rec["hash"] for (d, p), rec in self.manifest.items() if d == decision}
+        out = {}
+        self._pages_f.flush()
+        with open(self.pages_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if rec["decision"] == decision and want.get(rec["page"]) == rec["hash"]:
+                    out[rec["page"]] = rec["rows"]
+        return out
+
+    def close(self):
+        self._pages_f.close()
+        self._manifest_f.close()
+
+
+# =========================
+# scraping
+# =========================
+async def fetch_rows(session, url: str, bucket: TokenBucket, browser: BrowserPool = None):
+    """(rows, "http" | "browser"), or (None, ...) if no table could be read."""
+    html = await fetch_html(session, url, bucket)
+    rows = parse_rows(html) if html is not None else None
+    if rows is None and browser is not None:
+        try:
+            return await browser.rows(url), "browser"
+        except Exception as e:  # no selenium / chrome on this machine
+            print(f"[WARN] Browser fallback failed for {url}: {e}")
+    return rows, "http"
+
+
+def open_session(concurrency=CONCURRENCY) -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=TIMEOUT_S),
+                                 headers={"User-Agent": USER_AGENT})
+
+
+async def scrape(decisions=DECISIONS, start_page=START_PAGE, end_page=END_PAGE, base_url=BASE_URL,
+                 concurrency=CONCURRENCY, rate=RATE, burst=BURST, browser_fallback=True,
+                 store: PageStore = None, refresh=False):
+    """
+    Returns ({decision: {page: rows}}, stats). Pages with no table even after
+    the fallback are reported in stats["failed"] and left out.
+
+    With a store, every page is checkpointed as soon as it is parsed and
+    pages already in the manifest are skipped, unless refresh=True: then they
+    are fetched again and only pages whose content hash changed are rewritten.
+    """
+    jobs = asyncio.Queue()
+    skipped = 0
+    for decision in decisions:
+        for page in range(start_page, end_page + 1):
+            if store is not None and not refresh and store.has(decision, page):
+                skipped += 1
+                continue
+            jobs.put_nowait((decision, page))
+
+    results = {d: {} for d in decisions}
+    stats = {"pages": 0, "rows": 0, "http": 0, "browser": 0, "failed": [],
+             "skipped": skipped, "changed": 0, "unchanged": 0}
+    bucket = TokenBucket(rate, burst)
+    browser = BrowserPool() if browser_fallback else None
+
+    async def worker(session):
+        while True:
+            try:
+                decision, page = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            rows, source = await fetch_rows(session, page_url(base_url, decision, page), bucket, browser)
+            if rows is None:
+                print(f"[WARN] Table not found on {decision} page {page}. Skipping page.")
+                stats["failed"].append((decision, page))
+                continue
+            if store is not None:
+                stats["changed" if store.put(decision, page, rows) else "unchanged"] += 1
+            results[decision][page] = rows
+            stats["pages"] += 1
+            stats["rows"] += len(rows)
+            stats[source] += 1
+
+    t0 = time.perf_counter()
+    try:
+        async with open_session(concurrency) as session:
+            await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    finally:
+        if browser is not None:
+            browser.close()
+    stats["seconds"] = time.perf_counter() - t0
+    stats["pages_per_sec"] = stats["pages"] / stats["seconds"] if stats["seconds"] > 0 else float("nan")
+    return results, stats
+
+
+def write_raw_csv(pages: dict, output_path):
+    """Rows of all pages in page order, same layout as the old batch CSVs."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    n = 0
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        for page in sorted(pages):
+            writer.writerows(pages[page])
+            n += len(pages[page])
+    return n
+
+
+def main(decisions=DECISIONS, start_page=START_PAGE, end_page=END_PAGE, base_url=BASE_URL,
+         concurrency=CONCURRENCY, rate=RATE, browser_fallback=True, out_dir=".", refresh=False):
+    print(f"========== SCRAPE {'/'.join(decisions)}: pages {start_page} → {end_page} ==========")
+    store = PageStore(Path(out_dir) / STORE_DIR)
+    try:
+        _, stats = asyncio.run(scrape(
+            decisions, start_page, end_page, base_url, concurrency, rate, BURST, browser_fallback,
+            store=store, refresh=refresh,
+        ))
+        # the store batch holds pages from earlier runs too; merge_gradcafe.py adds it to the full CSVs
+        for decision in decisions:
+            pages = store.pages(decision)
+            path = Path(out_dir) / OUTPUT_PATHS[decision]
+            n = write_raw_csv(pages, path)
+            print(f"[OK] {decision}: {len(pages)} pages, {n} rows → {path}")
+    finally:
+        store.close()
+    print(f"[OK] {stats['pages']} pages in {stats['seconds']:.1f}s ({stats['pages_per_sec']:.2f} pages/sec) | "
+          f"http={stats['http']} browser={stats['browser']} failed={len(stats['failed'])} | "
+          f"skipped (already stored)={stats['skipped']} changed={stats['changed']} unchanged={stats['unchanged']}")
+    print("[INFO] python merge_gradcafe.py (or python pipeline.py) merges the store batches into the full CSVs")
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Scrape GradCafe Accepted + Rejected survey pages.")
+    ap.add_argument("--decisions", nargs="+", default=DECISIONS, choices=DECISIONS)
+    ap.add_argument("--start-page", type=int, default=START_PAGE)
+    ap.add_argument("--end-page", type=int, default=END_PAGE)
+    ap.add_argument("--base-url", default=BASE_URL)
+    ap.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    ap.add_argument("--rate", type=float, default=RATE, help="requests/sec, 0 = unlimited")
+    ap.add_argument("--no-browser", action="store_true", help="disable the Selenium fallback")
+    ap.add_argument("--out-dir", default=".", help="folder holding accepted_batchs/, rejected_batchs/, scrape_store/")
+    ap.add_argument("--refresh", action="store_true",
+                    help="re-fetch pages already in the manifest, rewrite only the ones whose hash changed")
+    args = ap.parse_args()
+
+    main(args.decisions, args.start_page, args.end_page, args.base_url,
+         args.concurrency, args.rate, not args.no_browser, args.out_dir, args.refresh)
@@ -0,0 +1,274 @@
+# sync_gradcafe.py
+
+"""
+Incremental "newest entries only" GradCafe sync.
+
+The survey URLs sort by newest, so new entries always appear at the top of
+page 1. For each decision we remember fingerprints of the entries already
+ingested; a sync walks pages 1, 2, ... and stops at the first few known
+entries in a row, so a nightly run touches a handful of pages instead of all 500 per decision.
+The first sync seeds the fingerprints from the existing raw CSVs
+(accepted_full.csv / rejected_full.csv), which are already ingested.
+
+Only the new entries go through the chain, each stage appending its delta
+to the file the full pipeline would have produced (the raw delta is an input
+of the pipeline's clean_gradcafe stage, so a rebuild keeps these rows):
+  raw rows      -> accepted_batchs/accepted_sync.csv, rejected_batchs/rejected_sync.csv
+  clean         -> gradcafe_accepted_clean.csv / gradcafe_rejected_clean.csv   (clean_gradcafe.py)
+  normalize     -> GradCafe/EDA: Gradcafe/gradcafe_eda.csv                     (name_normalization + drop rules)
+  merge with QS -> merged_matched_only.csv                                     (merge_gradcafe_qs.py)
+The sync state is saved last, after every stage was appended.
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+import scrape_gradcafe as sg
+
+HERE = Path(__file__).resolve().parent
+REPO_ROOT = HERE.parents[1]
+sys.path.insert(0, str(REPO_ROOT / "GradCafe" / "Preprocessing: GradCafe"))
+sys.path.insert(0, str(REPO_ROOT))
+
+from clean_gradcafe import CLEAN_COLUMNS, entry_record  # noqa: E402
+from gradcafe_after_removing import apply_drop_rules  # noqa: E402
+from institution_matcher import ALIAS_CACHE, AliasCache  # noqa: E402
+from merge_gradcafe_qs import join_qs  # noqa: E402
+from name_normalization import CACHE_PATH as NAME_CACHE, normalize_column  # noqa: E402
+from pipeline import file_hashes, record_outputs  # noqa: E402
+from qs_store import STORE_PATH as QS_STORE, load_store  # noqa: E402
+from table_store import load_table, parquet_path, save_table  # noqa: E402
+
+# =========================
+# CONFIG
+# =========================
+KNOWN_KEEP = 200    # newest fingerprints remembered per decision
+MAX_PAGES = 50      # stop here even if no known entry shows up (long gap since the last sync)
+# identical posts exist (and entries repeat across pages when the list shifts
+# mid-scrape), so one known fingerprint is not proof we reached old data
+STOP_AFTER_KNOWN = 3
+
+
+def default_paths(root=REPO_ROOT) -> dict:
+    root = Path(root)
+    scrape_dir = root / "GradCafe" / "Data Collection: Web Scraping"
+    return {
+        "state": scrape_dir / sg.STORE_DIR / "sync_state.json",
+        "raw_full": {
+            "Accepted": scrape_dir / "accepted_batchs" / "accepted_full.csv",
+            "Rejected": scrape_dir / "rejected_batchs" / "rejected_full.csv",
+        },
+        "raw_delta": {
+            "Accepted": scrape_dir / "accepted_batchs" / "accepted_sync.csv",
+            "Rejected": scrape_dir / "rejected_batchs" / "rejected_sync.csv",
+        },
+        "clean": {
+            "Accepted": scrape_dir / "accepted_batchs" / "gradcafe_accepted_clean.csv",
+            "Rejected": scrape_dir / "rejected_batchs" / "gradcafe_rejected_clean.csv",
+        },
+        "normalized": root / "GradCafe" / "EDA: Gradcafe" / "gradcafe_eda.csv",
+        "qs": root / "QS World Ranking" / "EDA: QS" / "qs_ranking_eda.csv",
+        "qs_store": root / QS_STORE,
+        "merged": root / "merged_matched_only.csv",
+        "aliases": root / ALIAS_CACHE,
+        "names": root / NAME_CACHE,
+    }
+
+
+# =========================
+# entries + fingerprints
+# =========================
+def group_entries(rows: list) -> list:
+    """Raw table rows -> entries (the 4+ cell row followed by its meta / comment rows)."""
+    entries = []
+    for row in rows:
+        if len(row) >= 4:
+            entries.append([row])
+        elif entries:
+            entries[-1].append(row)
+    return entries
+
+
+def fingerprint(entry: list) -> str:
+    # entry row + meta row; comment rows are left out since they can be edited later
+    return hashlib.sha1(json.dumps(entry[:2], ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def load_state(path: Path, paths: dict) -> dict:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    # first sync: everything in the raw full CSVs is already ingested
+    state = {}
+    for decision, raw in paths["raw_full"].items():
+        rows = []
+        if raw.exists():
+            with open(raw, newline="", encoding="utf-8") as f:
+                rows = [r for r in csv.reader(f) if r]
+        state[decision] = {"known": [fingerprint(e) for e in group_entries(rows)], "last_sync": None}
+    return state
+
+
+def save_state(path: Path, state: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# =========================
+# fetching the delta
+# =========================
+async def newest_entries(session, bucket, browser, base_url: str, decision: str, known: set,
+                         max_pages=MAX_PAGES):
+    """
+    Walks pages from newest until STOP_AFTER_KNOWN consecutive known entries.
+    Returns (new entries, fingerprints of every entry on the walked pages in
+    page order, pages fetched).
+    """
+    new, seen, run = [], [], 0
+    for page in range(1, max_pages + 1):
+        rows, _ = await sg.fetch_rows(session, sg.page_url(base_url, decision, page), bucket, browser)
+        if rows is None:
+            raise RuntimeError(f"No table on {decision} page {page}; not syncing a partial delta.")
+        entries = group_entries(rows)
+        for e in entries:
+            fp = fingerprint(e)
+            seen.append(fp)
+            if fp in known:
+                run += 1
+            else:
+                run = 0
+                new.append(e)
+            if run >= STOP_AFTER_KNOWN:
+                return new, seen, page
+        if not entries:  # past the last page
+            return new, seen, page
+    print(f"[WARN] {decision}: no known entries in the first {max_pages} pages; delta may be incomplete.")
+    return new, seen, max_pages
+
+
+async def fetch_delta(state: dict, base_url=sg.BASE_URL, decisions=sg.DECISIONS, rate=sg.RATE,
+                      browser_fallback=True, max_pages=MAX_PAGES) -> dict:
+    bucket = sg.TokenBucket(rate, sg.BURST)
+    browser = sg.BrowserPool() if browser_fallback else None
+    try:
+        async with sg.open_session(len(decisions)) as session:
+            results = await asyncio.gather(*(
+                newest_entries(session, bucket, browser, base_url, d, set(state[d]["known"]), max_pages)
+                for d in decisions
+            ))
+    finally:
+        if browser is not None:
+            browser.close()
+    return dict(zip(decisions, results))
+
+
+# =========================
+# clean -> normalize -> merge (delta only)
+# =========================
+def clean_entries(entries: list) -> pd.DataFrame:
+    """Same records clean_gradcafe.py writes for the full files."""
+    out = [entry_record(e[0], e[1] if len(e) > 1 else None) for e in entries]
+    return pd.DataFrame(out, columns=CLEAN_COLUMNS)
+
+
+def normalize_and_filter(clean: pd.DataFrame, name_cache=None) -> pd.DataFrame:
+    """institution_clean + the drop rules of gradcafe_after_removing.py."""
+    df = apply_drop_rules(clean)
+    df["institution_clean"] = normalize_column(df["university"], name_cache or NAME_CACHE)
+    return df
+
+
+def merge_with_qs(df: pd.DataFrame, qs_path, alias_cache=None, qs_store=None) -> pd.DataFrame:
+    """Fuzzy QS join of merge_gradcafe_qs.merge_matched_only; new spellings are added to the alias cache."""
+    return join_qs(df, load_table(qs_path), fuzzy=True, cache=AliasCache(alias_cache or ALIAS_CACHE),
+                   store=load_store(qs_store or QS_STORE))
+
+
+def append_csv(df: pd.DataFrame, path: Path) -> int:
+    """
+    Appends rows in the existing file's column order (header written for a new file).
+    A typed Parquet copy next to the CSV is rewritten so loaders keep using it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists() and path.stat().st_size > 0:
+        cols = list(pd.read_csv(path, nrows=0).columns)
+        df.reindex(columns=cols).to_csv(path, mode="a", header=False, index=False)
+    else:
+        df.to_csv(path, index=False)
+    if parquet_path(path).exists():
+        save_table(load_table(path, prefer_parquet=False), path, write_csv=False)
+    return len(df)
+
+
+def append_raw(entries: list, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(r for e in entries for r in e)
+
+
+def sync(base_url=sg.BASE_URL, decisions=sg.DECISIONS, paths=None, rate=sg.RATE,
+         browser_fallback=True, max_pages=MAX_PAGES, dry_run=False) -> dict:
+    paths = paths or default_paths()
+    state = load_state(paths["state"], paths)
+    delta = asyncio.run(fetch_delta(state, base_url, decisions, rate, browser_fallback, max_pages))
+
+    summary, cleaned = {}, {}
+    for decision, (entries, _, pages) in delta.items():
+        summary[decision] = {"pages": pages, "new_entries": len(entries)}
+        print(f"[OK] {decision}: {len(entries)} new entries in {pages} page(s)")
+        cleaned[decision] = clean_entries(entries)
+    if dry_run:
+        return summary
+
+    # pipeline outputs appended to below: a rebuild reproduces these rows (clean_gradcafe reads raw_delta)
+    appended = [*paths["clean"].values(), paths["normalized"], paths["merged"]]
+    before = file_hashes(appended)
+    for decision, (entries, _, _) in delta.items():
+        if entries:
+            append_raw(entries, paths["raw_delta"][decision])
+            append_csv(cleaned[decision], paths["clean"][decision])
+
+    clean = pd.concat(cleaned.values(), ignore_index=True)
+    normalized = normalize_and_filter(clean, paths["names"])
+    merged = merge_with_qs(normalized, paths["qs"], paths["aliases"], paths["qs_store"]) if len(normalized) else normalized.iloc[:0]
+    n_norm = append_csv(normalized, paths["normalized"]) if len(normalized) else 0
+    n_merged = append_csv(merged, paths["merged"]) if len(merged) else 0
+    summary["appended"] = {"clean": len(clean), "normalized": n_norm, "merged": n_merged}
+    print(f"[OK] Appended: clean={len(clean)} → normalized/filtered={n_norm} → matched with QS={n_merged}")
+    recorded = record_outputs(before)
+    if recorded:
+        print(f"[INFO] Recorded {len(recorded)} appended file(s) as pipeline outputs (python pipeline.py keeps the rows)")
+
+    # newest first: everything on the walked pages, then what we knew before
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for decision, (_, seen, _) in delta.items():
+        known = list(dict.fromkeys(seen + state[decision]["known"]))
+        state[decision] = {"known": known[:KNOWN_KEEP], "last_sync": now}
+    save_state(paths["state"], state)
+    return summary
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fetch only GradCafe entries newer than the last sync.")
+    ap.add_argument("--decisions", nargs="+", default=sg.DECISIONS, choices=sg.DECISIONS)
+    ap.add_argument("--base-url", default=sg.BASE_URL)
+    ap.add_argument("--rate", type=float, default=sg.RATE, help="requests/sec, 0 = unlimited")
+    ap.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    ap.add_argument("--root", default=str(REPO_ROOT), help="repository root holding the pipeline files")
+    ap.add_argument("--no-browser", action="store_true", help="disable the Selenium fallback")
+    ap.add_argument("--dry-run", action="store_true", help="only report how many entries are new")
+    args = ap.parse_args()
+
+    sync(args.base_url, args.decisions, default_paths(args.root), args.rate,
+         not args.no_browser, args.max_pages, args.dry_run)
@@ -1,10 +1,15 @@
+import sys
+
 import pandas as pd
 from scipy.stats import ttest_ind
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from table_store import load_table  # noqa: E402
+
 
 def compare_distributions(input_path):
-    df = pd.read_csv(input_path)
+    df = load_table(input_path)
 
     accepted = df[df["decision"] == "Accepted"]
     rejected = df[df["decision"] == "Rejected"]
@@ -1,8 +1,15 @@
+import sys
+
 import pandas as pd
 import matplotlib.pyplot as plt
 from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from table_store import load_table  # noqa: E402
+
+
 def plot_histograms(input_path):
-    df = pd.read_csv(input_path)
+    df = load_table(input_path)
 
     # Correct column names
     gpa_col = "gpa_raw"
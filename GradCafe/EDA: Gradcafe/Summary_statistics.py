@@ -1,7 +1,14 @@
+import sys
+
 import pandas as pd
 from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from table_store import load_table  # noqa: E402
+
+
 def summary_stats_gradcafe(input_path):
-    df = pd.read_csv(input_path)
+    df = load_table(input_path)
 
     # GPA summary
     gpa_summary = df.groupby("decision")["gpa_raw"].describe()
@@ -1,21 +1,13 @@
-import pandas as pd
-import re
-
-def normalize_name(name):
-    """
-    Apply the same university normalization pipeline used in QS cleaning:
-    - lowercase
-    - remove punctuation
-    - collapse multiple spaces
-    """
-    name = str(name).lower()
-    name = re.sub(r"[^a-z0-9\s]", "", name)   # remove punctuation
-    name = re.sub(r"\s+", " ", name)          # remove multiple spaces
-    return name.strip()
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from name_normalization import normalize_column  # noqa: E402
+from table_store import load_table, save_table  # noqa: E402
 
 
 def normalize_gradcafe(input_path, output_path):
-    df = pd.read_csv(input_path)
+    df = load_table(input_path)
 
     # Detect institution column (adjust if your column name is different)
     possible_cols = [
@@ -34,10 +26,10 @@ def normalize_gradcafe(input_path, output_path):
     if inst_col is None:
         raise ValueError(f"No institution-related column found: {possible_cols}")
 
-    # Apply the normalization
-    df["institution_clean"] = df[inst_col].apply(normalize_name)
+    # Apply the normalization (once per distinct name, cached in cache/normalized_names.json)
+    df["institution_clean"] = normalize_column(df[inst_col])
 
-    df.to_csv(output_path, index=False)
+    save_table(df, output_path)
     print(f"[OK] institution_clean added → {output_path}")
 
 
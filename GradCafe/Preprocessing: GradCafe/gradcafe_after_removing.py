@@ -1,43 +1,51 @@
-import pandas as pd
+import sys
 from pathlib import Path
 
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from table_store import load_table, save_table  # noqa: E402
+
 # Bu script'in bulunduğu klasörü bul
 BASE_DIR = Path(__file__).resolve().parent
 
-# Dosya yolunu oluştur (adı tam olarak klasör yapına göre)
-csv_path = BASE_DIR / "gradcafe_accepted_rejected_raw.csv"
+CRITICAL_COLS = ["university", "term", "citizenship", "gpa_raw"]
+
 
-print("Reading CSV from:", csv_path)
-df = pd.read_csv(csv_path)
+def apply_drop_rules(df: pd.DataFrame) -> pd.DataFrame:
+    """Drop rules of this step (sync_gradcafe.py applies the same ones to new entries)."""
+    df = df.dropna(subset=CRITICAL_COLS)
 
-# 2) Info görmek istiyorsan:
-print(df.info())
+    # decided to drop rows which have gre_total missing and delete gre_q,gre_v,gre_aw columns
+    df = df.dropna(subset=["gre_total"])
+    df = df.drop(columns=["gre_q", "gre_v", "gre_aw"])
 
-# 3) Drop rules
-critical_cols = ["university", "term", "citizenship", "gpa_raw"]
-df = df.dropna(subset=critical_cols)
+    # 0-4 dışını drop et
+    df = df.assign(gpa_raw=pd.to_numeric(df["gpa_raw"], errors="coerce"))
+    return df[(df["gpa_raw"] > 0) & (df["gpa_raw"] <= 4)].copy()
 
-df.to_csv("gradcafe_after_removing.csv", index=False)
 
-df = pd.read_csv("gradcafe_after_removing.csv")
+def remove_rows(input_path, output_path, after_removing_path=None):
+    print("Reading CSV from:", input_path)
+    df = load_table(input_path)
 
-df.head()
-df.info()
-df.describe(include='all')
+    # Info görmek istiyorsan:
+    df.info()
 
-# decided to drop rows which have gre_total missing and delete gre_q,gre_v,gre_aw columns
-df = df.dropna(subset=["gre_total"])
-df = df.drop(columns=["gre_q", "gre_v", "gre_aw"])
+    if after_removing_path:
+        save_table(df.dropna(subset=CRITICAL_COLS), after_removing_path)
 
-# 1) GPA'yı numeric yap
-df["gpa_raw"] = pd.to_numeric(df["gpa_raw"], errors="coerce")
+    before = len(df)
+    df = apply_drop_rules(df)
+    save_table(df, output_path)
 
-# 2) 0-4 dışını drop et
-before = len(df)
-df = df[(df["gpa_raw"] > 0) & (df["gpa_raw"] <= 4)].copy()
-after = len(df)
+    print(f"Dropped {before - len(df)} rows (missing fields, missing GRE, GPA out of 0-4 range). Remaining: {len(df)}")
+    print(f"✔️ Saved as {output_path}")
 
-df.to_csv("gradcafe_clean_final2.csv", index=False)
 
-print(f"Dropped {before - after} rows due to GPA out of 0-4 range. Remaining: {after}")
-print("✔️ Saved as gradcafe_clean_final2.csv")
\ No newline at end of file
+if __name__ == "__main__":
+    remove_rows(
+        BASE_DIR / "gradcafe_accepted_rejected_raw.csv",
+        "gradcafe_clean_final2.csv",
+        "gradcafe_after_removing.csv",
+    )
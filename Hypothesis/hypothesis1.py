@@ -1,39 +1,42 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 from pathlib import Path
 import statsmodels.api as sm
 import matplotlib.pyplot as plt
+from scipy.optimize import minimize_scalar
+from scipy.special import expit
+from scipy.stats import norm
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from feature_store import load_features  # noqa: E402
 
 # ---- CONFIG ----
 DATA_PATH = "merged_matched_only.csv"
 OUT_DIR = Path("results_hyp1")
 TAU_MIN, TAU_MAX, TAU_STEP = 2.5, 3.95, 0.05
+CONTROLS = ["gre_total", "log_rank", "is_international"]  # used if present
 
+NEWTON_TOL = 1e-10
+NEWTON_MAX_ITER = 50
+N_WORKERS = 1
 
-def prepare_data(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-
-    # decision -> y
-    df["y"] = df["decision"].astype(str).str.strip().str.lower().map({"accepted": 1, "rejected": 0})
-
-    # numeric fields
-    df["gpa_raw"] = pd.to_numeric(df["gpa_raw"], errors="coerce")
+N_BOOT = 5000
+BOOT_TOL = 1e-7  # Newton step tolerance inside replicates
+BOOT_SEED = 42
+CI_LEVEL = 0.95
 
-    if "gre_total" in df.columns:
-        df["gre_total"] = pd.to_numeric(df["gre_total"], errors="coerce")
 
-    if "Rank2025" in df.columns:
-        df["Rank2025"] = pd.to_numeric(df["Rank2025"], errors="coerce")
-        df["log_rank"] = np.log(df["Rank2025"].clip(lower=1))
-
-    if "citizenship" in df.columns:
-        df["is_international"] = (df["citizenship"].astype(str).str.lower().str.strip() == "international").astype(int)
-
-    # drop missing target/GPA
-    df = df.dropna(subset=["y", "gpa_raw"])
-    df = df[(df["gpa_raw"] > 0) & (df["gpa_raw"] <= 4)].copy()
-
-    return df
+def prepare_data(df: pd.DataFrame) -> pd.DataFrame:
+    # df is the feature_store frame: y, log_rank, is_international are there and
+    # a GPA outside (0, 4] is already missing; Hyp1 needs GPA on every row
+    return df.dropna(subset=["gpa_raw"]).copy()
 
 
 def fit_piecewise_logit(df: pd.DataFrame, tau: float):
@@ -65,24 +68,304 @@ def fit_piecewise_logit(df: pd.DataFrame, tau: float):
     return model
 
 
-def tau_grid_search(df: pd.DataFrame) -> pd.DataFrame:
+# ---- fast tau search ----
+# Only the gpa_over column depends on tau, so the design matrix is built once
+# and each tau just rewrites that column. Taus are fitted in order and every
+# Newton solve starts from the previous tau's coefficients, which are nearly
+# optimal already (2-3 iterations instead of a cold start).
+
+def build_design(df: pd.DataFrame):
+    """Design matrix [const, gpa_raw, gpa_over, controls...] with NaN rows dropped once."""
+    cols = ["gpa_raw"] + [c for c in CONTROLS if c in df.columns]
+    mask = df[cols].notna().all(axis=1) & df["y"].notna()
+    d = df.loc[mask, cols]
+
+    X = np.empty((len(d), len(cols) + 2), dtype=np.float64)
+    X[:, 0] = 1.0
+    X[:, 1] = d["gpa_raw"].to_numpy(dtype=np.float64)
+    X[:, 3:] = d[cols[1:]].to_numpy(dtype=np.float64)
+    y = df.loc[mask, "y"].to_numpy(dtype=np.float64)
+    names = ["const", "gpa_raw", "gpa_over"] + cols[1:]
+    return X, y, names
+
+
+def newton_logit(X: np.ndarray, y: np.ndarray, beta0=None, tol=NEWTON_TOL, max_iter=NEWTON_MAX_ITER, w=None):
+    """
+    Logit MLE by Newton-Raphson with step halving. w are optional frequency
+    weights (bootstrap counts). Returns (beta, loglik, hessian, n_iter).
+    """
+    beta = np.zeros(X.shape[1]) if beta0 is None else np.array(beta0, dtype=np.float64)
+    w = np.ones(len(y)) if w is None else w
+    wy = w * y
+
+    def loglik(eta):
+        # log(1 + e^eta) without overflow
+        return float(wy @ eta - w @ (np.maximum(eta, 0.0) + np.log1p(np.exp(-np.abs(eta)))))
+
+    eta = X @ beta
+    ll = loglik(eta)
+    for it in range(1, max_iter + 1):
+        p = expit(eta)
+        grad = X.T @ (wy - w * p)
+        hess = (X * (w * p * (1.0 - p))[:, None]).T @ X
+        step = np.linalg.solve(hess, grad)
+
+        t = 1.0
+        while True:
+            new_beta = beta + t * step
+            new_eta = X @ new_beta
+            new_ll = loglik(new_eta)
+            if new_ll >= ll - 1e-10 * (1.0 + abs(ll)) or t < 1e-8:
+                break
+            t *= 0.5
+        beta, eta, ll = new_beta, new_eta, new_ll
+        if np.max(np.abs(t * step)) < tol:
+            break
+
+    p = expit(eta)
+    hess = (X * (w * p * (1.0 - p))[:, None]).T @ X
+    return beta, ll, hess, it
+
+
+def newton_logit_taus(X: np.ndarray, y: np.ndarray, taus, beta0, w=None, tol=BOOT_TOL, max_iter=NEWTON_MAX_ITER):
+    """
+    Fits every tau at once. Only the gpa_over column (index 2) depends on tau,
+    so with Z = the shared columns and G = gpa_over for all taus (n x T), the
+    T gradients and Hessians come out of a few (n x T) matrix products:
+    H_zz = (Z_i Z_j)' S, H_zg = Z' (G S), H_gg = sum(G^2 S), with S the
+    Newton weights per tau. Taus that converged stop iterating.
+    beta0 is one start for all taus (p,) or one per tau (T, p).
+    Returns (betas (T, p), logliks (T,)).
+    """
+    taus = np.asarray(taus, dtype=np.float64)
+    w = np.ones(len(y)) if w is None else w
+    wy = (w * y)[:, None]
+    zi = [j for j in range(X.shape[1]) if j != 2]
+    Z = X[:, zi]
+    q = Z.shape[1]
+    ZZ = (Z[:, :, None] * Z[:, None, :]).reshape(len(Z), q * q)
+    G_all = np.maximum(X[:, 1:2] - taus[None, :], 0.0)
+    # tau above every GPA: gpa_over is all zeros, keep its coefficient at 0
+    degenerate = ~G_all.any(axis=0)
+
+    def loglik(eta):
+        return wy[:, 0] @ eta - w @ (np.maximum(eta, 0.0) + np.log1p(np.exp(-np.abs(eta))))
+
+    beta = np.array(np.broadcast_to(beta0, (len(taus), X.shape[1])), dtype=np.float64)
+    beta[degenerate, 2] = 0.0
+    eta = Z @ beta[:, zi].T + G_all * beta[:, 2]
+    ll = loglik(eta)
+    act = np.arange(len(taus))
+    for _ in range(max_iter):
+        G, P = G_all[:, act], expit(eta[:, act])
+        R = wy - w[:, None] * P
+        S = w[:, None] * P * (1.0 - P)
+
+        T = len(act)
+        grad = np.empty((T, q + 1))
+        hess = np.empty((T, q + 1, q + 1))
+        grad[:, :q] = (Z.T @ R).T
+        grad[:, q] = (G * R).sum(axis=0)
+        hess[:, :q, :q] = (ZZ.T @ S).T.reshape(T, q, q)
+        hess[:, :q, q] = hess[:, q, :q] = (Z.T @ (G * S)).T
+        hess[:, q, q] = (G * G * S).sum(axis=0)
+        deg = degenerate[act]
+        grad[deg, q], hess[deg, q, q] = 0.0, 1.0
+        try:
+            d = np.linalg.solve(hess, grad[:, :, None])[:, :, 0]
+        except np.linalg.LinAlgError:
+            # separated replicate: weights underflow to 0 on the rows above tau
+            d = np.matmul(np.linalg.pinv(hess), grad[:, :, None])[:, :, 0]
+        step = np.empty_like(d)
+        step[:, zi], step[:, 2] = d[:, :q], d[:, q]
+
+        t = np.ones(T)
+        while True:
+            new_beta = beta[act] + t[:, None] * step
+            new_eta = Z @ new_beta[:, zi].T + G * new_beta[:, 2]
+            new_ll = loglik(new_eta)
+            bad = (new_ll < ll[act] - 1e-10 * (1.0 + np.abs(ll[act]))) & (t >= 1e-8)
+            if not bad.any():
+                break
+            t[bad] *= 0.5
+        beta[act], eta[:, act], ll[act] = new_beta, new_eta, new_ll
+        act = act[np.max(np.abs(t[:, None] * step), axis=1) >= tol]
+        if not act.size:
+            break
+    return beta, ll
+
+
+def _fit_tau_path(X: np.ndarray, y: np.ndarray, taus, beta0=None) -> list:
+    """Fits the taus in the given order, warm-starting each from the previous one."""
+    X = X.copy()
+    gpa = X[:, 1]
+    k = X.shape[1]
     rows = []
-    taus = np.round(np.arange(TAU_MIN, TAU_MAX + 1e-9, TAU_STEP), 2)
-
+    beta = beta0
     for tau in taus:
-        model = fit_piecewise_logit(df, tau)
+        np.maximum(gpa - tau, 0.0, out=X[:, 2])
+        try:
+            beta, ll, hess, n_iter = newton_logit(X, y, beta)
+            se = np.sqrt(np.diag(np.linalg.inv(hess)))
+        except np.linalg.LinAlgError:
+            # e.g. tau above every GPA -> gpa_over is all zeros
+            rows.append({"tau": tau, "AIC": np.nan, "n": len(y), "beta_gpa_over": np.nan,
+                         "p_gpa_over": np.nan, "loglik": np.nan, "newton_iter": 0})
+            beta = None
+            continue
         rows.append({
             "tau": tau,
-            "AIC": model.aic,
-            "n": int(model.nobs),
-            "beta_gpa_over": float(model.params.get("gpa_over", np.nan)),
-            "p_gpa_over": float(model.pvalues.get("gpa_over", np.nan)),
+            "AIC": 2 * k - 2 * ll,
+            "n": len(y),
+            "beta_gpa_over": float(beta[2]),
+            "p_gpa_over": float(2 * norm.sf(abs(beta[2] / se[2]))),
+            "loglik": ll,
+            "newton_iter": n_iter,
         })
+    return rows
+
+
+def tau_grid_search(df: pd.DataFrame, taus=None, n_workers=N_WORKERS) -> pd.DataFrame:
+    if taus is None:
+        taus = np.round(np.arange(TAU_MIN, TAU_MAX + 1e-9, TAU_STEP), 2)
+    taus = np.sort(np.asarray(taus, dtype=np.float64))
+    X, y, _ = build_design(df)
+
+    if n_workers <= 1 or len(taus) < 2 * n_workers:
+        rows = _fit_tau_path(X, y, taus)
+    else:
+        # contiguous chunks, so warm starts still work inside each worker
+        chunks = np.array_split(taus, n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers) as ex:
+            parts = ex.map(_fit_tau_path, [X] * len(chunks), [y] * len(chunks), chunks)
+            rows = [r for part in parts for r in part]
 
     res = pd.DataFrame(rows).sort_values("AIC").reset_index(drop=True)
     return res
 
 
+def profile_tau(df: pd.DataFrame, lo: float, hi: float, xatol=1e-4) -> dict:
+    """
+    Continuous tau: maximizes the profile log-likelihood on [lo, hi] (bounded
+    Brent). Start from a grid search and pass the neighbours of the grid best.
+    """
+    X, y, _ = build_design(df)
+    Xt = X.copy()
+    state = {"beta": None, "n_evals": 0}
+
+    def neg_profile_ll(tau):
+        np.maximum(X[:, 1] - tau, 0.0, out=Xt[:, 2])
+        beta, ll, _, _ = newton_logit(Xt, y, state["beta"])
+        state["beta"] = beta  # warm start for the next evaluation
+        state["n_evals"] += 1
+        return -ll
+
+    opt = minimize_scalar(neg_profile_ll, bounds=(lo, hi), method="bounded", options={"xatol": xatol})
+    (row,) = _fit_tau_path(X, y, [float(opt.x)], state["beta"])
+    row["n_evals"] = state["n_evals"]
+    return row
+
+
+# ---- bootstrap ----
+# A replicate is a vector of resampling counts over the rows of the shared
+# design matrix, fitted as frequency weights: no DataFrame or design copies,
+# only the rows drawn at least once are kept (~63%).
+
+def _bootstrap_replicate(X, y, taus, rng, beta0, refine: bool) -> dict:
+    w = np.bincount(rng.integers(0, len(y), len(y)), minlength=len(y)).astype(np.float64)
+    keep = w > 0
+    Xb, yb, wb = X[keep], y[keep], w[keep]
+
+    betas, lls = newton_logit_taus(Xb, yb, taus, beta0, wb)
+    i = int(np.argmax(lls))
+    out = {"tau_grid": float(taus[i]), "beta_gpa_over": float(betas[i][2])}
+
+    if refine:
+        state = {"beta": betas[i]}
+        lo, hi = taus[max(i - 1, 0)], taus[min(i + 1, len(taus) - 1)]
+
+        def neg_ll(tau):
+            b, ll = newton_logit_taus(Xb, yb, [tau], state["beta"], wb)
+            state["beta"] = b[0]
+            return -float(ll[0])
+
+        opt = minimize_scalar(neg_ll, bounds=(lo, hi), method="bounded", options={"xatol": 1e-4})
+        out["tau_profile"] = float(opt.x)
+    return out
+
+
+def _bootstrap_chunk(X, y, taus, beta0, reps, seed: int, refine: bool) -> list:
+    rows = []
+    for rep in reps:
+        # seeded per replicate, so results do not depend on how reps are split across workers
+        rng = np.random.default_rng([seed, int(rep)])
+        rows.append({"rep": int(rep), **_bootstrap_replicate(X, y, taus, rng, beta0, refine)})
+    return rows
+
+
+def bootstrap_tau(df: pd.DataFrame, taus, n_reps=N_BOOT, n_workers=N_WORKERS,
+                  seed=BOOT_SEED, refine=True) -> pd.DataFrame:
+    taus = np.sort(np.asarray(taus, dtype=np.float64))
+    X, y, _ = build_design(df)
+    # full-sample fit per tau: each replicate starts every tau from it
+    beta0, _ = newton_logit_taus(X, y, taus, np.zeros(X.shape[1]))
+
+    reps = np.arange(n_reps)
+    if n_workers <= 1:
+        rows = _bootstrap_chunk(X, y, taus, beta0, reps, seed, refine)
+    else:
+        chunks = np.array_split(reps, n_workers * 4)
+        with ProcessPoolExecutor(max_workers=n_workers) as ex:
+            futs = [ex.submit(_bootstrap_chunk, X, y, taus, beta0, c, seed, refine) for c in chunks if len(c)]
+            rows = [r for f in futs for r in f.result()]
+    return pd.DataFrame(rows).sort_values("rep").reset_index(drop=True)
+
+
+def summarize_bootstrap(boot: pd.DataFrame, tau_hat: float, taus, level=CI_LEVEL) -> dict:
+    col = "tau_profile" if "tau_profile" in boot.columns else "tau_grid"
+    t = boot[col].to_numpy()
+    a = (1 - level) / 2
+    return {
+        "n_reps": int(len(t)),
+        "estimate": col,
+        "tau_hat": float(tau_hat),
+        "ci_level": level,
+        "ci_percentile": [float(np.quantile(t, a)), float(np.quantile(t, 1 - a))],
+        "mean": float(t.mean()),
+        "sd": float(t.std(ddof=1)) if len(t) > 1 else float("nan"),
+        "median": float(np.median(t)),
+        # replicates whose grid optimum sits on the search boundary
+        "share_at_grid_min": float((boot["tau_grid"] == np.min(taus)).mean()),
+        "share_at_grid_max": float((boot["tau_grid"] == np.max(taus)).mean()),
+        "share_beta_gpa_over_positive": float((boot["beta_gpa_over"] > 0).mean()),
+    }
+
+
+def plot_bootstrap_tau(boot: pd.DataFrame, summary: dict, outpath: Path):
+    col = summary["estimate"]
+    plt.figure()
+    plt.hist(boot[col], bins=40)
+    plt.axvline(summary["tau_hat"], linestyle="--")
+    for v in summary["ci_percentile"]:
+        plt.axvline(v, linestyle=":")
+    plt.xlabel("Best tau (bootstrap replicate)")
+    plt.ylabel("Count")
+    plt.title(f"Bootstrap distribution of tau ({summary['n_reps']} replicates)")
+    plt.savefig(outpath, bbox_inches="tight")
+    plt.close()
+
+
+def check_against_statsmodels(df: pd.DataFrame, taus, tol=1e-6) -> float:
+    """Max |AIC difference| between the fast path and fit_piecewise_logit."""
+    fast = tau_grid_search(df, taus).set_index("tau")
+    err = 0.0
+    for tau in taus:
+        err = max(err, abs(fast.loc[tau, "AIC"] - fit_piecewise_logit(df, tau).aic))
+    if err > tol:
+        raise AssertionError(f"Fast tau search differs from statsmodels: max |dAIC| = {err:.3e}")
+    return err
+
+
 def plot_acceptance_rate_by_gpa(df: pd.DataFrame, tau_best: float, outpath: Path):
     bins = np.arange(2.5, 4.01, 0.1)  # start at 2.5
 
@@ -104,23 +387,40 @@ def plot_acceptance_rate_by_gpa(df: pd.DataFrame, tau_best: float, outpath: Path
 
 
 
-def main():
+def main(tau_step=TAU_STEP, n_workers=N_WORKERS, n_boot=0):
     OUT_DIR.mkdir(exist_ok=True)
 
-    df = pd.read_csv(DATA_PATH)
+    df = load_features(DATA_PATH)
     df = prepare_data(df)
 
     print("Rows after cleaning:", len(df))
     print("Acceptance rate:", df["y"].mean())
 
     # 1) tau search (single run)
-    res = tau_grid_search(df)
-    res.to_csv(OUT_DIR / "tau_search.csv", index=False)
+    taus = np.round(np.arange(TAU_MIN, TAU_MAX + 1e-9, tau_step), 6)
+    t0 = time.perf_counter()
+    res = tau_grid_search(df, taus, n_workers)
+    grid_s = time.perf_counter() - t0
+    res[["tau", "AIC", "n", "beta_gpa_over", "p_gpa_over"]].to_csv(OUT_DIR / "tau_search.csv", index=False)
 
     tau_best = float(res.loc[0, "tau"])
+    print(f"Grid: {len(taus)} taus (step {tau_step}) in {grid_s:.2f}s, "
+          f"{res['newton_iter'].mean():.1f} Newton iterations per tau")
     print("Best tau:", tau_best)
     print("Best row:", res.loc[0].to_dict())
 
+    err = check_against_statsmodels(df, [taus[0], tau_best, taus[-1]])
+    print(f"[OK] Matches statsmodels Logit: max |dAIC| = {err:.2e}")
+
+    # continuous tau between the grid neighbours of the best one
+    t0 = time.perf_counter()
+    prof = profile_tau(df, max(TAU_MIN, tau_best - tau_step), min(TAU_MAX, tau_best + tau_step))
+    print(f"Profile-likelihood tau: {prof['tau']:.4f} (AIC={prof['AIC']:.3f}, "
+          f"{prof['n_evals']} evaluations, {time.perf_counter() - t0:.2f}s)")
+    with open(OUT_DIR / "tau_best.json", "w") as f:
+        json.dump({"tau_grid": tau_best, "grid_step": tau_step, "AIC_grid": float(res.loc[0, "AIC"]),
+                   "tau_profile": prof["tau"], "AIC_profile": prof["AIC"]}, f, indent=2)
+
     # 2) fit best model + save summary
     best_model = fit_piecewise_logit(df, tau_best)
     with open(OUT_DIR / "best_model_summary.txt", "w") as f:
@@ -129,8 +429,29 @@ def main():
     # 3) only 1 simple plot (no predicted curves!)
     plot_acceptance_rate_by_gpa(df, tau_best, OUT_DIR / "acceptance_rate_binned.png")
 
+    # 4) optional bootstrap CI for tau
+    if n_boot > 0:
+        t0 = time.perf_counter()
+        boot = bootstrap_tau(df, taus, n_boot, n_workers)
+        boot_s = time.perf_counter() - t0
+        summary = summarize_bootstrap(boot, prof["tau"], taus)
+        summary["seconds"] = boot_s
+        boot.to_csv(OUT_DIR / "bootstrap_tau.csv", index=False)
+        with open(OUT_DIR / "bootstrap_tau_summary.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        plot_bootstrap_tau(boot, summary, OUT_DIR / "bootstrap_tau_hist.png")
+        lo, hi = summary["ci_percentile"]
+        print(f"Bootstrap: {n_boot} replicates in {boot_s:.1f}s | "
+              f"{CI_LEVEL:.0%} CI for tau = [{lo:.3f}, {hi:.3f}] (sd {summary['sd']:.3f})")
+
     print("✅ Done. Outputs saved in:", OUT_DIR.resolve())
 
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser(description="Piecewise-logit GPA threshold (tau) search.")
+    ap.add_argument("--step", type=float, default=TAU_STEP, help="tau grid step, e.g. 0.001")
+    ap.add_argument("--workers", type=int, default=N_WORKERS, help=f"processes for the grid (cpu={os.cpu_count()})")
+    ap.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                    help=f"bootstrap replicates for a tau CI (e.g. {N_BOOT}); 0 = off")
+    args = ap.parse_args()
+    main(args.step, args.workers, args.bootstrap)
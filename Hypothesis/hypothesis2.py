@@ -1,40 +1,22 @@
+import sys
+
 import numpy as np
 import pandas as pd
 from pathlib import Path
 import statsmodels.api as sm
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from feature_store import load_features  # noqa: E402
+
 DATA_PATH = "merged_matched_only.csv"
 OUT_DIR = Path("results_hyp2")
 
 
 def prepare_data(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-
-    # target
-    df["y"] = df["decision"].astype(str).str.strip().str.lower().map({"accepted": 1, "rejected": 0})
-
-    # numeric
-    df["Rank2025"] = pd.to_numeric(df.get("Rank2025"), errors="coerce")
-    df["gpa_raw"] = pd.to_numeric(df.get("gpa_raw"), errors="coerce")
-    if "gre_total" in df.columns:
-        df["gre_total"] = pd.to_numeric(df["gre_total"], errors="coerce")
-
-    # log-rank (rank küçük=iyi olduğu için log kullanmak daha stabil)
-    df["log_rank"] = np.log(df["Rank2025"].clip(lower=1))
-
-    # citizenship dummy
-    if "citizenship" in df.columns:
-        df["is_international"] = (df["citizenship"].astype(str).str.lower().str.strip() == "international").astype(int)
-
+    # df is the feature_store frame (y, log_rank, is_international; GPA outside 0-4 is missing)
     # keep rows that can be used for rank analysis
-    df = df.dropna(subset=["y", "Rank2025", "log_rank"]).copy()
-
-    # GPA bounds (optional, consistent with Hyp1)
-    if "gpa_raw" in df.columns:
-        df = df[(df["gpa_raw"].isna()) | ((df["gpa_raw"] > 0) & (df["gpa_raw"] <= 4))].copy()
-
-    return df
+    return df.dropna(subset=["Rank2025", "log_rank"]).copy()
 
 
 def fit_logit(df: pd.DataFrame, X_cols):
@@ -75,7 +57,7 @@ def plot_rank_binned_acceptance(df: pd.DataFrame, outpath: Path):
 def main():
     OUT_DIR.mkdir(exist_ok=True)
 
-    df = pd.read_csv(DATA_PATH)
+    df = load_features(DATA_PATH)
     df = prepare_data(df)
 
     print("Rows used for Hyp2:", len(df))
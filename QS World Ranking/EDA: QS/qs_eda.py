@@ -1,13 +1,18 @@
-import pandas as pd
+import sys
 from pathlib import Path
 
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from table_store import load_table, save_table  # noqa: E402
+
 def merge_matched_only(qs_path, gradcafe_path, output_path):
     """
     Merges QS + GradCafe on 'institution_clean' and keeps ONLY matched rows (inner join).
     Outputs a merged CSV.
     """
-    qs = pd.read_csv(qs_path)
-    grad = pd.read_csv(gradcafe_path)
+    qs = load_table(qs_path)
+    grad = load_table(gradcafe_path)
 
     # Safety checks
     if "institution_clean" not in qs.columns:
@@ -22,7 +27,6 @@ def merge_matched_only(qs_path, gradcafe_path, output_path):
     # Optional: QS tarafında aynı institution_clean birden fazla olabilir -> tekilleştir
     # Rank2025 varsa en iyi (en küçük) rank'ı seçer
     if "Rank2025" in qs.columns:
-        qs["Rank2025"] = pd.to_numeric(qs["Rank2025"], errors="coerce")
         qs = qs.sort_values("Rank2025").drop_duplicates(subset=["institution_clean"], keep="first")
     else:
         qs = qs.drop_duplicates(subset=["institution_clean"], keep="first")
@@ -34,7 +38,7 @@ def merge_matched_only(qs_path, gradcafe_path, output_path):
     print(f"QS rows: {len(qs)}")
     print(f"✅ Matched rows (inner join): {len(merged)}")
 
-    merged.to_csv(output_path, index=False)
+    save_table(merged, output_path)
     print(f"✅ Saved merged matched-only CSV → {output_path}")
 
 
@@ -1,5 +1,35 @@
-import pandas as pd
+import argparse
 import re
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:   # optional (requirements.txt): pandas .str methods instead
+    pa = pc = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from name_normalization import normalize_column  # noqa: E402
+from table_store import save_table  # noqa: E402
+
+# =========================
+# CONFIG
+# =========================
+NUMERIC_COLS = ["Academic", "Employer", "Citations", "H", "IRN", "Score"]
+RANK_COLS = {"2025": "Rank2025", "2024": "Rank2024"}
+
+# "201+" | "201-250" / "201–250" | "2"  (after a leading "=" is dropped)
+RANK_PATTERN = r"^(?P<plus>\d+)\+$|^(?P<low>\d+)[–-](?P<high>\d+)|^(?P<num>\d+)$"
+
+CHECK_SCALE = 500   # --check also times both paths on CHECK_SCALE copies of the raw file
+CHECK_SEED = 42     # each copy gets shifted ranks and noisy scores, so values do not repeat
+
 
 def convert_rank(value):
     """
@@ -8,6 +38,7 @@ def convert_rank(value):
     "501-550" -> 525
     "201+" -> 201
     "=2" -> 2
+    Per-value reference for parse_rank_column (used by --check).
     """
     if pd.isna(value):
         return None
@@ -36,43 +67,176 @@ def convert_rank(value):
     return None
 
 
-def normalize_name(name):
+def by_unique(s: pd.Series, fn) -> pd.Series:
     """
-    Remove punctuation, lowercase, strip spaces.
+    Runs a column-level transform on the distinct values of `s` only and
+    broadcasts the result back by code (QS years / subjects repeat the same
+    ranks, scores and names, so the cost follows distinct values, not rows).
     """
-    name = str(name).lower()
+    codes, uniques = pd.factorize(s)
+    out = fn(pd.Series(uniques, dtype=object))
+    return out.reindex(codes).set_axis(s.index).rename(s.name)   # code -1 (NaN) -> NaN
 
-    # Remove punctuation
-    name = re.sub(r"[^a-z0-9\s]", "", name)
 
-    # Remove double spaces
-    name = re.sub(r"\s+", " ", name)
+def _arrow_strings(s: pd.Series):
+    """`s` as a pyarrow string array (NaN -> null), or None without pyarrow / for non-text values."""
+    if pa is None:
+        return None
+    try:
+        return pa.array(s.to_numpy(dtype=object), type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
 
-    return name.strip()
 
+def _parse_ranks(v: pd.Series) -> pd.Series:
+    arr = _arrow_strings(v)
+    if arr is None:
+        v = v.astype("string").str.strip()
+        v = v.mask(v.str.startswith("=", na=False), v.str.replace("=", "", regex=False))
+        parts = v.str.extract(RANK_PATTERN).astype("float64")
+        return parts["plus"].fillna((parts["low"] + parts["high"]) / 2).fillna(parts["num"])
 
-def clean_qs_data(input_path, output_path):
-    df = pd.read_csv(input_path, sep=";")
+    arr = pc.utf8_trim_whitespace(arr)
+    arr = pc.if_else(pc.starts_with(arr, "="), pc.replace_substring(arr, "=", ""), arr)
+    parts = pc.extract_regex(arr, RANK_PATTERN)   # groups that did not take part come back as ""
 
-    # Fix comma decimals
-    df = df.applymap(lambda x: str(x).replace(",", ".") if isinstance(x, str) else x)
+    def group(name):
+        field = pc.struct_field(parts, name)
+        return pc.cast(pc.if_else(pc.equal(field, ""), pa.scalar(None, pa.string()), field), pa.float64())
+
+    mid = pc.divide(pc.add(group("low"), group("high")), 2.0)
+    out = pc.coalesce(group("plus"), mid, group("num"))
+    return pd.Series(out.to_numpy(zero_copy_only=False), index=v.index, name=v.name, dtype="float64")
+
+
+def parse_rank_column(s: pd.Series) -> pd.Series:
+    """convert_rank for a whole column: one regex extract (pyarrow.compute if installed), float64 out (NaN = unparseable)."""
+    return _parse_ranks(s)
+
+
+def _to_python_strings(arr, like: pd.Series) -> pd.Series:
+    out = pd.Series(arr.to_numpy(zero_copy_only=False), index=like.index, name=like.name)
+    return out if arr.null_count == 0 else out.where(like.notna(), like)   # nulls back to the original NaN
+
+
+def fix_decimal_commas(df: pd.DataFrame) -> pd.DataFrame:
+    """"91,7" -> "91.7" in every text column (one column-level replace instead of applymap)."""
+    for col in df.columns[df.dtypes == object]:
+        arr = _arrow_strings(df[col])
+        if arr is None:
+            df[col] = df[col].str.replace(",", ".", regex=False)
+        elif pc.any(pc.match_substring(arr, ",")).as_py():   # columns without a comma stay as they are
+            df[col] = _to_python_strings(pc.replace_substring(arr, ",", "."), df[col])
+    return df
+
+
+def parse_decimal_column(s: pd.Series) -> pd.Series:
+    """fix_decimal_commas + pd.to_numeric(errors="coerce") of one column, in one pass over the arrow strings."""
+    arr = _arrow_strings(s)
+    if arr is not None:
+        try:
+            out = pc.cast(pc.replace_substring(arr, ",", "."), pa.float64())
+            return pd.Series(out.to_numpy(zero_copy_only=False), index=s.index, name=s.name, dtype="float64")
+        except pa.ArrowInvalid:
+            pass   # something that is not a plain number: pandas' rules below
+    if s.dtype == object:
+        s = s.str.replace(",", ".", regex=False)
+    return pd.to_numeric(s, errors="coerce")
+
+
+def clean_qs_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
 
     # Convert numeric columns
-    numeric_cols = ["Academic", "Employer", "Citations", "H", "IRN", "Score"]
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in NUMERIC_COLS:
+        df[col] = parse_decimal_column(df[col])
+    df = fix_decimal_commas(df)
 
     # Clean rank columns
-    df["Rank2025"] = df["2025"].apply(convert_rank)
-    df["Rank2024"] = df["2024"].apply(convert_rank)
+    for raw, col in RANK_COLS.items():
+        df[col] = parse_rank_column(df[raw])
+    return df
+
+
+def _clean_qs_frame_legacy(df: pd.DataFrame) -> pd.DataFrame:
+    """The previous per-cell path (applymap + convert_rank via .apply), kept for --check."""
+    df = df.applymap(lambda x: str(x).replace(",", ".") if isinstance(x, str) else x)
+    for col in NUMERIC_COLS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    for raw, col in RANK_COLS.items():
+        df[col] = df[raw].apply(convert_rank)
+    return df
+
+
+def clean_qs_data(input_path, output_path):
+    df = clean_qs_frame(pd.read_csv(input_path, sep=";"))
 
     # Normalize institution name
-    df["institution_clean"] = df["Institution"].apply(normalize_name)
+    df["institution_clean"] = normalize_column(df["Institution"])
 
-    # Save cleaned file
-    df.to_csv(output_path, index=False)
+    # Save cleaned file (+ typed Parquet copy)
+    save_table(df, output_path)
     print(f"[OK] Cleaned QS data saved to {output_path}")
 
 
+def distinct_frame(raw: pd.DataFrame, scale: int, seed: int = CHECK_SEED) -> pd.DataFrame:
+    """
+    `scale` copies of raw in which (almost) no cell repeats: every number in the
+    rank columns is shifted by 1000 per copy ("=2" -> "=1002", "201-250" ->
+    "1201-1250"), scores get noise, institution names a copy number.
+    """
+    rng = np.random.default_rng(seed)
+    parts = []
+    for i in range(scale):
+        part = raw.copy()
+        for col in RANK_COLS:
+            part[col] = part[col].str.replace(r"\d+", lambda m: str(int(m.group()) + 1000 * i), regex=True)
+        for col in NUMERIC_COLS:
+            score = pd.to_numeric(part[col].str.replace(",", ".", regex=False), errors="coerce")
+            noisy = (score + rng.normal(0, 1, len(part))).round(6)
+            part[col] = noisy.map("{:.6f}".format).str.replace(".", ",", regex=False).where(score.notna())
+        part["Institution"] = part["Institution"] + f" ({i})"
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def check(input_path, scale=CHECK_SCALE):
+    """Vectorized vs per-cell path: identical frames on the raw file (+ edge cases), then timings at scale."""
+    raw = pd.read_csv(input_path, sep=";")
+
+    edge = pd.Series(["=1", " 201+ ", "201–250", "501-550", "=2", "12", "", "n/a", None, "=201-250"])
+    expected = edge.apply(convert_rank).astype("float64")
+    pd.testing.assert_series_equal(parse_rank_column(edge), expected, check_names=False)
+
+    big = distinct_frame(raw, scale)
+    distinct = big[list(RANK_COLS) + NUMERIC_COLS].nunique().sum() / big[list(RANK_COLS) + NUMERIC_COLS].count().sum()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)   # DataFrame.applymap is deprecated
+        pd.testing.assert_frame_equal(clean_qs_frame(raw), _clean_qs_frame_legacy(raw))
+        print(f"[OK] {len(raw)} rows + {len(edge)} edge cases: vectorized output == per-cell output")
+
+        t0 = time.perf_counter()
+        old = _clean_qs_frame_legacy(big)
+        t_old = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    new = clean_qs_frame(big)
+    t_new = time.perf_counter() - t0
+    pd.testing.assert_frame_equal(new, old)
+    backend = "pyarrow.compute" if pa is not None else "pandas .str (no pyarrow)"
+    print(f"[OK] {len(big)} rows, {distinct:.0%} distinct rank / score cells: per-cell {t_old:.2f} s | "
+          f"vectorized ({backend}) {t_new:.2f} s ({t_old / t_new:.1f}x), same output")
+
+
 if __name__ == "__main__":
-    clean_qs_data("2025_QS_raw.csv", "qs_ranking_clean.csv")
+    ap = argparse.ArgumentParser(description="Clean the raw QS ranking export.")
+    ap.add_argument("--input", default="2025_QS_raw.csv")
+    ap.add_argument("--out", default="qs_ranking_clean.csv")
+    ap.add_argument("--check", action="store_true",
+                    help=f"compare the vectorized cleaning with the per-cell functions (and time both on "
+                         f"{CHECK_SCALE} copies with distinct ranks / scores)")
+    args = ap.parse_args()
+
+    if args.check:
+        check(args.input)
+    else:
+        clean_qs_data(args.input, args.out)
@@ -1,8 +1,14 @@
+import sys
+from pathlib import Path
+
 import pandas as pd
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from table_store import load_table  # noqa: E402
+
 def missing_value_analysis(input_path, output_summary_path=None):
     # Load cleaned QS data
-    df = pd.read_csv(input_path)
+    df = load_table(input_path)
 
     # Count of missing values per column
     missing_counts = df.isna().sum()
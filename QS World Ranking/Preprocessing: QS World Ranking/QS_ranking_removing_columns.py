@@ -1,21 +1,35 @@
-import pandas as pd
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from table_store import load_table, save_table  # noqa: E402
+
 BASE_DIR = Path(__file__).resolve().parent
 
-input_path  = BASE_DIR / "qs_ranking_clean_nomissing.csv"
-output_path = BASE_DIR / "qs_ranking_slim.csv"
+KEEP_COLS = ["2025", "Institution", "Country / Territory", "Rank2025", "institution_clean"]
+
+# keys shortened by hand in EDA: QS/qs_ranking_eda.csv (GradCafe's spelling of these schools)
+KEY_OVERRIDES = {
+    "university of wisconsinmadison": "university of wisconsin",
+    "university of california los angeles ucla": "university of california ucla",
+    "eth zurich swiss federal institute of technology": "eth zurich",
+}
+
+
+def slim_qs(input_path, output_path, key_overrides=KEY_OVERRIDES):
+    df = load_table(input_path)
 
-df = pd.read_csv(input_path)
+    # güvenlik: eksik kolon varsa hata ver
+    missing = [c for c in KEEP_COLS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {missing}\nAvailable: {list(df.columns)}")
 
-keep_cols = ["2025", "Institution", "Country / Territory", "Rank2025", "institution_clean"]
+    df = df[KEEP_COLS].copy()
+    df["institution_clean"] = df["institution_clean"].astype(object).replace(key_overrides)
+    save_table(df, output_path)
 
-# güvenlik: eksik kolon varsa hata ver
-missing = [c for c in keep_cols if c not in df.columns]
-if missing:
-    raise ValueError(f"Missing columns: {missing}\nAvailable: {list(df.columns)}")
+    print(f"✅ Saved: {output_path} | shape: {df.shape}")
 
-df = df[keep_cols].copy()
-df.to_csv(output_path, index=False)
 
-print(f"✅ Saved: {output_path} | shape: {df.shape}")
+if __name__ == "__main__":
+    slim_qs(BASE_DIR / "qs_ranking_clean_nomissing.csv", BASE_DIR / "qs_ranking_slim.csv")
@@ -1,27 +1,23 @@
-import pandas as pd
 import streamlit as st
-import joblib
 
-def norm(s: str) -> str:
-    return str(s).strip().lower()
+from model_registry import ModelRegistry
+from prob_cube import TARGET_P, WhatIf
+from topk_scoring import norm
 
-MODEL_PATH = "saved_model_hgb/best_model_hgb.joblib"
-UNI_TABLE_PATH = "saved_model_hgb/uni_table.csv"
+MODEL_ROOT = "saved_model_hgb"  # its CURRENT version; a new one is swapped in without a restart
 
 st.title("Admissions Predictor (Local Demo)")
 
 @st.cache_resource
-def load_model():
-    return joblib.load(MODEL_PATH)
+def load_registry():
+    return ModelRegistry(MODEL_ROOT).start()
 
-@st.cache_data
-def load_unis():
-    df = pd.read_csv(UNI_TABLE_PATH)
-    df["institution_clean"] = df["institution_clean"].astype(str).map(norm)
-    return df
-
-pipe = load_model()
-uni_table = load_unis()
+# one model for the whole rerun, even if a new version goes live meanwhile
+model = load_registry().current()
+whatif = WhatIf(model)  # grid inputs are lookups in the version's probability cube, the rest uses the model
+uni_table = model.uni_table.assign(institution_clean=model.uni_table["institution_clean"].astype(str).map(norm))
+st.caption(f"Model {model.version} ({model.backend}) | loaded in {model.load_s * 1000:.0f} ms, {model.memory_mb:.1f} MB"
+           f" | probability cube: {model.stats()['cube'] or 'none'}")
 
 gpa = st.slider("GPA", 2.5, 4.0, 3.5, 0.01)
 gre = st.slider("GRE Total", 130, 170, 160, 1)
@@ -31,49 +27,37 @@ is_intl = 1 if citizenship == "International" else 0
 term = st.text_input("Term (e.g., F20, S24)", value="S24")
 program = "Computer Science Masters"  # default as you wanted
 
-mode = st.radio("Mode", ["One University", "Top-K"], horizontal=True)
+mode = st.radio("Mode", ["One University", "Top-K", "Required GPA"], horizontal=True)
+applicant = {
+    "gpa_raw": gpa,
+    "gre_total": gre,
+    "is_international": is_intl,
+    "program": program,
+    "term": term,
+}
 
 if mode == "One University":
     uni = st.selectbox("University (institution_clean)", uni_table["institution_clean"].unique())
-    row = uni_table[uni_table["institution_clean"] == uni].iloc[0]
-    payload = {
-        "gpa_raw": gpa,
-        "gre_total": gre,
-        "is_international": is_intl,
-        "program": program,
-        "term": term,
-        "institution_clean": uni,
-    }
-    if "log_rank" in uni_table.columns:
-        payload["log_rank"] = float(row["log_rank"])
 
     if st.button("Predict"):
-        X = pd.DataFrame([payload])
-        p = pipe.predict_proba(X)[0, 1]
+        p, source = whatif.point(applicant, uni)
         st.success(f"P(ACCEPT) for '{uni}' = {p:.3f}")
+        st.caption(f"from the {source}")
 
-else:
+elif mode == "Top-K":
     top_k = st.slider("Top-K", 5, 50, 10, 1)
     if st.button("Predict Top-K"):
-        rows = []
-        for _, r in uni_table.iterrows():
-            payload = {
-                "gpa_raw": gpa,
-                "gre_total": gre,
-                "is_international": is_intl,
-                "program": program,
-                "term": term,
-                "institution_clean": r["institution_clean"]
-            }
-            if "log_rank" in uni_table.columns:
-                payload["log_rank"] = float(r["log_rank"])
-            rows.append(payload)
+        out, source = whatif.top_k(applicant, top_k)
 
-        X_all = pd.DataFrame(rows)
-        probs = pipe.predict_proba(X_all)[:, 1]
-        out = pd.DataFrame({
-            "institution_clean": uni_table["institution_clean"].values,
-            "p_accept": probs
-        }).sort_values("p_accept", ascending=False).head(top_k)
+        st.dataframe(out, use_container_width=True)
+        st.caption(f"from the {source}")
 
-        st.dataframe(out.reset_index(drop=True), use_container_width=True)
\ No newline at end of file
+else:
+    target = st.slider("Target P(ACCEPT)", 0.05, 0.95, TARGET_P, 0.05)
+    if st.button("Find required GPA"):
+        req, source = whatif.required_gpa(applicant, target)
+        out = req.rename_axis("institution_clean").reset_index()
+        out = out.sort_values(["required_gpa", "institution_clean"], na_position="last")
+        st.dataframe(out, use_container_width=True)
+        st.caption(f"Lowest GPA from which P(ACCEPT) >= {target:.2f} up to 4.00 (empty: not reachable), "
+                   f"from the {source}")
\ No newline at end of file
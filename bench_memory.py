@@ -0,0 +1,114 @@
+"""
+Peak memory of the ml.py preprocessing step per categorical encoding, versus row count.
+
+Each (encoding, rows) point runs in a fresh process so ru_maxrss is not
+polluted by earlier runs. ru_maxrss is a high-water mark of the whole process
+(loading and resampling the data usually sets it), so the encoding's own cost
+is the peak traced by tracemalloc during fit_transform (NumPy / SciPy buffers
+included), next to the RSS before it (/proc/self/statm). Rows are resampled from merged_matched_only.csv and
+the `program` column gets extra spellings so its vocabulary grows with the
+data, like new GradCafe seasons would.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ml import DATA_PATH, OUT_DIR, RANDOM_STATE, build_preprocessor, load_and_prepare
+
+ROW_COUNTS = [3_000, 10_000, 30_000, 100_000, 300_000]
+ENCODINGS = ["dense", "sparse", "native"]
+ROWS_PER_NEW_SPELLING = 25
+
+# dense one-hot past this is rows x vocabulary float64 in the GBs; skip instead of swapping
+DENSE_MAX_ROWS = 30_000
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _current_rss_mb() -> float:
+    """Resident set size now (not the peak); NaN where /proc is missing (macOS)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        return float("nan")
+
+
+def make_data(n_rows: int, seed: int = RANDOM_STATE) -> pd.DataFrame:
+    base = load_and_prepare(DATA_PATH)
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+
+    n_spellings = max(1, n_rows // ROWS_PER_NEW_SPELLING)
+    variant = rng.integers(0, n_spellings, n_rows)
+    df["program"] = df["program"].astype(str) + " v" + variant.astype(str)
+    return df
+
+
+def _measure(encoding: str, n_rows: int, conn):
+    df = make_data(n_rows)
+    pre, num_features, cat_features = build_preprocessor(df, encoding)
+    X = df[num_features + cat_features]
+    rss_before = _current_rss_mb()
+
+    tracemalloc.start()
+    Xt = pre.fit_transform(X)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    nbytes = Xt.data.nbytes + Xt.indices.nbytes + Xt.indptr.nbytes if hasattr(Xt, "indptr") else Xt.nbytes
+
+    conn.send({
+        "encoding": encoding,
+        "rows": n_rows,
+        "columns": int(Xt.shape[1]),
+        "matrix_mb": nbytes / 1024 ** 2,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+        "fit_transform_peak_mb": traced_peak / 1024 ** 2,
+    })
+    conn.close()
+
+
+def run(row_counts=ROW_COUNTS, encodings=ENCODINGS) -> pd.DataFrame:
+    ctx = mp.get_context("spawn")
+    rows = []
+    for n in row_counts:
+        for enc in encodings:
+            if enc == "dense" and n > DENSE_MAX_ROWS:
+                est_gb = n * (n / ROWS_PER_NEW_SPELLING) * 8 / 1024 ** 3
+                print(f"[SKIP] dense  rows={n:>8} | matrix would be ~{est_gb:.1f} GB")
+                continue
+            parent, child = ctx.Pipe(duplex=False)
+            p = ctx.Process(target=_measure, args=(enc, n, child))
+            p.start()
+            res = parent.recv()
+            p.join()
+            rows.append(res)
+            print(f"[OK] {enc:<6} rows={n:>8} cols={res['columns']:>6} | matrix={res['matrix_mb']:9.1f} MB "
+                  f"| fit_transform peak={res['fit_transform_peak_mb']:8.1f} MB "
+                  f"| RSS before={res['rss_before_mb']:7.1f} MB, peak={res['peak_rss_mb']:8.1f} MB")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Peak memory of dense / sparse / native categorical encodings.")
+    ap.add_argument("--rows", type=int, nargs="+", default=ROW_COUNTS)
+    ap.add_argument("--encodings", nargs="+", default=ENCODINGS, choices=ENCODINGS)
+    args = ap.parse_args()
+
+    res = run(args.rows, args.encodings)
+    out = Path(OUT_DIR) / "memory_benchmark.csv"
+    res.to_csv(out, index=False)
+    print("\n" + res.to_string(index=False))
+    print("\nSaved:", out)
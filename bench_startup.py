@@ -0,0 +1,208 @@
+"""
+Cold-start profile of the scoring path, and memory of several worker processes.
+
+Every measurement runs in a fresh interpreter, so nothing is already imported
+or loaded:
+  imports    python -X importtime per entry point; the modules with the largest
+             cumulative import time below it are listed
+  artifacts  each artifact loader, timed after its imports (median of REPEATS runs)
+  cold start import + ModelRegistry load per backend (mmap / flat / sklearn)
+  workers    N processes hold the same version at once; their private and shared
+             memory come from /proc/self/smaps_rollup (Linux only). Mapped arrays
+             are page cache shared by all of them, the other backends' arrays are
+             a private copy per process.
+
+    python bench_startup.py
+    python bench_startup.py --workers 8
+"""
+import argparse
+import json
+import multiprocessing as mp
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from model_registry import available_backends, load_version
+from model_versions import FLAT_NAME, MMAP_NAME
+from model_versions import MODEL_ROOT, resolve_model_dir
+
+OUT_PATH = Path("results_ml_full/startup_profile.csv")
+REPEATS = 3
+TOP_IMPORTS = 8
+N_WORKERS = 4
+ENTRY_POINTS = {
+    "serving path": "import model_registry",
+    "sklearn path": "import joblib, sklearn.ensemble",
+}
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def _run(code: str) -> str:
+    res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    if res.returncode != 0:
+        raise RuntimeError(res.stderr.strip().splitlines()[-1])
+    return res.stdout
+
+
+def import_profile(statement: str, top: int = TOP_IMPORTS):
+    """(total ms, the `top` modules by cumulative ms, heavy packages imported) for `statement`."""
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], capture_output=True, text=True)
+    rows = []
+    for line in res.stderr.splitlines():
+        m = IMPORT_LINE.match(line)
+        if m:
+            rows.append({"module": m.group(4), "depth": len(m.group(3)) // 2,
+                         "cumulative_ms": int(m.group(2)) / 1000})
+    df = pd.DataFrame(rows)
+    total = df.loc[df["depth"] == 0, "cumulative_ms"].sum()
+    heavy = sorted({m.split(".")[0] for m in df["module"]} & {"numpy", "pandas", "sklearn", "scipy", "joblib"})
+    # top-level packages only: numpy's submodules are part of "numpy"
+    tops = df[~df["module"].str.contains(r"\.")].sort_values("cumulative_ms", ascending=False)
+    return total, tops.drop_duplicates("module").head(top), heavy
+
+
+def time_fresh(setup: str, stmt: str, repeats: int = REPEATS) -> float:
+    """Median ms of `stmt` in fresh interpreters, after `setup` (imports) has run."""
+    code = (f"import time\n{setup}\nt0 = time.perf_counter()\n{stmt}\n"
+            f"print(time.perf_counter() - t0)")
+    return statistics.median(float(_run(code)) * 1000 for _ in range(repeats))
+
+
+def artifact_loaders(model_dir: Path) -> dict:
+    d = repr(str(model_dir))
+    have = available_backends(model_dir)
+    flat = f"from pathlib import Path\nfrom flat_predictor import FlatHGBPredictor\nd = Path({d})"
+    loaders = {}
+    if "sklearn" in have:
+        loaders["pipeline (joblib)"] = (
+            f"import joblib, sklearn.ensemble\nfrom pathlib import Path\nd = Path({d})",
+            "joblib.load(d / 'best_model_hgb.joblib')")
+    if "flat" in have:
+        loaders["flat model (.npz)"] = (flat, f"FlatHGBPredictor.load(d / {FLAT_NAME!r})")
+        loaders["uni_table.csv + Top-K block encoding"] = (
+            f"{flat}\nimport pandas as pd\nfrom topk_scoring import TopKScorer\n"
+            f"m = FlatHGBPredictor.load(d / {FLAT_NAME!r})",
+            "TopKScorer(m, pd.read_csv(d / 'uni_table.csv'))")
+    if "mmap" in have:
+        loaders["flat model (mmap .npy)"] = (flat, f"FlatHGBPredictor.load_mmap(d / {MMAP_NAME!r} / 'model')")
+        loaders["Top-K block (mmap .npy)"] = (
+            f"{flat}\nfrom topk_scoring import TopKScorer\n"
+            f"m = FlatHGBPredictor.load_mmap(d / {MMAP_NAME!r} / 'model')",
+            f"TopKScorer.load(m, d / {MMAP_NAME!r} / 'uni')")
+    return loaders
+
+
+def cold_start(model_dir: Path, backend: str) -> dict:
+    code = (f"import time\nt0 = time.perf_counter()\nimport model_registry\nt1 = time.perf_counter()\n"
+            f"model_registry.load_version({str(model_dir)!r}, {backend!r})\nt2 = time.perf_counter()\n"
+            f"import sys, json\nprint(json.dumps([t1 - t0, t2 - t1, 'sklearn' in sys.modules]))")
+    runs = [json.loads(_run(code)) for _ in range(REPEATS)]
+    return {
+        "import_ms": statistics.median(r[0] for r in runs) * 1000,
+        "load_ms": statistics.median(r[1] for r in runs) * 1000,
+        "sklearn_imported": runs[0][2],
+    }
+
+
+def _smaps_mb() -> dict:
+    out = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                out[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return out
+
+
+def _worker(model_dir, backend, barrier, conn):
+    before = _smaps_mb()
+    model = load_version(model_dir, backend)   # includes a smoke Top-K pass: every array is touched
+    barrier.wait()                              # all workers now hold the model
+    after = _smaps_mb()
+    private = lambda s: s.get("Private_Clean", 0) + s.get("Private_Dirty", 0)
+    conn.send({
+        "private_mb": private(after) - private(before),
+        "shared_mb": after.get("Shared_Clean", 0) - before.get("Shared_Clean", 0),
+        "pss_mb": after["Pss"] - before["Pss"],
+        "version": model.version,
+    })
+    barrier.wait()                              # keep the mappings alive until everyone has measured
+    conn.close()
+
+
+def worker_memory(model_dir: Path, backend: str, n: int) -> dict:
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(n)
+    pipes, procs = [], []
+    for _ in range(n):
+        parent, child = ctx.Pipe(duplex=False)
+        p = ctx.Process(target=_worker, args=(str(model_dir), backend, barrier, child))
+        p.start()
+        pipes.append(parent)
+        procs.append(p)
+    res = [c.recv() for c in pipes]
+    for p in procs:
+        p.join()
+    return {
+        "workers": n,
+        "private_mb_per_worker": statistics.mean(r["private_mb"] for r in res),
+        "shared_mb_per_worker": statistics.mean(r["shared_mb"] for r in res),
+        "pss_mb_total": sum(r["pss_mb"] for r in res),
+    }
+
+
+def run(root=MODEL_ROOT, n_workers=N_WORKERS) -> pd.DataFrame:
+    model_dir = resolve_model_dir(root)
+    backends = available_backends(model_dir)
+    print(f"[OK] Model dir: {model_dir} | artifacts: {backends}")
+    rows = []
+
+    for name, statement in ENTRY_POINTS.items():
+        total, tops, heavy = import_profile(statement)
+        print(f"\n[OK] Imports, {name} ({statement}): {total:.0f} ms | heavy packages: {heavy or '-'}")
+        for _, r in tops.iterrows():
+            print(f"       {r['module']:<28} {r['cumulative_ms']:8.1f} ms")
+            rows.append({"section": f"import ({name})", "item": r["module"], "ms": round(r["cumulative_ms"], 1)})
+
+    print("\n[OK] Artifact load time (fresh process, after imports)")
+    for name, (setup, stmt) in artifact_loaders(model_dir).items():
+        ms = time_fresh(setup, stmt)
+        print(f"       {name:<38} {ms:8.1f} ms")
+        rows.append({"section": "artifact", "item": name, "ms": round(ms, 1)})
+
+    print("\n[OK] Cold start: import model_registry + load_version")
+    for backend in backends:
+        r = cold_start(model_dir, backend)
+        print(f"       {backend:<8} import {r['import_ms']:7.1f} ms + load {r['load_ms']:7.1f} ms "
+              f"= {r['import_ms'] + r['load_ms']:7.1f} ms | sklearn imported: {r['sklearn_imported']}")
+        rows.append({"section": "cold start", "item": backend, "ms": round(r["import_ms"] + r["load_ms"], 1)})
+
+    if Path("/proc/self/smaps_rollup").exists() and n_workers > 0:
+        print(f"\n[OK] Memory of {n_workers} workers holding {model_dir.name} at once")
+        for backend in backends:
+            r = worker_memory(model_dir, backend, n_workers)
+            print(f"       {backend:<8} private {r['private_mb_per_worker']:6.2f} MB/worker | "
+                  f"shared {r['shared_mb_per_worker']:6.2f} MB/worker | PSS total {r['pss_mb_total']:6.2f} MB")
+            rows.append({"section": f"workers x{n_workers}", "item": backend,
+                         "private_mb": round(r["private_mb_per_worker"], 3),
+                         "pss_mb": round(r["pss_mb_total"], 3)})
+    else:
+        print("\n[SKIP] Worker memory needs /proc/self/smaps_rollup (Linux)")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Cold-start profile of the scoring path (imports, artifacts, workers).")
+    ap.add_argument("--root", default=str(MODEL_ROOT))
+    ap.add_argument("--workers", type=int, default=N_WORKERS)
+    ap.add_argument("--out", default=str(OUT_PATH))
+    args = ap.parse_args()
+
+    res = run(args.root, args.workers)
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    res.to_csv(args.out, index=False)
+    print("\nSaved:", args.out)
@@ -0,0 +1,143 @@
+"""
+Canonical feature frame for every consumer of merged_matched_only.csv
+(ml.py, train_best_model_hgb.py, hgb_export.py, both hypothesis scripts).
+
+One definition of the features:
+  y                 decision -> accepted=1 / rejected=0; rows with any other decision are dropped
+  gpa_raw           float, outside (0, 4] counts as missing
+  gre_total         float
+  Rank2025          float (kept for Hyp2's rank bins and the uni table)
+  log_rank          log(rank clipped at 1), lower is better; the rank is rank_asof (QS rank
+                    at the applicant's term, qs_store.py) where the merged file has it, else Rank2025
+  qs_year           QS year that rank came from (NaN: Rank2025); the uni table keeps each
+                    institution's latest one
+  is_international  citizenship == "International" (0 / 1)
+  institution_clean, program, term   stripped categoricals (institution_clean lowercased)
+
+Row filters that are analysis choices (GPA required for Hyp1, rank required
+for Hyp2, ...) stay with the consumer; they only call dropna on these columns.
+
+The frame is cached on disk under cache/features, keyed by a hash of the
+source file and FEATURE_SPEC_VERSION: an unchanged file is never re-parsed.
+"""
+import argparse
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from table_store import load_table
+
+# =========================
+# CONFIG
+# =========================
+DATA_PATH = "merged_matched_only.csv"
+CACHE_DIR = Path("cache/features")
+FEATURE_SPEC_VERSION = "3"   # bump when build_features changes
+
+NUMERIC_FEATURES = ["gpa_raw", "gre_total", "log_rank", "is_international"]
+CATEGORICAL_FEATURES = ["institution_clean", "program", "term"]
+GPA_MIN, GPA_MAX = 0.0, 4.0   # (GPA_MIN, GPA_MAX]
+
+
+def file_hash(path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def build_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Raw merged rows -> the canonical feature frame (compact dtypes)."""
+    y = df["decision"].astype(str).str.strip().str.lower().map({"accepted": 1, "rejected": 0})
+    keep = y.notna().to_numpy()
+    df = df.loc[keep]
+
+    out = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    out["y"] = y[keep].to_numpy().astype(np.int8)
+
+    gpa = pd.to_numeric(df["gpa_raw"], errors="coerce").to_numpy(dtype=float)
+    out["gpa_raw"] = np.where((gpa > GPA_MIN) & (gpa <= GPA_MAX), gpa, np.nan)
+    out["gre_total"] = (pd.to_numeric(df["gre_total"], errors="coerce").to_numpy(dtype=float)
+                        if "gre_total" in df.columns else np.nan)
+
+    rank = (pd.to_numeric(df["Rank2025"], errors="coerce").to_numpy(dtype=float)
+            if "Rank2025" in df.columns else np.full(len(df), np.nan))
+    out["Rank2025"] = rank
+    qs_year = np.full(len(df), np.nan)
+    if "rank_asof" in df.columns:
+        asof = pd.to_numeric(df["rank_asof"], errors="coerce").to_numpy(dtype=float)
+        rank = np.where(np.isnan(asof), rank, asof)
+        if "qs_year" in df.columns:
+            year = pd.to_numeric(df["qs_year"], errors="coerce").to_numpy(dtype=float)
+            qs_year = np.where(np.isnan(asof), np.nan, year)
+    out["qs_year"] = qs_year
+    out["log_rank"] = np.log(np.clip(rank, 1, None))
+
+    citizenship = df["citizenship"] if "citizenship" in df.columns else pd.Series("", index=df.index)
+    out["is_international"] = (
+        citizenship.astype(str).str.strip().str.lower().eq("international").to_numpy().astype(np.int8)
+    )
+
+    for col in CATEGORICAL_FEATURES:
+        if col not in df.columns:
+            continue
+        s = df[col].astype("string").str.strip()
+        if col == "institution_clean":
+            s = s.str.lower()
+        out[col] = pd.Categorical(s.to_numpy(dtype=object, na_value=np.nan))
+
+    return out
+
+
+def load_features(path=DATA_PATH, cache_dir=CACHE_DIR, use_cache: bool = True) -> pd.DataFrame:
+    """Canonical feature frame of `path`, from the on-disk cache when the file is unchanged."""
+    path = Path(path)
+    cache_dir = Path(cache_dir)
+    cache_path = cache_dir / f"{path.stem}-{file_hash(path)}-v{FEATURE_SPEC_VERSION}.pkl"
+
+    if use_cache and cache_path.exists():
+        return pd.read_pickle(cache_path)
+
+    feats = build_features(load_table(path))
+    if use_cache:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_suffix(".tmp")
+        feats.to_pickle(tmp)
+        os.replace(tmp, cache_path)
+        # older versions of this file / spec are never read again
+        for old in cache_dir.glob(f"{path.stem}-*.pkl"):
+            if old != cache_path:
+                old.unlink(missing_ok=True)
+    return feats
+
+
+def main(path=DATA_PATH):
+    t0 = time.perf_counter()
+    raw = load_table(path)
+    build_features(raw)
+    t_build = time.perf_counter() - t0
+
+    load_features(path)  # make sure the cache entry exists
+    t0 = time.perf_counter()
+    feats = load_features(path)
+    t_cached = time.perf_counter() - t0
+
+    raw_mb = raw.memory_usage(deep=True).sum() / 1024 ** 2
+    feats_mb = feats.memory_usage(deep=True).sum() / 1024 ** 2
+    print(f"[OK] {path}: {len(feats)} rows | spec v{FEATURE_SPEC_VERSION}")
+    print(f"[OK] Build from file: {t_build * 1000:.1f} ms | from cache: {t_cached * 1000:.1f} ms")
+    print(f"[OK] Memory: raw table {raw_mb:.2f} MB -> features {feats_mb:.2f} MB")
+    print(feats.dtypes.to_string())
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Build / inspect the cached canonical feature frame.")
+    ap.add_argument("--data", default=DATA_PATH)
+    args = ap.parse_args()
+
+    main(args.data)
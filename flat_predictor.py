@@ -0,0 +1,178 @@
+"""
+Lightweight predictor for the HistGradientBoosting pipeline exported by hgb_export.py.
+
+Only needs numpy: the fitted scaler, one-hot vocabulary and all tree nodes are
+stored as flat arrays in one .npz file and evaluated directly here. load_mmap()
+reads the same arrays from a directory of uncompressed .npy files
+(hgb_export.export_mmap_model) as read-only memory maps.
+"""
+from pathlib import Path
+
+import numpy as np
+
+KIND_NUM = 0
+KIND_CAT = 1  # one-hot: one output column per category
+KIND_ORD = 2  # ordinal code in a single column (HGB native categorical)
+
+
+def _is_missing(v) -> bool:
+    return v is None or (isinstance(v, float) and v != v)
+
+
+class FlatHGBPredictor:
+
+    def __init__(self, arrays):
+        a = dict(arrays)
+        self.arrays = a
+
+        self.features = [str(f) for f in a["feature_names"]]
+        self.kind = a["feature_kind"]
+        self.offset = a["feature_offset"]
+        self.num_mean = a["num_mean"]
+        self.num_scale = a["num_scale"]
+        self.num_fill = a["num_fill"]
+        self.ord_unknown = a["ord_unknown"]
+        self.ord_missing = a["ord_missing"]
+        self.n_columns = int(a["n_columns"])
+
+        # category -> output column (one-hot) or code (ordinal), one dict per feature
+        self.vocab = {}
+        self.cat_fill = {}
+        vocab, code, start = a["vocab"], a["vocab_code"], a["vocab_start"]
+        for j, f in enumerate(self.features):
+            if self.kind[j] == KIND_NUM:
+                continue
+            s, e = start[j], start[j + 1]
+            cast = int if self.kind[j] == KIND_CAT else float
+            self.vocab[f] = {str(c): cast(v) for c, v in zip(vocab[s:e], code[s:e])}
+            fill = str(a["cat_fill"][j])
+            self.cat_fill[f] = fill if a["cat_has_fill"][j] else None
+
+        self.node_feature = a["node_feature"]
+        self.node_threshold = a["node_threshold"]
+        self.node_left = a["node_left"]
+        self.node_right = a["node_right"]
+        self.node_missing_left = a["node_missing_left"]
+        self.node_value = a["node_value"]
+        self.node_cat_idx = a["node_cat_idx"]
+        self.cat_left = a["cat_left"]
+        self.has_cat = bool(len(self.cat_left))
+        # leaves were exported pointing to themselves
+        self.node_is_leaf = (a["node_is_leaf"] if "node_is_leaf" in a
+                             else self.node_left == np.arange(len(self.node_left)))
+        # [right, left] per node, so the next node is node_children[2 * node + go_left]
+        self.node_children = (a["node_children"] if "node_children" in a
+                              else np.column_stack([self.node_right, self.node_left]).ravel())
+        self.roots = a["roots"]
+        self.max_depth = int(a["max_depth"])
+        self.baseline = float(a["baseline"])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as f:
+            return cls({k: f[k] for k in f.files})
+
+    @classmethod
+    def load_mmap(cls, directory):
+        """One .npy per array, mapped read-only: processes loading it share the page-cached files."""
+        return cls({p.stem: np.load(p, mmap_mode="r", allow_pickle=False)
+                    for p in sorted(Path(directory).glob("*.npy"))})
+
+    # ---------- encoding ----------
+    def columns_by_feature(self) -> dict:
+        out = {}
+        for j, f in enumerate(self.features):
+            width = len(self.vocab[f]) if self.kind[j] == KIND_CAT else 1
+            out[f] = np.arange(self.offset[j], self.offset[j] + width)
+        return out
+
+    def placeholder_values(self) -> dict:
+        out = {}
+        for j, f in enumerate(self.features):
+            out[f] = next(iter(self.vocab[f])) if self.kind[j] != KIND_NUM else 0.0
+        return out
+
+    def transform(self, X) -> np.ndarray:
+        """
+        Same output as the fitted ColumnTransformer.
+        X: DataFrame, dict of columns, or list of row dicts.
+        """
+        if isinstance(X, list):
+            cols = {f: [r.get(f) for r in X] for f in self.features}
+        else:
+            cols = {f: list(X[f]) for f in self.features}
+        n = len(cols[self.features[0]]) if self.features else 0
+
+        out = np.zeros((n, self.n_columns), dtype=np.float64)
+        rows = np.arange(n)
+        for j, f in enumerate(self.features):
+            if self.kind[j] == KIND_NUM:
+                v = np.array([np.nan if _is_missing(x) else x for x in cols[f]], dtype=np.float64)
+                if not np.isnan(self.num_fill[j]):
+                    v[np.isnan(v)] = self.num_fill[j]
+                v -= self.num_mean[j]
+                v /= self.num_scale[j]
+                out[:, self.offset[j]] = v
+            elif self.kind[j] == KIND_CAT:
+                lookup, fill = self.vocab[f], self.cat_fill[f]
+                # a NaN category seen in training was stored as "nan"
+                missing = fill if fill is not None else "nan"
+                idx = np.array([
+                    lookup.get(missing if _is_missing(x) else str(x), -1) for x in cols[f]
+                ], dtype=np.int64)
+                known = idx >= 0  # unknown categories encode as all zeros
+                out[rows[known], idx[known]] = 1.0
+            else:
+                lookup, fill = self.vocab[f], self.cat_fill[f]
+                unknown, missing = self.ord_unknown[j], self.ord_missing[j]
+                out[:, self.offset[j]] = [
+                    (lookup.get(fill, unknown) if fill is not None else missing) if _is_missing(x)
+                    else lookup.get(str(x), unknown)
+                    for x in cols[f]
+                ]
+        return out
+
+    # ---------- trees ----------
+    def predict_raw_encoded(self, Xt: np.ndarray) -> np.ndarray:
+        """
+        Evaluates all trees at once, one tree level per step; (row, tree)
+        pairs that reached a leaf drop out of the active set.
+        """
+        Xt = np.ascontiguousarray(Xt, dtype=np.float64)
+        n, n_trees = Xt.shape[0], len(self.roots)
+        flat_x = Xt.ravel()
+        has_nan = bool(np.isnan(flat_x).any())
+
+        node = np.tile(self.roots, n)
+        row_start = np.repeat(np.arange(n) * Xt.shape[1], n_trees)
+        active = np.flatnonzero(~self.node_is_leaf[node])
+
+        for _ in range(self.max_depth):
+            if not active.size:
+                break
+            nd = node[active]
+            x = flat_x[row_start[active] + self.node_feature[nd]]
+            go_left = x <= self.node_threshold[nd]
+            if has_nan:
+                go_left |= np.isnan(x) & self.node_missing_left[nd]
+            if self.has_cat:
+                ci = self.node_cat_idx[nd]
+                m = ci >= 0
+                if m.any():
+                    # codes outside 0..255 (unknown_value=-1, NaN) follow the missing branch
+                    xc = x[m]
+                    valid = (xc >= 0) & (xc < 256)
+                    code = np.where(valid, xc, 0).astype(np.intp)
+                    go_left[m] = np.where(valid, self.cat_left[ci[m], code], self.node_missing_left[nd[m]])
+            nd = self.node_children[2 * nd + go_left]
+            node[active] = nd
+            active = active[~self.node_is_leaf[nd]]
+
+        return self.baseline + self.node_value[node].reshape(n, n_trees).sum(axis=1)
+
+    def predict_proba_encoded(self, Xt: np.ndarray) -> np.ndarray:
+        p = 1.0 / (1.0 + np.exp(-self.predict_raw_encoded(Xt)))
+        return np.column_stack([1.0 - p, p])
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.predict_proba_encoded(self.transform(X))
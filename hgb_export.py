@@ -0,0 +1,294 @@
+import argparse
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import joblib
+
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from flat_predictor import FlatHGBPredictor, KIND_CAT, KIND_NUM, KIND_ORD
+from feature_store import load_features
+from model_versions import FLAT_NAME, MMAP_NAME, resolve_model_dir
+from topk_scoring import TopKScorer
+
+MODEL_DIR = Path("saved_model_hgb")
+PARITY_TOL = 1e-9
+
+
+def _steps(trans):
+    return [s for _, s in trans.steps] if isinstance(trans, Pipeline) else [trans]
+
+
+def _ordinal_codes(enc: OrdinalEncoder, cols) -> list:
+    """Code the fitted OrdinalEncoder assigns to each of its categories (infrequent ones share a code)."""
+    out = []
+    for j in range(len(cols)):
+        cats = list(enc.categories_[j])
+        X = pd.DataFrame({c: [enc.categories_[i][0]] * len(cats) for i, c in enumerate(cols)})
+        X[cols[j]] = cats
+        out.append(enc.transform(X)[:, j].astype(np.float64))
+    return out
+
+
+def flatten_preprocessor(pre: ColumnTransformer) -> dict:
+    names, kinds, offsets = [], [], []
+    num_mean, num_scale, num_fill = [], [], []
+    cat_fill, cat_has_fill = [], []
+    ord_unknown, ord_missing = [], []
+    vocab, vocab_code, vocab_start = [], [], [0]
+
+    for name, trans, cols in pre.transformers_:
+        if name == "remainder" or trans == "drop":
+            continue
+        steps = _steps(trans)
+        imputer = next((s for s in steps if isinstance(s, SimpleImputer)), None)
+        scaler = next((s for s in steps if isinstance(s, StandardScaler)), None)
+        ohe = next((s for s in steps if isinstance(s, OneHotEncoder)), None)
+        ordinal = next((s for s in steps if isinstance(s, OrdinalEncoder)), None)
+        if ohe is not None and ohe.drop is not None:
+            raise ValueError("OneHotEncoder(drop=...) is not supported by the flat export.")
+        codes = _ordinal_codes(ordinal, cols) if ordinal is not None else None
+        enc = ohe if ohe is not None else ordinal
+
+        start = pre.output_indices_[name].start
+        for j, col in enumerate(cols):
+            names.append(col)
+            offsets.append(start)
+            fill = imputer.statistics_[j] if imputer is not None else None
+            cat_fill.append("" if fill is None or enc is None else str(fill))
+            cat_has_fill.append(fill is not None and enc is not None)
+
+            if enc is not None:
+                cats = [str(c) for c in enc.categories_[j]]
+                num_mean.append(np.nan)
+                num_scale.append(np.nan)
+                num_fill.append(np.nan)
+                vocab.extend(cats)
+                if ohe is not None:
+                    # one-hot: category -> output column
+                    kinds.append(KIND_CAT)
+                    vocab_code.extend(range(start, start + len(cats)))
+                    ord_unknown.append(np.nan)
+                    ord_missing.append(np.nan)
+                    start += len(cats)
+                else:
+                    # ordinal: category -> code written into a single column
+                    kinds.append(KIND_ORD)
+                    vocab_code.extend(codes[j])
+                    ord_unknown.append(float(ordinal.unknown_value) if ordinal.unknown_value is not None else np.nan)
+                    ord_missing.append(float(ordinal.encoded_missing_value))
+                    start += 1
+            else:
+                kinds.append(KIND_NUM)
+                num_mean.append(scaler.mean_[j] if scaler is not None and scaler.with_mean else 0.0)
+                num_scale.append(scaler.scale_[j] if scaler is not None and scaler.with_std else 1.0)
+                num_fill.append(np.nan if fill is None else float(fill))
+                ord_unknown.append(np.nan)
+                ord_missing.append(np.nan)
+                start += 1
+            vocab_start.append(len(vocab))
+
+    return {
+        "feature_names": np.array(names, dtype=str),
+        "feature_kind": np.array(kinds, dtype=np.int8),
+        "feature_offset": np.array(offsets, dtype=np.int64),
+        "num_mean": np.array(num_mean, dtype=np.float64),
+        "num_scale": np.array(num_scale, dtype=np.float64),
+        "num_fill": np.array(num_fill, dtype=np.float64),
+        "cat_fill": np.array(cat_fill, dtype=str),
+        "cat_has_fill": np.array(cat_has_fill, dtype=bool),
+        "ord_unknown": np.array(ord_unknown, dtype=np.float64),
+        "ord_missing": np.array(ord_missing, dtype=np.float64),
+        "vocab": np.array(vocab, dtype=str),
+        "vocab_code": np.array(vocab_code, dtype=np.float64),
+        "vocab_start": np.array(vocab_start, dtype=np.int64),
+        "n_columns": np.array(sum(s.stop - s.start for s in pre.output_indices_.values())),
+    }
+
+
+def _bitset_table(bitset: np.ndarray) -> np.ndarray:
+    """8 x uint32 bitset -> bool[256] membership table."""
+    c = np.arange(256)
+    return ((bitset[c // 32] >> (c % 32).astype(np.uint32)) & 1).astype(bool)
+
+
+def _hgb_input_mapping(model):
+    """
+    With categorical_features set, HGB moves categorical columns first and
+    re-codes their values internally. Returns, per internal feature, the input
+    column it reads, and per internal categorical feature a table
+    input code (0..255) -> internal code (-1 = unseen).
+    """
+    n = model.n_features_in_
+    if model._preprocessor is None:
+        return np.arange(n), {}
+
+    to_input = np.arange(n)
+    code_maps = {}
+    for name, trans, mask in model._preprocessor.transformers_:
+        if name == "remainder" or trans == "drop":
+            continue
+        sl = model._preprocessor.output_indices_[name]
+        to_input[sl.start:sl.stop] = np.flatnonzero(mask)
+        if name == "encoder":
+            for k, cats in enumerate(trans.categories_):
+                table = np.full(256, -1, dtype=np.int64)
+                for internal, raw in enumerate(cats):
+                    if np.isfinite(raw) and 0 <= raw < 256:
+                        table[int(raw)] = internal
+                code_maps[sl.start + k] = table
+    return to_input, code_maps
+
+
+def flatten_hgb(model) -> dict:
+    if model.n_trees_per_iteration_ != 1:
+        raise ValueError("Only binary HistGradientBoostingClassifier models are supported.")
+
+    known_cat_bitsets, f_idx_map = model._bin_mapper.make_known_categories_bitsets()
+    to_input, code_maps = _hgb_input_mapping(model)
+
+    feature, threshold, left, right, missing_left, value, roots = [], [], [], [], [], [], []
+    cat_idx, cat_left = [], []
+    max_depth = 0
+    base = 0
+    for (pred,) in model._predictors:
+        nodes = pred.nodes
+        n = len(nodes)
+        idx = np.arange(base, base + n)
+        leaf = nodes["is_leaf"].astype(bool)
+
+        # categorical split -> row of cat_left, indexed by the input code: go left if
+        # the code is in the left bitset, or if it is unknown and missing values go left
+        node_cat = np.full(n, -1, dtype=np.int64)
+        for i in np.flatnonzero(nodes["is_categorical"].astype(bool) & ~leaf):
+            f = nodes["feature_idx"][i]
+            miss_left = bool(nodes["missing_go_to_left"][i])
+            in_left = _bitset_table(pred.raw_left_cat_bitsets[nodes["bitset_idx"][i]])
+            known = _bitset_table(known_cat_bitsets[f_idx_map[f]])
+            internal = in_left | (~known & miss_left)
+            code_map = code_maps[f]
+            node_cat[i] = len(cat_left)
+            cat_left.append(np.where(code_map >= 0, internal[np.maximum(code_map, 0)], miss_left))
+
+        roots.append(base)
+        feature.append(to_input[nodes["feature_idx"]])
+        threshold.append(nodes["num_threshold"])
+        left.append(np.where(leaf, idx, nodes["left"].astype(np.int64) + base))
+        right.append(np.where(leaf, idx, nodes["right"].astype(np.int64) + base))
+        missing_left.append(nodes["missing_go_to_left"].astype(bool))
+        value.append(np.where(leaf, nodes["value"], 0.0))
+        cat_idx.append(node_cat)
+        max_depth = max(max_depth, int(nodes["depth"].max()))
+        base += n
+
+    return {
+        "node_feature": np.concatenate(feature).astype(np.int32),
+        "node_threshold": np.concatenate(threshold).astype(np.float64),
+        "node_left": np.concatenate(left).astype(np.int32),
+        "node_right": np.concatenate(right).astype(np.int32),
+        "node_missing_left": np.concatenate(missing_left),
+        "node_value": np.concatenate(value).astype(np.float64),
+        "node_cat_idx": np.concatenate(cat_idx).astype(np.int32),
+        "cat_left": np.array(cat_left, dtype=bool).reshape(-1, 256),
+        "roots": np.array(roots, dtype=np.int32),
+        "max_depth": np.array(max_depth),
+        "baseline": np.array(float(np.ravel(model._baseline_prediction)[0])),
+    }
+
+
+def flatten_pipeline(pipe: Pipeline) -> dict:
+    pre = pipe.named_steps["preprocess"]
+    model = pipe.steps[-1][1]
+    return {**flatten_preprocessor(pre), **flatten_hgb(model)}
+
+
+def export_flat_model(pipe: Pipeline, path) -> Path:
+    path = Path(path)
+    np.savez(path, **flatten_pipeline(pipe))
+    return path
+
+
+def export_mmap_model(pipe: Pipeline, uni_table: pd.DataFrame, path) -> Path:
+    """
+    Fast-start copy of the flat model: every array as its own uncompressed .npy
+    under model/ (incl. the node tables FlatHGBPredictor would otherwise derive
+    at load) and the encoded Top-K university block under uni/. Loaders map the
+    files read-only, so worker processes share one page-cached copy.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    (tmp / "model").mkdir(parents=True)
+
+    arrays = flatten_pipeline(pipe)
+    flat = FlatHGBPredictor(arrays)
+    arrays["node_is_leaf"] = flat.node_is_leaf
+    arrays["node_children"] = flat.node_children
+    for name, arr in arrays.items():
+        np.save(tmp / "model" / f"{name}.npy", arr, allow_pickle=False)
+    TopKScorer(flat, uni_table).save(tmp / "uni")
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return path
+
+
+def check_mmap_parity(pipe: Pipeline, path, uni_table: pd.DataFrame, X: pd.DataFrame, tol=PARITY_TOL) -> float:
+    """check_parity for the mapped model, plus its mapped Top-K block vs one built from uni_table."""
+    path = Path(path)
+    flat = FlatHGBPredictor.load_mmap(path / "model")
+    err = check_parity(pipe, flat, X, tol)
+
+    mapped = TopKScorer.load(flat, path / "uni")
+    built = TopKScorer(pipe, uni_table)
+    for applicant in X[mapped.applicant_features].head(20).to_dict(orient="records"):
+        err = max(err, float(np.max(np.abs(mapped.score_all(applicant) - built.score_all(applicant)))))
+    if err > tol:
+        raise AssertionError(f"Mapped Top-K block differs from a rebuilt one by {err:.3e} (> {tol:.0e})")
+    return err
+
+
+def check_parity(pipe: Pipeline, flat: FlatHGBPredictor, X: pd.DataFrame, tol=PARITY_TOL) -> float:
+    """Max |p_sklearn - p_flat| over X; raises if above tol."""
+    ref = pipe.predict_proba(X)[:, 1]
+    got = flat.predict_proba(X)[:, 1]
+    err = float(np.max(np.abs(ref - got))) if len(X) else 0.0
+    if err > tol:
+        raise AssertionError(f"Flat predictor differs from pipeline by {err:.3e} (> {tol:.0e})")
+    return err
+
+
+def main(model_dir=MODEL_DIR, data_path="merged_matched_only.csv"):
+    model_dir = resolve_model_dir(model_dir)
+    pipe = joblib.load(model_dir / "best_model_hgb.joblib")
+    path = export_flat_model(pipe, model_dir / FLAT_NAME)
+
+    features = list(pipe.named_steps["preprocess"].feature_names_in_)
+    X = load_features(data_path)
+    for c in features:
+        if c not in X.columns:
+            X[c] = np.nan
+    err = check_parity(pipe, FlatHGBPredictor.load(path), X[features])
+
+    uni_table = pd.read_csv(model_dir / "uni_table.csv")
+    mmap_path = export_mmap_model(pipe, uni_table, model_dir / MMAP_NAME)
+    mmap_err = check_mmap_parity(pipe, mmap_path, uni_table, X[features])
+    mmap_kb = sum(f.stat().st_size for f in mmap_path.rglob("*") if f.is_file()) / 1024
+
+    print(f"[OK] Flat model saved -> {path} ({path.stat().st_size / 1024:.1f} KB)")
+    print(f"[OK] Parity on {len(X)} rows: max |diff| = {err:.2e}")
+    print(f"[OK] Mapped copy saved -> {mmap_path} ({mmap_kb:.1f} KB, parity incl. Top-K block {mmap_err:.2e})")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export the HGB pipeline into flat NumPy artifacts (.npz + mapped .npy).")
+    ap.add_argument("--model-dir", default=str(MODEL_DIR))
+    ap.add_argument("--data", default="merged_matched_only.csv")
+    args = ap.parse_args()
+    main(args.model_dir, args.data)
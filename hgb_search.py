@@ -0,0 +1,182 @@
+"""
+Successive-halving random search for the production HistGradientBoosting model.
+
+Folds are assigned by a hash of each row's content, so existing rows keep their
+fold when a new scrape batch is appended. Preprocessed fold matrices and every
+(fold, params, max_iter) score are cached on disk under cache/hgb_search, keyed
+by content hashes: re-running on unchanged data recomputes nothing, and after
+new rows arrive only folds whose contents changed are rebuilt and re-scored.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.metrics import roc_auc_score
+
+CACHE_DIR = Path("cache/hgb_search")
+N_FOLDS = 5
+N_CANDIDATES = 27
+ETA = 3                      # keep the best 1/ETA of candidates per rung
+MIN_ITER, MAX_ITER = 50, 450  # boosting iterations = the halving resource
+PREPROCESS_VERSION = "1"     # bump when build_preprocessor changes
+
+PARAM_GRID = {
+    "learning_rate": [0.03, 0.05, 0.08, 0.1, 0.2],
+    "max_depth": [None, 3, 4, 6, 8],
+    "max_leaf_nodes": [15, 31, 63],
+    "min_samples_leaf": [10, 20, 40, 80],
+    "l2_regularization": [0.0, 0.1, 1.0],
+    "max_features": [0.5, 0.8, 1.0],
+}
+
+
+def _sha(*parts) -> str:
+    h = hashlib.sha1()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else str(p).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def row_hashes(X: pd.DataFrame, y: pd.Series) -> np.ndarray:
+    return pd.util.hash_pandas_object(X.assign(_y=y.to_numpy()), index=False).to_numpy()
+
+
+def sample_candidates(n: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    seen, out = set(), []
+    n_total = int(np.prod([len(v) for v in PARAM_GRID.values()]))
+    while len(out) < min(n, n_total):
+        params = {k: v[rng.integers(len(v))] for k, v in PARAM_GRID.items()}
+        params = {k: (v.item() if hasattr(v, "item") else v) for k, v in params.items()}
+        key = json.dumps(params, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            out.append(params)
+    return out
+
+
+class FoldCache:
+    """Preprocessed fold matrices (.npz) and scores (scores.jsonl) on disk."""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.scores_path = self.dir / "scores.jsonl"
+        self.scores = {}
+        if self.scores_path.exists():
+            for line in self.scores_path.read_text(encoding="utf-8").splitlines():
+                if line.strip():
+                    rec = json.loads(line)
+                    self.scores[rec["key"]] = rec["roc_auc"]
+        self._folds = {}
+        self.n_built = self.n_loaded = self.n_fits = self.n_score_hits = 0
+
+    def fold(self, key: str, build):
+        if key in self._folds:
+            return self._folds[key]
+        path = self.dir / f"fold_{key}.npz"
+        if path.exists():
+            with np.load(path) as f:
+                data = {k: f[k] for k in f.files}
+            self.n_loaded += 1
+        else:
+            data = build()
+            np.savez(path, **data)
+            self.n_built += 1
+        self._folds[key] = data
+        return data
+
+    def score(self, key: str, compute) -> float:
+        if key in self.scores:
+            self.n_score_hits += 1
+            return self.scores[key]
+        val = float(compute())
+        self.n_fits += 1
+        self.scores[key] = val
+        with open(self.scores_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "roc_auc": val}) + "\n")
+        return val
+
+
+def make_folds(X, y, build_preprocessor, categorical_indices, cache: FoldCache, encoding: str):
+    """Returns [(fold_key, loader)] for N_FOLDS hash-assigned folds."""
+    h = row_hashes(X, y)
+    fold_of = h % N_FOLDS
+    folds = []
+    for k in range(N_FOLDS):
+        tr, va = fold_of != k, fold_of == k
+        key = _sha(encoding, PREPROCESS_VERSION, np.sort(h[tr]).tobytes(), b"|", np.sort(h[va]).tobytes())
+
+        def build(tr=tr, va=va):
+            pre = build_preprocessor(X, encoding)
+            return {
+                "X_train": pre.fit_transform(X.loc[tr]).astype(np.float64),
+                "y_train": y.to_numpy()[tr],
+                "X_val": pre.transform(X.loc[va]).astype(np.float64),
+                "y_val": y.to_numpy()[va],
+                "cat_idx": np.array(categorical_indices(pre) if encoding == "native" else [], dtype=np.int64),
+            }
+
+        folds.append((key, lambda key=key, build=build: cache.fold(key, build)))
+    return folds
+
+
+def cv_score(params: dict, n_iter: int, folds, cache: FoldCache, random_state: int) -> float:
+    scores = []
+    for fold_key, load in folds:
+        key = _sha(fold_key, json.dumps(params, sort_keys=True), n_iter, random_state)
+
+        def compute(load=load):
+            d = load()
+            cat = d["cat_idx"].tolist() or None
+            model = HistGradientBoostingClassifier(
+                max_iter=n_iter, categorical_features=cat, random_state=random_state, **params
+            )
+            model.fit(d["X_train"], d["y_train"])
+            return roc_auc_score(d["y_val"], model.predict_proba(d["X_val"])[:, 1])
+
+        scores.append(cache.score(key, compute))
+    return float(np.mean(scores))
+
+
+def successive_halving(X, y, build_preprocessor, categorical_indices, encoding: str,
+                       random_state: int = 42, n_candidates=N_CANDIDATES, cache_dir=CACHE_DIR) -> dict:
+    cache = FoldCache(cache_dir)
+    folds = make_folds(X, y, build_preprocessor, categorical_indices, cache, encoding)
+
+    candidates = sample_candidates(n_candidates, random_state)
+    n_iter = MIN_ITER
+    history = []
+    best_score, best = -np.inf, None
+    while True:
+        scored = [(cv_score(p, n_iter, folds, cache, random_state), p) for p in candidates]
+        scored.sort(key=lambda t: -t[0])
+        history.append({"max_iter": n_iter, "n_candidates": len(candidates), "best_roc_auc": scored[0][0]})
+        print(f"[INFO] rung max_iter={n_iter}: {len(candidates)} candidates | best CV ROC-AUC={scored[0][0]:.4f}")
+
+        # more iterations can overfit, so the winner may come from an earlier rung
+        if scored[0][0] > best_score:
+            best_score, best = scored[0][0], {**scored[0][1], "max_iter": n_iter}
+
+        if len(scored) <= 1 or n_iter >= MAX_ITER:
+            break
+        candidates = [p for _, p in scored[:max(1, len(scored) // ETA)]]
+        n_iter = min(n_iter * ETA, MAX_ITER)
+
+    return {
+        "params": best,
+        "cv_roc_auc": best_score,
+        "data_hash": _sha(np.sort(row_hashes(X, y)).tobytes()),
+        "n_folds": N_FOLDS,
+        "rungs": history,
+        "cache": {
+            "folds_built": cache.n_built,
+            "folds_loaded": cache.n_loaded,
+            "fits": cache.n_fits,
+            "score_cache_hits": cache.n_score_hits,
+        },
+    }
@@ -0,0 +1,777 @@
+"""
+Fuzzy matching of raw GradCafe university names to QS institutions.
+
+An exact join on institution_clean loses every spelling variant ("University Of
+Michigan", "SUNY Stony Brook", "University of California (UCLA)"), and
+comparing every raw name with every QS name is O(N x M). Here:
+
+  aliases     every QS name gives a few exact keys: the full name, the name
+              without its "(...)" part and the acronym inside it ("ucla").
+              A key shared by two institutions ("ntu") is dropped.
+  features    character 3-grams of a key plus its word bigrams ("of michigan"),
+              IDF weighted; bigrams count BIGRAM_WEIGHT times a gram so word
+              order matters ("university of michigan" vs "michigan state university").
+  index       inverted index feature -> QS keys, without the features found in
+              more than MAX_FEATURE_SHARE of the keys ("uni", "university of"):
+              a raw name only meets the keys it shares a distinctive feature with.
+  scoring     for all (name, candidate) pairs of a batch at once: the share of the
+              name's feature weight found in the candidate and the share of the
+              candidate's found in the name, mixed QUERY_WEIGHT : 1 - QUERY_WEIGHT
+              (raw names are often short forms: "University of Maryland"). The best
+              institution is accepted at >= MIN_SCORE when it beats the runner-up
+              by MIN_MARGIN, so "University of California" (every UC campus is
+              as close) stays unmatched.
+  words       a similar spelling is not enough: every distinctive word of the raw
+              name (not in GENERIC_WORDS / QUERY_NOISE_WORDS) must be in the QS
+              name, typos and prefixes allowed ("Massachuetts", "Penn State"), so
+              "Central Missouri" is not "Central Florida". The QS name's own words
+              must be in the raw name too, except a trailing campus: its own part
+              of the name ("University of Michigan" -> "...-Ann Arbor") or the words
+              after "University of X" ("...Minnesota Twin Cities"), but not
+              "University of San Diego" -> "University of California. San Diego"
+              or "Maryland Baltimore" -> "Maryland, Baltimore County").
+              "X University" never matches "University of X" (Miami, Ottawa).
+  cache       resolved names go into a JSON lookup table under cache/, keyed by
+              the QS key list and MATCHER_VERSION, so later runs only score new
+              spellings.
+
+Unmatched is preferred over a wrong school: names that need outside knowledge
+("UW Madison", "Virginia Tech") or name a branch campus QS does not rank
+("University of Washington Bothell") stay unmatched. MIN_SCORE / MIN_MARGIN
+are calibrated (--calibrate) on LABELS_PATH, every GradCafe spelling that
+needs the fuzzy step with its hand-checked QS school (empty: not in QS, a
+branch campus or an ambiguous short form), plus near misses made from QS
+names ("Central Missouri"). Scored on names the thresholds were not picked
+on (5-fold cross-validation): 0 wrong of 110 held-out matches (precision
+>= 97% at 95% confidence), 58.5% of the labelled rows matched.
+
+    python institution_matcher.py                  # match the GradCafe names, lowest scores first
+    python institution_matcher.py --bench 100000   # synthetic, near-miss and labelled names + throughput
+    python institution_matcher.py --calibrate      # precision / recall per threshold, and held out (k-fold)
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from table_store import load_table
+
+# =========================
+# CONFIG
+# =========================
+QS_PATH = Path("QS World Ranking/EDA: QS/qs_ranking_eda.csv")
+GRADCAFE_PATH = Path("GradCafe/EDA: Gradcafe/gradcafe_eda.csv")
+LABELS_PATH = Path("institution_match_labels.csv")
+ALIAS_CACHE = Path("cache/institution_aliases.json")
+MATCHER_VERSION = "2"   # bump when keys / scoring change (invalidates the alias cache)
+
+NGRAM = 3
+BIGRAM_WEIGHT = 4.0
+MAX_FEATURE_SHARE = 0.01  # features in more keys than this are not used to find candidates
+QUERY_WEIGHT = 0.7
+MIN_SCORE = 0.5
+MIN_MARGIN = 0.15
+BATCH = 20_000
+
+# words that do not tell two schools apart; every other word has to match
+GENERIC_WORDS = {
+    "university", "universiti", "universidad", "universidade", "universitat", "universita", "universite",
+    "universitaet", "universiteit", "univ", "u", "college", "institute", "institut", "instituto",
+    "school", "of", "the", "and", "at", "in", "de", "for", "campus", "main", "suny",
+}
+# what GradCafe users add after the school (department, graduate school, country); raw names only
+QUERY_NOISE_WORDS = {
+    "computer", "science", "sciences", "information", "engineering", "dept", "department", "cs",
+    "graduate", "program", "masters", "ms", "mcs", "gsas", "usa", "viterbi", "courant", "tandon",
+}
+# distinctive, but not enough to leave the rest of a QS name out ("University of Western")
+WEAK_WORDS = {
+    "north", "south", "east", "west", "northern", "southern", "eastern", "western", "central", "national",
+    "state", "new", "city", "technical", "technological", "royal", "international", "federal", "american",
+}
+HEAD_WORDS = {"university", "college"}   # "X University" vs "University of X"
+TYPO_GENERIC = ("university", "college", "institute")   # "Univerisity", "Iniversity" are generic too
+TYPO_SHORT = ("of", "the", "and", "de", "at", "in", "for")  # "fo", "ed", "adn"; single letters stay ("A&T")
+
+BENCH_SEED = 42
+NEAR_MISSES = 2_000
+# campus / state names for near misses; any that occurs in a QS name is skipped
+NEAR_MISS_PLACES = (
+    "Missouri", "Omaha", "Duluth", "Dayton", "Toledo", "Akron", "Fresno", "Tulsa", "Boise", "Spokane",
+    "Wichita", "Lubbock", "Reno", "Tacoma", "Bothell", "Dearborn", "Flint", "Kingsville", "Huntsville",
+    "Fargo", "Laredo", "Savannah", "Mankato", "Stanislaus", "Bakersfield", "Pueblo", "Manitoba",
+    "Saskatchewan", "Regina", "Windsor", "Wollongong", "Ballarat", "Kerala", "Mysore", "Utrecht",
+    "Luzern", "Galway", "Stirling", "Keele", "Salford",
+)
+CALIBRATE_SCORES = (0.40, 0.45, 0.50, 0.55, 0.60, 0.65, 0.70, 0.75, 0.80, 0.85)
+CALIBRATE_MARGINS = (0.0, 0.02, 0.04, 0.06, 0.08, 0.10, 0.12, 0.15, 0.20)
+CALIBRATE_FOLDS = 5   # thresholds picked on 4/5 of the labels + near misses, scored on the rest
+
+PAREN = re.compile(r"\(([^)]*)\)")
+NON_ALNUM = re.compile(r"[^a-z0-9]+")
+# where a QS name starts a new part: "Michigan-Ann Arbor", "Maryland, College Park", "Illinois at Chicago"
+SEPARATOR = re.compile(r",|\.\s|[-\u2013\u2014()]|\s(?:at|in)\s", re.IGNORECASE)
+
+
+def match_key(name) -> str:
+    """lowercase ascii words: 'Université Paris-Saclay' -> 'universite paris saclay'."""
+    s = str(name)
+    if not s.isascii():
+        # accents go, other non-ascii characters ("–", stray script) separate words
+        s = "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c))
+        s = s.encode("ascii", "replace").decode("ascii").replace("?", " ")
+    s = s.lower()
+    s = s.replace("&", " and ")
+    s = NON_ALNUM.sub(" ", s).strip()
+    return s[4:] if s.startswith("the ") else s
+
+
+def name_keys(name) -> list:
+    """Exact keys of one name: full, without '(...)', and the acronym inside '(...)'."""
+    keys = [match_key(name)]
+    inner = PAREN.findall(str(name))
+    if inner:
+        keys.append(match_key(PAREN.sub(" ", str(name))))
+        for part in inner:
+            k = match_key(part)
+            # acronyms only: "(UCLA)", "(KAUST)" but not "(China)" / "(Caltech)"
+            if " " not in k and 2 <= len(k) <= 8 and sum(c.isupper() for c in part) >= 2:
+                keys.append(k)
+    return [k for k in dict.fromkeys(keys) if k]
+
+
+def key_features(key: str) -> dict:
+    """feature -> weight: padded character n-grams (1.0) and word bigrams (BIGRAM_WEIGHT)."""
+    padded = f" {key} "
+    feats = {padded[i:i + NGRAM]: 1.0 for i in range(len(padded) - NGRAM + 1)}
+    words = key.split()
+    feats.update({f"{a}_{b}": BIGRAM_WEIGHT for a, b in zip(words, words[1:])})
+    return feats
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance with adjacent transpositions ("Pennslyvania")."""
+    prev2, prev = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+@lru_cache(maxsize=None)
+def same_word(a: str, b: str) -> bool:
+    """
+    Equal, one a prefix of the other ("penn" / "pennsylvania", "urbana" /
+    "urbanachampaign"), or a typo: one edit from 5 letters, two from 8, same
+    first letter (so "baylor" is not "taylor").
+    """
+    if a == b:
+        return True
+    short, long = sorted((a, b), key=len)
+    if len(short) >= 4 and long.startswith(short):
+        return True
+    if len(short) < 5 or a[0] != b[0] or len(long) - len(short) > 2:
+        return False
+    return _edit_distance(a, b) <= (2 if len(short) >= 8 else 1)
+
+
+@lru_cache(maxsize=None)
+def is_generic(word: str) -> bool:
+    if word in GENERIC_WORDS:
+        return True
+    if len(word) == 2:
+        return any(_edit_distance(word, g) <= 1 for g in TYPO_SHORT)
+    if len(word) == 3:   # letters swapped only: "ain" is a word
+        return any(sorted(word) == sorted(g) for g in TYPO_SHORT)
+    return len(word) >= 6 and any(
+        abs(len(word) - len(g)) <= 2 and len(set(word) ^ set(g)) <= 4 and _edit_distance(word, g) <= 2
+        for g in TYPO_GENERIC
+    )
+
+
+def _is_head(word: str) -> bool:
+    """University / college, typos included ("Univeristy of Miami")."""
+    return word in HEAD_WORDS or (len(word) >= 6 and word not in GENERIC_WORDS and is_generic(word))
+
+
+@dataclass(frozen=True)
+class KeyWords:
+    words: tuple             # distinctive words, in order
+    seen: tuple              # words plus the ignored ones; they still cover the QS name's words
+    starts: Optional[frozenset]  # where an omitted trailing part may begin; None: nothing may be omitted
+    x_head: frozenset        # "X" of "X University"
+    of_head: frozenset       # "X" of "University of X"
+    aliases: frozenset = frozenset()   # acronyms of the school, accepted as query words
+
+
+def key_words(key: str, ignore=frozenset(), starts=None) -> KeyWords:
+    words = key.split()
+    is_head = [_is_head(w) for w in words]
+    generic = [is_generic(w) for w in words]
+    x_head, of_head = set(), set()
+    # runs up to the next head word: "Illinois at Chicago" University / University of "Cape Town"
+    for i in (i for i, h in enumerate(is_head) if h):
+        j = i - 1
+        while j >= 0 and not is_head[j]:
+            if not generic[j]:
+                x_head.add(words[j])
+            j -= 1
+        if i + 1 < len(words) and words[i + 1] == "of":
+            j = i + 2
+            while j < len(words) and not is_head[j]:
+                if not generic[j]:
+                    of_head.add(words[j])
+                j += 1
+    # "University of Maryland, College Park" names the place, not a "Maryland College"
+    x_head -= of_head
+    seen = tuple(w for w, g in zip(words, generic) if not g)
+    return KeyWords(
+        words=tuple(w for w in seen if w not in ignore), seen=seen,
+        starts=starts, x_head=frozenset(x_head), of_head=frozenset(of_head),
+    )
+
+
+def qs_key_words(name: str) -> KeyWords:
+    """
+    Words of a QS name. A trailing part after a separator may be left out; without
+    separators, any tail after the last "University" / "University of X" word
+    ("University of Minnesota Twin Cities", not "Oregon State University").
+    """
+    parts = [p for p in SEPARATOR.split(name) if match_key(p)]
+    if len(parts) > 1:
+        starts, pos = set(), 0
+        for p in parts[:-1]:
+            pos += len(key_words(match_key(p)).words)
+            starts.add(pos)
+    else:
+        words = match_key(name).split()
+        first, n = 1, 0
+        for i, w in enumerate(words):
+            if _is_head(w):
+                first = max(1, n + (i + 1 < len(words) and words[i + 1] == "of"))
+            elif not is_generic(w):
+                n += 1
+        starts = set(range(first, n))
+    return key_words(match_key(name), starts=frozenset(starts))
+
+
+def words_match(q: KeyWords, c: KeyWords) -> bool:
+    """Raw name q against QS key c: see 'words' in the module docstring."""
+    if not q.words:
+        return False
+    # a QS word spelled out exactly is taken: "King Faisal University Kingsville" is not covered by "king"
+    loose = [x for x in c.words if x not in q.seen]
+    if not all(w in c.aliases or w in c.words or any(same_word(w, x) for x in loose) for w in q.words):
+        return False
+    missing = [j for j, w in enumerate(c.words) if not any(same_word(w, x) for x in q.seen)]
+    if missing:
+        if all(w in WEAK_WORDS for w in q.words):
+            return False
+        if c.starts is None or missing[0] not in c.starts or missing != list(range(missing[0], len(c.words))):
+            return False
+    flipped = any(same_word(a, b) for a in q.x_head for b in c.of_head) or \
+        any(same_word(a, b) for a in q.of_head for b in c.x_head)
+    return not flipped
+
+
+class InstitutionMatcher:
+    def __init__(self, qs: pd.DataFrame, name_col: str = "Institution", key_col: str = "institution_clean"):
+        qs = qs.dropna(subset=[name_col, key_col]).drop_duplicates(key_col)
+        self.targets = qs[key_col].astype(str).to_numpy()
+
+        # key -> (rank, owners): a full name (rank 0) wins over another school's
+        # shortened form / acronym (rank 1) of the same key
+        owners = {}
+        for i, name in enumerate(qs[name_col].astype(str)):
+            full = {match_key(name), match_key(self.targets[i])}
+            for k in set(name_keys(name)) | full:
+                rank = 0 if k in full else 1
+                prev_rank, prev = owners.get(k, (rank, set()))
+                if rank < prev_rank:
+                    owners[k] = (rank, {i})
+                elif rank == prev_rank:
+                    owners[k] = (rank, prev | {i})
+        self.exact = {k: next(iter(v)) for k, (_, v) in owners.items() if len(v) == 1}
+
+        # words per key: keys spelled from the QS name know its parts, any other key
+        # (the pipeline's institution_clean) has to be covered whole
+        qs_words = {}
+        for name in qs[name_col].astype(str):
+            for n in (name, PAREN.sub(" ", name)):
+                qs_words.setdefault(match_key(n), qs_key_words(n))
+
+        # fuzzy index over the unambiguous multi-word keys (acronyms are exact-only)
+        keys = [k for k in self.exact if " " in k]
+        self.key_owner = np.array([self.exact[k] for k in keys], dtype=np.int64)
+        acronyms = {}
+        for k, i in self.exact.items():
+            if " " not in k:
+                acronyms.setdefault(i, set()).add(k)
+        self.key_words = [
+            replace(qs_words.get(k) or key_words(k), aliases=frozenset(acronyms.get(i, ())))
+            for k, i in zip(keys, self.key_owner)
+        ]
+
+        self.vocab = {}
+        W = self._weights(keys, grow=True)
+        present = (W > 0).astype(np.float64)
+        df = np.asarray(present.sum(axis=0)).ravel()
+        self.idf = np.log((1 + len(keys)) / (1 + df)) + 1.0
+        self.idf_unseen = np.log(1 + len(keys)) + 1.0
+        self.present = present.tocsr()
+        self.key_mass = np.asarray(W.multiply(self.idf).sum(axis=1)).ravel()
+
+        # inverted index: distinctive feature -> keys (the transposed key x feature matrix)
+        self.index_cols = np.flatnonzero(df <= max(1.0, MAX_FEATURE_SHARE * len(keys)))
+        self.index = present[:, self.index_cols].T.tocsr()
+
+        self.n_scored = self.n_pairs = 0  # fuzzy-scored names / candidate pairs, for the benchmark
+        self.version = hashlib.sha1(
+            (MATCHER_VERSION + "\n" + "\n".join(sorted(self.exact))).encode("utf-8")
+        ).hexdigest()[:16]
+
+    @classmethod
+    def from_csv(cls, qs_path=QS_PATH) -> "InstitutionMatcher":
+        return cls(load_table(qs_path))
+
+    def _weights(self, keys: list, grow: bool = False, unseen: Optional[np.ndarray] = None) -> sp.csr_matrix:
+        """keys x vocabulary feature weights; unseen[r] collects the weight of features not in the vocabulary."""
+        rows, cols, vals = [], [], []
+        for r, k in enumerate(keys):
+            for f, w in key_features(k).items():
+                c = self.vocab.setdefault(f, len(self.vocab)) if grow else self.vocab.get(f)
+                if c is None:
+                    unseen[r] += w
+                    continue
+                rows.append(r)
+                cols.append(c)
+                vals.append(w)
+        return sp.csr_matrix((vals, (rows, cols)), shape=(len(keys), len(self.vocab)))
+
+    def _fuzzy(self, keys: list, floor: float = MIN_SCORE - MIN_MARGIN):
+        """
+        Best institution, its score and the runner-up's score for a batch of keys
+        (vectorized). Only candidates scoring >= floor whose words match count.
+        """
+        n = len(keys)
+        best = np.full(n, -1, dtype=np.int64)
+        best_score = np.zeros(n)
+        second_score = np.zeros(n)
+        if n == 0 or len(self.key_owner) == 0:
+            return best, best_score, second_score
+
+        unseen = np.zeros(n)
+        W = self._weights(keys, unseen=unseen)
+        Wi = W.multiply(self.idf).tocsr()
+        query_mass = np.asarray(Wi.sum(axis=1)).ravel() + unseen * self.idf_unseen
+
+        # candidates: keys sharing at least one distinctive feature (sparse product = posting-list walk)
+        cand = (W[:, self.index_cols] @ self.index).tocoo()
+        qi, ki = cand.row, cand.col
+        self.n_scored += n
+        self.n_pairs += len(qi)
+        if len(qi) == 0:
+            return best, best_score, second_score
+
+        shared = np.asarray(Wi[qi].multiply(self.present[ki]).sum(axis=1)).ravel()
+        score = (QUERY_WEIGHT * shared / query_mass[qi]
+                 + (1 - QUERY_WEIGHT) * np.minimum(shared / self.key_mass[ki], 1.0))
+
+        # word check on the few pairs that could win (or block a winner as runner-up)
+        near = np.flatnonzero(score >= floor)
+        query_words = {}
+        ok = np.zeros(len(near), dtype=bool)
+        for j, (q, k) in enumerate(zip(qi[near], ki[near])):
+            if q not in query_words:
+                # numbers ("#2", a year) are noise too
+                ignore = QUERY_NOISE_WORDS | {w for w in keys[q].split() if w.isdigit()}
+                query_words[q] = key_words(keys[q], ignore=ignore)
+            ok[j] = words_match(query_words[q], self.key_words[k])
+        qi, ki, score = qi[near[ok]], ki[near[ok]], score[near[ok]]
+        if len(qi) == 0:
+            return best, best_score, second_score
+        inst = self.key_owner[ki]
+
+        # max per (query, institution), then the two best institutions per query
+        order = np.lexsort((-score, inst, qi))
+        qi, inst, score = qi[order], inst[order], score[order]
+        first = np.r_[True, (qi[1:] != qi[:-1]) | (inst[1:] != inst[:-1])]
+        qi, inst, score = qi[first], inst[first], score[first]
+
+        order = np.lexsort((-score, qi))
+        qi, inst, score = qi[order], inst[order], score[order]
+        starts = np.flatnonzero(np.r_[True, qi[1:] != qi[:-1]])
+        best[qi[starts]] = inst[starts]
+        best_score[qi[starts]] = score[starts]
+        has_second = np.r_[starts[1:], len(qi)] - starts > 1
+        second_score[qi[starts[has_second]]] = score[starts[has_second] + 1]
+        return best, best_score, second_score
+
+    def resolve(self, names, min_score: float = MIN_SCORE, min_margin: float = MIN_MARGIN) -> dict:
+        """Distinct raw names -> (QS institution_clean or None, score)."""
+        out, pending, pending_keys = {}, [], []
+        for name in names:
+            hit = next((self.exact[k] for k in name_keys(name) if k in self.exact), None)
+            if hit is not None:
+                out[name] = (self.targets[hit], 1.0)
+            else:
+                pending.append(name)
+                pending_keys.append(match_key(PAREN.sub(" ", str(name))))
+
+        for start in range(0, len(pending), BATCH):
+            best, s1, s2 = self._fuzzy(pending_keys[start:start + BATCH], min_score - min_margin)
+            ok = (best >= 0) & (s1 >= min_score) & (s1 - s2 >= min_margin)
+            for j, name in enumerate(pending[start:start + BATCH]):
+                out[name] = (self.targets[best[j]] if ok[j] else None, round(float(s1[j]), 4))
+        return out
+
+
+class AliasCache:
+    """raw name -> [QS institution_clean or null, score], saved as JSON between runs."""
+
+    def __init__(self, path=ALIAS_CACHE):
+        self.path = Path(path)
+        self.version = None
+        self.aliases = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.version, self.aliases = data.get("version"), data.get("aliases", {})
+        self.hits = self.misses = 0
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": self.version, "aliases": self.aliases}, ensure_ascii=False),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
+
+
+def match_names(names, matcher: InstitutionMatcher, cache: Optional[AliasCache] = None) -> pd.DataFrame:
+    """
+    Matches a column of raw names. Only distinct names are resolved (cache first).
+    Returns one row per input name: institution_clean (None when unmatched) and match_score.
+    """
+    names = pd.Series(names).astype(str)
+    codes, uniques = pd.factorize(names)
+
+    resolved = {}
+    todo = list(uniques)
+    if cache is not None:
+        if cache.version != matcher.version:
+            cache.version, cache.aliases = matcher.version, {}
+        todo = [u for u in uniques if u not in cache.aliases]
+        cache.hits += len(uniques) - len(todo)
+        cache.misses += len(todo)
+        resolved = {u: cache.aliases[u] for u in uniques if u in cache.aliases}
+
+    new = matcher.resolve(todo)
+    resolved.update(new)
+    if cache is not None and new:
+        cache.aliases.update({k: list(v) for k, v in new.items()})
+        cache.save()
+
+    target = np.array([resolved[u][0] for u in uniques], dtype=object)
+    score = np.array([resolved[u][1] for u in uniques], dtype=float)
+    return pd.DataFrame({"institution_clean": target[codes], "match_score": score[codes]}, index=names.index)
+
+
+# =========================
+# benchmark
+# =========================
+def _variants(name: str, rng) -> str:
+    """A plausible user spelling of a QS name (case, typos, dropped words, campus suffix)."""
+    s = PAREN.sub(" ", name).replace(".", ",")
+    words = s.split()
+    op = rng.integers(6)
+    if op == 0:
+        s = s.title()
+    elif op == 1 and len(s) > 8:
+        i = rng.integers(1, len(s) - 1)
+        s = s[:i] + s[i + 1:]                      # dropped letter
+    elif op == 2 and len(s) > 8:
+        i = rng.integers(1, len(s) - 2)
+        s = s[:i] + s[i + 1] + s[i] + s[i + 2:]    # swapped letters
+    elif op == 3:
+        s = " ".join(w for w in words if w.lower() not in ("the", "of", "and")) or s
+    elif op == 4:
+        s = s + rng.choice([" Main Campus", " (Graduate School)", ", USA", " - CS Dept"])
+    else:
+        s = s.upper()
+    return s + " " * int(rng.integers(2))
+
+
+def _near_misses(qs: pd.DataFrame, matcher: InstitutionMatcher, n: int, rng) -> list:
+    """
+    Names one step from a real QS school that must stay unmatched: "University
+    of X" <-> "X University", the last word swapped for a place QS does not
+    rank ("Central Florida" -> "Central Missouri"), or a branch campus appended.
+    """
+    src = qs["Institution"].astype(str).map(lambda x: PAREN.sub(" ", x).strip()).to_numpy()
+    qs_words = {w for x in src for w in match_key(x).split()}
+    # "Washington University" and "University of Newcastle" are QS names once the campus part is cut
+    real = {match_key(SEPARATOR.split(x)[0]).removeprefix("the ") for x in src}
+    places = [p for p in NEAR_MISS_PLACES if match_key(p) not in qs_words]
+    out = set()
+    for _ in range(n * 20):
+        if len(out) >= n:
+            break
+        name = src[rng.integers(len(src))]
+        words = name.split()
+        op = rng.integers(3)
+        if op == 0 and words[0] == "University" and len(words) > 2 and words[1] == "of":
+            v = " ".join(words[2:] + ["University"])
+        elif op == 0 and words[-1] == "University" and len(words) > 1:
+            v = " ".join(["University", "of"] + words[:-1])
+        elif op == 1:
+            last = [i for i, w in enumerate(words) if match_key(w) and not is_generic(match_key(w))]
+            if not last:
+                continue
+            v = " ".join(words[:last[-1]] + [rng.choice(places)] + words[last[-1] + 1:])
+        elif op == 2:
+            v = f"{name} {rng.choice(places)}"
+        else:
+            continue
+        if match_key(v) not in matcher.exact and match_key(v).removeprefix("the ") not in real:
+            out.add(v)
+    return sorted(out)
+
+
+def load_labels(path=LABELS_PATH) -> dict:
+    """Hand-checked GradCafe spelling -> QS institution_clean (None: not a QS school)."""
+    labels = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return {n: (t or None) for n, t in zip(labels["name"], labels["institution_clean"])}
+
+
+def _score_labelled(res: dict, labels: dict, rows: pd.Series) -> dict:
+    """Precision / recall of resolve() output on the labelled names, by name and by GradCafe row."""
+    names = list(labels)
+    got = np.array([res[n][0] for n in names], dtype=object)
+    want = np.array([labels[n] for n in names], dtype=object)
+    w = rows.reindex(names).fillna(1).to_numpy()
+    matched = np.array([g is not None for g in got])
+    correct = matched & (got == want)
+    has_truth = np.array([t is not None for t in want])
+    return {
+        "precision": correct.sum() / max(1, matched.sum()),
+        "recall": correct.sum() / max(1, has_truth.sum()),
+        "row_precision": w[correct].sum() / max(1, w[matched].sum()),
+        "row_recall": w[correct].sum() / max(1, w[has_truth].sum()),
+        "wrong": [(n, g, t) for n, g, t, m, c in zip(names, got, want, matched, correct) if m and not c],
+    }
+
+
+def _gradcafe_rows(gradcafe_path) -> pd.Series:
+    """GradCafe rows per raw university name (1 each when the table is not there)."""
+    if not Path(gradcafe_path).exists():
+        return pd.Series(dtype=float)
+    return load_table(gradcafe_path)["university"].value_counts()
+
+
+def bench(n_names: int, qs_path=QS_PATH, seed=BENCH_SEED, labels_path=LABELS_PATH, gradcafe_path=GRADCAFE_PATH):
+    """
+    n_names distinct raw names: 80% spellings of real QS institutions (truth known),
+    20% made-up schools that must stay unmatched. Then near misses of real
+    schools and the hand-labelled GradCafe names, where wrong matches show up.
+    """
+    matcher = InstitutionMatcher.from_csv(qs_path)
+    qs = load_table(qs_path).drop_duplicates("institution_clean")
+    rng = np.random.default_rng(seed)
+
+    names, truth = {}, {}
+    n_real = int(n_names * 0.8)
+    src_names = qs["Institution"].astype(str).to_numpy()
+    src_keys = qs["institution_clean"].astype(str).to_numpy()
+    words = ["Northern", "Coastal", "Valley", "Pacific", "Summit", "Lakeside", "Heritage", "Metro"]
+    kinds = ["College", "Institute", "Academy", "University", "Polytechnic"]
+    while len(names) < n_real:
+        i = rng.integers(len(src_names))
+        v = _variants(src_names[i], rng)
+        if rng.random() < 0.5:
+            v = f"{v} #{rng.integers(1_000_000)}"  # keeps names distinct like per-user spellings do
+        names.setdefault(v, src_keys[i])
+    while len(names) < n_names:
+        fake = f"{rng.choice(words)} {rng.choice(words)} {rng.choice(kinds)} of {rng.integers(1_000_000)}"
+        names.setdefault(fake, None)
+    truth = names
+    raw = list(truth)
+
+    t0 = time.perf_counter()
+    res = matcher.resolve(raw)
+    seconds = time.perf_counter() - t0
+
+    got = np.array([res[r][0] for r in raw], dtype=object)
+    want = np.array([truth[r] for r in raw], dtype=object)
+    is_real = np.array([w is not None for w in want])
+    matched = np.array([g is not None for g in got])
+    correct = matched & (got == want)
+
+    print(f"[OK] {len(raw)} distinct names | {len(matcher.targets)} QS institutions | "
+          f"{len(matcher.key_owner)} fuzzy keys, {len(matcher.index_cols)} of {len(matcher.vocab)} features indexed")
+    print(f"[OK] Synthetic: match rate (real schools) {matched[is_real].mean():.1%} | "
+          f"precision of matches: {correct.sum() / max(1, matched.sum()):.1%} | "
+          f"made-up schools matched: {matched[~is_real].mean():.1%}")
+    print(f"[OK] {seconds:.2f} s -> {len(raw) / seconds:,.0f} names/s | "
+          f"{matcher.n_pairs / max(1, matcher.n_scored):.1f} candidate keys scored per fuzzy name "
+          f"(pairwise: {len(matcher.key_owner)})")
+
+    near = _near_misses(qs, matcher, NEAR_MISSES, rng)
+    near_res = matcher.resolve(near)
+    wrong = [(n, near_res[n][0]) for n in near if near_res[n][0] is not None]
+    print(f"[OK] Near misses matched: {len(wrong)} of {len(near)} ({len(wrong) / max(1, len(near)):.1%})")
+    for n, g in wrong[:10]:
+        print(f"[WARN]   {n!r} -> {g!r}")
+
+    if not Path(labels_path).exists():
+        print(f"[WARN] {labels_path} not found, skipping the labelled GradCafe names.")
+        return
+    labels = load_labels(labels_path)
+    r = _score_labelled(matcher.resolve(list(labels)), labels, _gradcafe_rows(gradcafe_path))
+    print(f"[OK] Labelled GradCafe names ({len(labels)}): precision {r['precision']:.1%} | recall {r['recall']:.1%} | "
+          f"by rows: precision {r['row_precision']:.1%}, recall {r['row_recall']:.1%} "
+          f"(thresholds tuned on these names; --calibrate reports held-out precision)")
+    for n, g, t in r["wrong"][:10]:
+        print(f"[WARN]   {n!r} -> {g!r} (label: {t!r})")
+
+
+def _grid_metrics(runs: dict, labels: dict, rows: pd.Series, near: list) -> pd.DataFrame:
+    """One row per threshold pair: precision / recall on `labels` and near misses matched, from resolve() runs."""
+    out = []
+    for (min_score, min_margin), (res, near_res) in runs.items():
+        r = _score_labelled(res, labels, rows)
+        out.append({
+            "min_score": min_score, "min_margin": min_margin,
+            "precision": r["precision"], "recall": r["recall"], "row_recall": r["row_recall"],
+            "wrong": len(r["wrong"]), "near_matched": sum(near_res[n][0] is not None for n in near),
+        })
+    grid = pd.DataFrame(out)
+    grid["errors"] = grid["wrong"] + grid["near_matched"]
+    return grid
+
+
+def _pick_thresholds(grid: pd.DataFrame) -> Optional[pd.Series]:
+    """
+    Best row recall among the pairs without a wrong match whose one-step looser
+    neighbours have none either (ties: the stricter pair); None if there is none.
+    """
+    errors = grid.pivot(index="min_score", columns="min_margin", values="errors")
+    looser = errors.shift(1, axis=0).fillna(0) + errors.shift(1, axis=1).fillna(0)
+    ok = (errors == 0) & (looser == 0)
+    safe = grid[[ok.loc[sc, mg] for sc, mg in zip(grid["min_score"], grid["min_margin"])]]
+    if safe.empty:
+        return None
+    return safe.sort_values(["row_recall", "min_score", "min_margin"], ascending=[False, False, False]).iloc[0]
+
+
+def calibrate(qs_path=QS_PATH, labels_path=LABELS_PATH, gradcafe_path=GRADCAFE_PATH, seed=BENCH_SEED,
+              folds=CALIBRATE_FOLDS):
+    """
+    Precision / recall on the labelled names and near-miss matches for a grid of
+    MIN_SCORE x MIN_MARGIN, and the pair _pick_thresholds suggests from all of
+    them. Since that pair is tuned on these names, its precision is also
+    cross-validated: the labels and near misses are split into `folds` seeded
+    folds, the pair is picked on all but one and scored on the held-out one.
+    """
+    matcher = InstitutionMatcher.from_csv(qs_path)
+    qs = load_table(qs_path).drop_duplicates("institution_clean")
+    labels = load_labels(labels_path)
+    rows = _gradcafe_rows(gradcafe_path)
+    rng = np.random.default_rng(seed)
+    near = _near_misses(qs, matcher, NEAR_MISSES, rng)
+
+    runs = {
+        (min_score, min_margin): (matcher.resolve(list(labels), min_score, min_margin),
+                                  matcher.resolve(near, min_score, min_margin))
+        for min_score in CALIBRATE_SCORES for min_margin in CALIBRATE_MARGINS
+    }
+    grid = _grid_metrics(runs, labels, rows, near)
+    print(grid.pivot(index="min_score", columns="min_margin", values="row_recall").round(3).to_string())
+    print("Wrong matches (labelled + near misses):")
+    print(grid.pivot(index="min_score", columns="min_margin", values="errors").to_string())
+
+    best = _pick_thresholds(grid)
+    if best is None:
+        print("[WARN] No threshold pair is free of wrong matches.")
+        return grid
+    print(f"[OK] MIN_SCORE={best['min_score']:.2f} MIN_MARGIN={best['min_margin']:.2f}: "
+          f"precision {best['precision']:.1%}, recall {best['recall']:.1%} (rows {best['row_recall']:.1%}) "
+          f"on the names it was picked on | now: MIN_SCORE={MIN_SCORE} MIN_MARGIN={MIN_MARGIN}")
+
+    # held-out scores: the pair picked without fold k, applied to fold k
+    names = list(labels)
+    label_fold = rng.permutation(len(names)) % folds
+    near_fold = rng.permutation(len(near)) % folds
+    w = rows.reindex(names).fillna(1).to_numpy()
+    tot = {"matched": 0, "correct": 0, "truth": 0, "w_matched": 0.0, "w_correct": 0.0, "w_truth": 0.0, "near": 0}
+    for k in range(folds):
+        fit_labels = {n: labels[n] for n, f in zip(names, label_fold) if f != k}
+        fit_near = [n for n, f in zip(near, near_fold) if f != k]
+        pick = _pick_thresholds(_grid_metrics(runs, fit_labels, rows, fit_near))
+        if pick is None:
+            print(f"[WARN] Fold {k + 1}: no error-free pair on the other folds; skipped")
+            continue
+        res, near_res = runs[(pick["min_score"], pick["min_margin"])]
+        held = label_fold == k
+        got = np.array([res[n][0] for n in names], dtype=object)
+        want = np.array([labels[n] for n in names], dtype=object)
+        matched = held & np.array([g is not None for g in got])
+        correct = matched & (got == want)
+        truth = held & np.array([t is not None for t in want])
+        n_near = sum(near_res[n][0] is not None for n, f in zip(near, near_fold) if f == k)
+        for key, m in (("matched", matched), ("correct", correct), ("truth", truth)):
+            tot[key] += int(m.sum())
+            tot["w_" + key] += float(w[m].sum())
+        tot["near"] += n_near
+        print(f"[INFO] Fold {k + 1}/{folds}: MIN_SCORE={pick['min_score']:.2f} MIN_MARGIN={pick['min_margin']:.2f} "
+              f"-> held out: {int(correct.sum())}/{int(matched.sum())} matches right, {n_near} near misses matched")
+    print(f"[OK] Held-out ({folds}-fold): precision {tot['correct'] / max(1, tot['matched']):.1%} "
+          f"({tot['matched'] - tot['correct']} wrong of {tot['matched']}), "
+          f"recall {tot['correct'] / max(1, tot['truth']):.1%} | by rows: precision "
+          f"{tot['w_correct'] / max(1, tot['w_matched']):.1%}, recall {tot['w_correct'] / max(1, tot['w_truth']):.1%} "
+          f"| near misses matched: {tot['near']} of {len(near)}")
+    return grid
+
+
+def main(qs_path=QS_PATH, gradcafe_path=GRADCAFE_PATH, show: int = 25):
+    """Matches the GradCafe university column and prints what exact keys would have lost."""
+    matcher = InstitutionMatcher.from_csv(qs_path)
+    cache = AliasCache()
+    grad = load_table(gradcafe_path)
+    m = match_names(grad["university"], matcher, cache)
+
+    print(f"[OK] Rows matched: {m['institution_clean'].notna().mean():.1%} of {len(m)} | "
+          f"distinct names: {grad['university'].nunique()} | cache hits {cache.hits}, misses {cache.misses}")
+    table = pd.concat([grad["university"], m], axis=1).drop_duplicates("university")
+    print(table.sort_values("match_score").head(show).to_string(index=False))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Fuzzy GradCafe -> QS institution matching.")
+    ap.add_argument("--bench", type=int, default=0, metavar="N", help="benchmark on N synthetic distinct names")
+    ap.add_argument("--calibrate", action="store_true",
+                    help="precision / recall per MIN_SCORE x MIN_MARGIN on the labelled names")
+    ap.add_argument("--qs", default=str(QS_PATH))
+    ap.add_argument("--gradcafe", default=str(GRADCAFE_PATH))
+    ap.add_argument("--labels", default=str(LABELS_PATH))
+    args = ap.parse_args()
+
+    if args.calibrate:
+        calibrate(args.qs, args.labels, args.gradcafe)
+    elif args.bench:
+        bench(args.bench, args.qs, labels_path=args.labels, gradcafe_path=args.gradcafe)
+    else:
+        main(args.qs, args.gradcafe)
@@ -0,0 +1,115 @@
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+# =========================
+# CONFIG
+# =========================
+URL = "http://127.0.0.1:8000"
+N_REQUESTS = 2000
+CONCURRENCY = 16
+
+SAMPLE_ROW = {
+    "gpa_raw": 3.5,
+    "gre_total": 160,
+    "is_international": 1,
+    "program": "Computer Science Masters",
+    "term": "S24",
+    "institution_clean": "rice university",
+}
+
+
+def make_body(endpoint: str, rng: np.random.Generator) -> dict:
+    row = dict(SAMPLE_ROW)
+    row["gpa_raw"] = round(float(rng.uniform(2.5, 4.0)), 2)
+    row["gre_total"] = int(rng.integers(130, 171))
+
+    if endpoint == "/predict":
+        return row
+    if endpoint == "/predict_batch":
+        return {"rows": [row] * 32}
+    if endpoint == "/topk":
+        row.pop("institution_clean")
+        row["k"] = 10
+        return row
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def post(url: str, body: dict) -> float:
+    data = json.dumps(body).encode("utf-8")
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req) as resp:
+            resp.read()
+    except urllib.error.HTTPError as e:
+        # serve.py puts the reason in the JSON body ({"error": ...})
+        raise RuntimeError(f"HTTP {e.code}: {e.read().decode('utf-8', 'replace')}") from None
+    return time.perf_counter() - t0
+
+
+def run_load(base_url=URL, endpoint="/predict", n_requests=N_REQUESTS, concurrency=CONCURRENCY):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+
+    def worker(seed):
+        rng = np.random.default_rng(seed)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            try:
+                dt = post(base_url + endpoint, make_body(endpoint, rng))
+                with lock:
+                    latencies.append(dt)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    lat_ms = np.array(latencies) * 1000
+    stats = {
+        "endpoint": endpoint,
+        "requests": n_requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_s": wall,
+        "rps": len(latencies) / wall if wall > 0 else float("nan"),
+        "p50_ms": float(np.percentile(lat_ms, 50)) if len(lat_ms) else float("nan"),
+        "p99_ms": float(np.percentile(lat_ms, 99)) if len(lat_ms) else float("nan"),
+    }
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Load test for serve.py (p50/p99 latency, requests/sec).")
+    ap.add_argument("--url", default=URL)
+    ap.add_argument("--endpoint", default="all", choices=["all", "/predict", "/predict_batch", "/topk"])
+    ap.add_argument("-n", "--requests", type=int, default=N_REQUESTS)
+    ap.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY)
+    args = ap.parse_args()
+
+    endpoints = ["/predict", "/predict_batch", "/topk"] if args.endpoint == "all" else [args.endpoint]
+    for ep in endpoints:
+        s = run_load(args.url, ep, args.requests, args.concurrency)
+        print(
+            f"{s['endpoint']:<15} n={s['requests']} c={s['concurrency']} errors={s['errors']} | "
+            f"{s['rps']:.1f} req/s | p50={s['p50_ms']:.2f} ms | p99={s['p99_ms']:.2f} ms"
+        )
+        if s["first_error"]:
+            print(f"[WARN] First error: {s['first_error']}")
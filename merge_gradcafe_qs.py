@@ -1,39 +1,85 @@
+import argparse
+
 import pandas as pd
 
-def merge_matched_only(
-    gradcafe_path="gradcafe_eda.csv",
-    qs_path="qs_ranking_eda.csv",
-    output_path="merged_matched_only.csv"
-):
-    grad = pd.read_csv(gradcafe_path)
-    qs = pd.read_csv(qs_path)
+from institution_matcher import AliasCache, InstitutionMatcher, match_names
+from qs_store import STORE_PATH, attach_ranks, load_store
+from table_store import load_table, save_table
+
 
+def join_qs(grad: pd.DataFrame, qs: pd.DataFrame, fuzzy: bool = True, cache=None, store=None) -> pd.DataFrame:
+    """
+    Inner join of GradCafe rows with QS.
+    fuzzy=True: the raw `university` name is matched to a QS institution
+    (institution_matcher.py) and institution_clean becomes that QS key.
+    fuzzy=False: exact join on institution_clean, as before.
+    store: QS store (qs_store.py); adds qs_year / rank_asof, the rank at each row's term.
+    """
     # checks
-    if "institution_clean" not in grad.columns:
-        raise ValueError(f"GradCafe missing 'institution_clean'. Columns: {list(grad.columns)}")
     if "institution_clean" not in qs.columns:
         raise ValueError(f"QS missing 'institution_clean'. Columns: {list(qs.columns)}")
+    raw_col = "university" if fuzzy and "university" in grad.columns else "institution_clean"
+    if raw_col not in grad.columns:
+        raise ValueError(f"GradCafe missing '{raw_col}'. Columns: {list(grad.columns)}")
 
     # normalize join key
-    grad["institution_clean"] = grad["institution_clean"].astype(str).str.strip().str.lower()
-    qs["institution_clean"] = qs["institution_clean"].astype(str).str.strip().str.lower()
+    qs = qs.assign(institution_clean=qs["institution_clean"].astype(str).str.strip().str.lower())
 
     # QS duplicate handling (same uni birden fazla ise tekilleştir)
     if "Rank2025" in qs.columns:
-        qs["Rank2025"] = pd.to_numeric(qs["Rank2025"], errors="coerce")
         qs = qs.sort_values("Rank2025").drop_duplicates(subset=["institution_clean"], keep="first")
     else:
         qs = qs.drop_duplicates(subset=["institution_clean"], keep="first")
 
+    if fuzzy:
+        m = match_names(grad[raw_col], InstitutionMatcher(qs), cache)
+        grad = grad.assign(institution_clean=m["institution_clean"].to_numpy())
+        grad = grad[grad["institution_clean"].notna()]
+        print(f"[INFO] Fuzzy match: {m['institution_clean'].notna().mean():.1%} of rows, "
+              f"{grad[raw_col].nunique()} spellings -> {grad['institution_clean'].nunique()} QS institutions"
+              + (f" | alias cache hits {cache.hits}, misses {cache.misses}" if cache is not None else ""))
+    else:
+        grad = grad.assign(institution_clean=grad["institution_clean"].astype(str).str.strip().str.lower())
+
     # INNER JOIN: sadece eşleşenler
     merged = grad.merge(qs, on="institution_clean", how="inner")
+    if store is not None and len(merged):
+        # by the QS name: the store keys are normalize_name(Institution), qs_ranking_eda's keys may be shortened
+        merged = attach_ranks(merged, store, key_col="Institution" if "Institution" in merged.columns else "institution_clean")
+        print(f"[INFO] Rank at term: {merged['rank_asof'].notna().mean():.1%} of rows | QS years used: "
+              + ", ".join(f"{int(y)}={n}" for y, n in merged["qs_year"].value_counts().sort_index().items()))
+    return merged
+
+
+def merge_matched_only(
+    gradcafe_path="gradcafe_eda.csv",
+    qs_path="qs_ranking_eda.csv",
+    output_path="merged_matched_only.csv",
+    fuzzy=True,
+    store_path=STORE_PATH
+):
+    grad = load_table(gradcafe_path)
+    qs = load_table(qs_path)  # Rank2025 comes back as float
+    store = load_store(store_path) if store_path else None
+    if store_path and store is None:
+        print(f"[INFO] No QS store at {store_path} (python qs_store.py builds it); Rank2025 only")
+
+    merged = join_qs(grad, qs, fuzzy=fuzzy, cache=AliasCache() if fuzzy else None, store=store)
 
     print("GradCafe rows:", len(grad))
     print("QS rows:", len(qs))
     print("✅ Matched rows (inner join):", len(merged))
 
-    merged.to_csv(output_path, index=False)
+    save_table(merged, output_path)
     print(f"✅ Saved → {output_path}")
 
 if __name__ == "__main__":
-    merge_matched_only()
+    ap = argparse.ArgumentParser(description="Join GradCafe with QS (matched rows only).")
+    ap.add_argument("--gradcafe", default="gradcafe_eda.csv")
+    ap.add_argument("--qs", default="qs_ranking_eda.csv")
+    ap.add_argument("--out", default="merged_matched_only.csv")
+    ap.add_argument("--exact", action="store_true", help="exact join on institution_clean (no fuzzy matching)")
+    ap.add_argument("--qs-store", default=str(STORE_PATH), help="multi-year QS store for rank_asof ('' to skip)")
+    args = ap.parse_args()
+
+    merge_matched_only(args.gradcafe, args.qs, args.out, fuzzy=not args.exact, store_path=args.qs_store)
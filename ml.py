@@ -1,11 +1,19 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
-from pathlib import Path
+import scipy.sparse as sp
+from threadpoolctl import threadpool_limits
 
+from sklearn.base import clone
 from sklearn.model_selection import train_test_split
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
 from sklearn.impute import SimpleImputer
 
 from sklearn.linear_model import LogisticRegression
@@ -19,6 +27,8 @@ from sklearn.metrics import (
     classification_report, confusion_matrix
 )
 
+from feature_store import load_features
+
 # =========================
 # CONFIG
 # =========================
@@ -33,43 +43,31 @@ TEST_SIZE = 0.20
 INCLUDE_PROGRAM = True
 INCLUDE_TERM = True
 
+# How categoricals are encoded, chosen per model below:
+#   "dense"  -> one-hot as a dense array (old behaviour, rows x vocabulary floats)
+#   "sparse" -> one-hot as a CSR matrix (linear models, RF/ExtraTrees, GB)
+#   "native" -> ordinal codes + HistGradientBoosting categorical_features
+DEFAULT_ENCODING = "sparse"
 
-def load_and_prepare(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path).copy()
-
-    # target: Accepted=1, Rejected=0
-    df["y"] = (
-        df["decision"].astype(str).str.strip().str.lower()
-        .map({"accepted": 1, "rejected": 0})
-    )
-
-    # numeric columns
-    for col in ["gpa_raw", "gre_total", "Rank2025"]:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+# HGB bins categories into at most max_bins (255); rarer spellings share one code
+MAX_NATIVE_CATEGORIES = 255
 
-    # log rank (lower rank is better; log helps scale)
-    if "Rank2025" in df.columns:
-        df["log_rank"] = np.log(df["Rank2025"].clip(lower=1))
+# Model zoo runs in a process pool; inner threads (RF/ExtraTrees n_jobs, OpenMP, BLAS)
+# get cpu_count // N_WORKERS each so the machine is not oversubscribed.
+N_WORKERS = min(4, os.cpu_count() or 1)
+# the only models whose n_jobs does anything (LogisticRegression's is deprecated since sklearn 1.8)
+THREADED_MODELS = (RandomForestClassifier, ExtraTreesClassifier)
 
-    # citizenship -> is_international
-    if "citizenship" in df.columns:
-        df["is_international"] = (
-            df["citizenship"].astype(str).str.strip().str.lower().eq("international")
-        ).astype(int)
 
-    # join key normalization
-    if "institution_clean" in df.columns:
-        df["institution_clean"] = df["institution_clean"].astype(str).str.strip().str.lower()
+def load_and_prepare(path: str) -> pd.DataFrame:
+    # y, log_rank, is_international and the categoricals come from the shared feature store
+    df = load_features(path)
 
     # minimal required
-    df = df.dropna(subset=["y", "institution_clean"]).copy()
-    df["y"] = df["y"].astype(int)
-
-    return df
+    return df.dropna(subset=["institution_clean"]).reset_index(drop=True)
 
 
-def build_preprocessor(df: pd.DataFrame):
+def build_preprocessor(df: pd.DataFrame, encoding: str = DEFAULT_ENCODING):
     num_features = []
     for col in ["gpa_raw", "gre_total", "log_rank", "is_international"]:
         if col in df.columns:
@@ -87,20 +85,64 @@ def build_preprocessor(df: pd.DataFrame):
         ("sc", StandardScaler())
     ])
 
+    if encoding == "native":
+        encoder = ("ord", OrdinalEncoder(
+            handle_unknown="use_encoded_value", unknown_value=-1,  # HGB treats <0 as missing
+            max_categories=MAX_NATIVE_CATEGORIES
+        ))
+    elif encoding in ("dense", "sparse"):
+        encoder = ("oh", OneHotEncoder(handle_unknown="ignore", sparse_output=(encoding == "sparse")))
+    else:
+        raise ValueError(f"Unknown encoding: {encoding!r}")
+
     categorical = Pipeline([
         ("imp", SimpleImputer(strategy="most_frequent")),
-        ("oh", OneHotEncoder(handle_unknown="ignore", sparse_output=False))
-
+        encoder
     ])
 
     pre = ColumnTransformer([
         ("num", numeric, num_features),
         ("cat", categorical, cat_features)
-    ])
+    ], sparse_threshold=1.0 if encoding == "sparse" else 0.0)
 
     return pre, num_features, cat_features
 
 
+def configure_for_encoding(clf, encoding: str, num_features, cat_features):
+    if encoding == "native":
+        # categorical columns come right after the numeric block in the transformed output
+        n_num = len(num_features)
+        clf.set_params(categorical_features=list(range(n_num, n_num + len(cat_features))))
+    return clf
+
+
+def share_matrix(X, folder: Path, name: str) -> dict:
+    """
+    Writes a transformed matrix once as raw .npy files; workers memory-map it
+    instead of receiving a pickled copy.
+    """
+    if sp.issparse(X):
+        X = X.tocsr()
+        parts = {"data": X.data, "indices": X.indices, "indptr": X.indptr}
+        spec = {"kind": "csr", "shape": X.shape}
+    else:
+        parts = {"dense": np.ascontiguousarray(X)}
+        spec = {"kind": "dense"}
+
+    for key, arr in parts.items():
+        path = folder / f"{name}_{key}.npy"
+        np.save(path, arr)
+        spec[key] = str(path)
+    return spec
+
+
+def load_shared(spec: dict):
+    if spec["kind"] == "csr":
+        arrays = [np.load(spec[k], mmap_mode="r") for k in ("data", "indices", "indptr")]
+        return sp.csr_matrix(tuple(arrays), shape=spec["shape"], copy=False)
+    return np.load(spec["dense"], mmap_mode="r")
+
+
 def get_score_vector(model: Pipeline, X):
     """
     Returns a continuous score for ROC-AUC / PR-AUC.
@@ -150,28 +192,14 @@ def save_text(path: Path, text: str):
     path.write_text(text, encoding="utf-8")
 
 
-def main():
-    df = load_and_prepare(DATA_PATH)
-    pre, num_features, cat_features = build_preprocessor(df)
-
-    feature_cols = num_features + cat_features
-    X = df[feature_cols].copy()
-    y = df["y"].copy()
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=TEST_SIZE, stratify=y, random_state=RANDOM_STATE
-    )
-
-    results = []
-
-    # =========================
-    # MODELS
-    # =========================
+def build_models():
+    """(name, estimator, categorical encoding) for every model in the zoo."""
     models = []
 
     # 1) Logistic Regression
     models.append(("LogisticRegression",
-                   LogisticRegression(max_iter=5000, class_weight="balanced")))
+                   LogisticRegression(max_iter=5000, class_weight="balanced"),
+                   "sparse"))
 
     # 2) Calibrated Logistic Regression (better probability quality)
     #    CalibratedClassifierCV expects base_estimator that supports decision_function or predict_proba.
@@ -179,7 +207,8 @@ def main():
                    CalibratedClassifierCV(
                        estimator=LogisticRegression(max_iter=5000, class_weight="balanced"),
                        method="sigmoid", cv=5
-                   )))
+                   ),
+                   "sparse"))
 
     # 3) Random Forest
     models.append(("RandomForest",
@@ -188,7 +217,8 @@ def main():
                        random_state=RANDOM_STATE,
                        class_weight="balanced_subsample",
                        n_jobs=-1
-                   )))
+                   ),
+                   "sparse"))
 
     # 4) Extra Trees (often stronger than RF)
     models.append(("ExtraTrees",
@@ -197,63 +227,175 @@ def main():
                        random_state=RANDOM_STATE,
                        class_weight="balanced",
                        n_jobs=-1
-                   )))
+                   ),
+                   "sparse"))
 
     # 5) Gradient Boosting
     models.append(("GradientBoosting",
-                   GradientBoostingClassifier(random_state=RANDOM_STATE)))
+                   GradientBoostingClassifier(random_state=RANDOM_STATE),
+                   "sparse"))
 
-    # 6) HistGradientBoosting (strong tabular baseline)
+    # 6) HistGradientBoosting (strong tabular baseline, no sparse input -> native categoricals)
     models.append(("HistGradientBoosting",
                    HistGradientBoostingClassifier(
                        max_depth=6,
                        learning_rate=0.08,
                        max_iter=500,
                        random_state=RANDOM_STATE
-                   )))
+                   ),
+                   "native"))
 
     # 7) Linear SVM + calibration (probabilities)
     models.append(("CalibratedLinearSVM",
                    CalibratedClassifierCV(
                        estimator=LinearSVC(class_weight="balanced", random_state=RANDOM_STATE),
                        method="sigmoid", cv=5
-                   )))
+                   ),
+                   "sparse"))
+
+    return models
+
+
+def fit_and_evaluate(name, clf, train_spec, test_spec, y_train, y_test, inner_jobs=1):
+    """Runs in a worker: memory-maps the shared matrices, fits, evaluates."""
+    if isinstance(clf, THREADED_MODELS):
+        clf.set_params(n_jobs=inner_jobs)
 
-    # =========================
-    # TRAIN + EVAL
-    # =========================
-    for name, clf in models:
-        pipe = Pipeline([
-            ("preprocess", pre),
-            ("clf", clf)
-        ])
+    t0 = time.perf_counter()
+    with threadpool_limits(limits=inner_jobs):
+        X_train = load_shared(train_spec)
+        X_test = load_shared(test_spec)
+        clf.fit(X_train, y_train)
+        met, rep, cm = evaluate(clf, X_test, y_test)
 
-        pipe.fit(X_train, y_train)
+    met["model"] = name
+    met["n_test"] = int(len(y_test))
+    met["fit_seconds"] = time.perf_counter() - t0
+    return met, rep, cm
 
-        met, rep, cm = evaluate(pipe, X_test, y_test)
-        met["model"] = name
-        met["n_test"] = int(len(y_test))
 
+def train_models(models, shared, y_train, y_test, n_workers, inner_jobs, report=True):
+    """
+    Fits and evaluates every model: one at a time in this process when
+    n_workers == 1 (the sequential baseline), else in a process pool.
+    Returns (per-model metrics, reports by name, wall seconds).
+    """
+    t0 = time.perf_counter()
+    results, reports = [], {}
+
+    def done(met, rep, cm):
         results.append(met)
+        reports[met["model"]] = (rep, cm)
+        if report:
+            print(f"[OK] {met['model']} done in {met['fit_seconds']:.1f}s | Acc={met['accuracy']:.4f} "
+                  f"| F1={met['f1']:.4f} | ROC-AUC={met['roc_auc']:.4f}")
+
+    if n_workers == 1:
+        for name, clf, encoding in models:
+            done(*fit_and_evaluate(name, clone(clf), *shared[encoding], y_train, y_test, inner_jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(fit_and_evaluate, name, clf, *shared[encoding], y_train, y_test, inner_jobs)
+                       for name, clf, encoding in models]
+            for fut in as_completed(futures):
+                done(*fut.result())
+    return results, reports, time.perf_counter() - t0
+
+
+def main(n_workers=N_WORKERS, baseline=False):
+    t_start = time.perf_counter()
+
+    df = load_and_prepare(DATA_PATH)
+    _, num_features, cat_features = build_preprocessor(df)
+
+    feature_cols = num_features + cat_features
+    X = df[feature_cols].copy()
+    y = df["y"].copy()
 
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, stratify=y, random_state=RANDOM_STATE
+    )
+    y_train = y_train.to_numpy()
+    y_test = y_test.to_numpy()
+
+    models = build_models()
+    # largest ensembles first so they don't end up starting last
+    models.sort(key=lambda m: -m[1].get_params().get("n_estimators", 0))
+    models = [(name, configure_for_encoding(clf, enc, num_features, cat_features), enc)
+              for name, clf, enc in models]
+
+    n_workers = max(1, min(int(n_workers), len(models)))
+    inner_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+
+    with tempfile.TemporaryDirectory(prefix="ml_shared_") as tmp:
+        tmp = Path(tmp)
+
+        # =========================
+        # PREPROCESS (once per encoding, not once per model)
+        # =========================
+        shared = {}
+        for encoding in sorted({enc for _, _, enc in models}):
+            pre, _, _ = build_preprocessor(df, encoding)
+            shared[encoding] = (
+                share_matrix(pre.fit_transform(X_train), tmp, f"{encoding}_train"),
+                share_matrix(pre.transform(X_test), tmp, f"{encoding}_test"),
+            )
+
+        # =========================
+        # TRAIN + EVAL
+        # =========================
+        seq_wall = None
+        if baseline:
+            print(f"[INFO] Sequential baseline: {len(models)} models one at a time x {os.cpu_count() or 1} inner threads")
+            seq_results, _, seq_wall = train_models(models, shared, y_train, y_test, 1, os.cpu_count() or 1, False)
+            print(f"[OK] Sequential baseline: {seq_wall:.1f}s")
+
+        print(f"[INFO] {len(models)} models | {n_workers} workers x {inner_jobs} inner threads")
+        results, reports, train_wall = train_models(models, shared, y_train, y_test, n_workers, inner_jobs)
+
+    for name, (rep, cm) in reports.items():
         save_text(OUT_DIR / f"{name}_classification_report.txt", rep)
         save_text(OUT_DIR / f"{name}_confusion_matrix.txt", str(cm))
 
-        print(f"[OK] {name} done | Acc={met['accuracy']:.4f} | F1={met['f1']:.4f} | ROC-AUC={met['roc_auc']:.4f}")
+    wall = time.perf_counter() - t_start
+    busy = sum(m["fit_seconds"] for m in results)
 
     res_df = pd.DataFrame(results).sort_values(["roc_auc", "f1", "accuracy"], ascending=False)
+    if baseline:
+        seq_fit = {m["model"]: m["fit_seconds"] for m in seq_results}
+        res_df["sequential_fit_seconds"] = res_df["model"].map(seq_fit)
 
     res_df.to_csv(OUT_DIR / "model_metrics.csv", index=False)
 
     # also save a quick human-readable summary
-    save_text(OUT_DIR / "SUMMARY.txt", res_df.to_string(index=False))
+    timing = (
+        f"\n\nTotal wall time: {wall:.1f}s with {n_workers} workers x {inner_jobs} inner threads"
+        f"\nTrain + eval wall time: {train_wall:.1f}s (sum of per-model fit+eval times in it: {busy:.1f}s)"
+    )
+    if baseline:
+        timing += (
+            f"\nSequential baseline (one model at a time, {os.cpu_count() or 1} inner threads): {seq_wall:.1f}s"
+            f"\nSpeedup (sequential wall / parallel wall): {seq_wall / train_wall:.2f}x"
+        )
+    else:
+        timing += "\nSpeedup: run python ml.py --baseline to time the sequential pass as well"
+    save_text(OUT_DIR / "SUMMARY.txt", res_df.to_string(index=False) + timing + "\n")
 
     print("\n=== FINAL RANKING (sorted by ROC-AUC, then F1, then Accuracy) ===")
     print(res_df.to_string(index=False))
+    print(timing.strip())
 
     print("\nSaved outputs to:", OUT_DIR.resolve())
     print("Features used:", feature_cols)
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Train and compare the model zoo.")
+    ap.add_argument("--workers", type=int, default=N_WORKERS,
+                    help="process pool size (1 = one model at a time, the serial baseline)")
+    ap.add_argument("--baseline", action="store_true",
+                    help="also time a sequential pass first and report speedup = sequential wall / parallel wall")
+    args = ap.parse_args()
+    main(args.workers, args.baseline)
@@ -0,0 +1,326 @@
+"""
+Live model for the scoring path (serve.py, app_local.py), swapped without a restart.
+
+A background thread polls saved_model_hgb/CURRENT (model_versions.py). When
+it names another version, that version is loaded off the request path (model,
+model_info.json, uni_table.csv and its TopKScorer with the university block
+already encoded) and smoke-tested. Only then does one reference assignment make
+it live: requests never wait for a load, and a request that already holds the
+old model finishes on it.
+
+The replaced version stays loaded, so rolling back is instant: rollback(), or
+pointing CURRENT at it (python model_versions.py --use v3). A version that
+fails to load or fails the smoke test is reported and skipped; the live model
+is left alone.
+
+A version's probability cube (prob_cube.py) is mapped with it, as
+LoadedModel.cube, if it matches the model; one built later for a loaded
+version (python prob_cube.py) is picked up by the same poll.
+
+stats() reports load time, retained memory and memory-mapped file size of
+every version loaded so far (serve.py: GET /models).
+
+    python model_registry.py                 # load the live version, print its stats
+    python model_registry.py --watch 60      # follow CURRENT for 60 s
+"""
+import argparse
+import gc
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import BuiltinFunctionType, FunctionType, ModuleType
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from flat_predictor import FlatHGBPredictor
+from model_versions import CURRENT_NAME, FLAT_NAME, MMAP_NAME, MODEL_ROOT, current_version, resolve_model_dir, set_current
+from prob_cube import CUBE_DIR, ProbCube, cube_matches
+from topk_scoring import TopKScorer
+
+# =========================
+# CONFIG
+# =========================
+POLL_SECONDS = 1.0
+# artifact preference; sklearn is only imported for the "sklearn" backend
+BACKENDS = {"mmap": MMAP_NAME, "flat": FLAT_NAME, "sklearn": "best_model_hgb.joblib"}
+BACKEND = None       # None: the first of BACKENDS the version has
+SMOKE_APPLICANT = {
+    "gpa_raw": 3.5,
+    "gre_total": 165.0,
+    "is_international": 1,
+    "program": "Computer Science Masters",
+    "term": "F24",
+}
+SMOKE_TOL = 1e-9     # single-row prediction vs the Top-K path for the same university
+
+
+@dataclass
+class LoadedModel:
+    version: str
+    model_dir: Path
+    pipe: object          # sklearn Pipeline or FlatHGBPredictor
+    backend: str
+    info: dict
+    features: list
+    uni_table: pd.DataFrame
+    scorer: TopKScorer
+    load_s: float = 0.0
+    memory_mb: float = 0.0
+    mapped_mb: float = 0.0
+    loaded_at: float = 0.0
+    cube: Optional[ProbCube] = None
+    cube_stamp: Optional[int] = None   # mtime of the cube's meta.json when it was (re)opened
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "backend": self.backend,
+            "load_s": round(self.load_s, 4),
+            "memory_mb": round(self.memory_mb, 2),
+            "mapped_mb": round(self.mapped_mb, 2),
+            "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.loaded_at)),
+            "rows_used": self.info.get("n_rows_used"),
+            "n_universities": int(len(self.scorer.institutions)),
+            "cube": "x".join(map(str, self.cube.cube.shape)) + f" {self.cube.cube.dtype}" if self.cube is not None else None,
+        }
+
+
+def retained_bytes(*roots) -> int:
+    """
+    Approximate memory held by `roots`: sys.getsizeof over their object graph,
+    each object counted once; an ndarray counts the buffer it views (once for
+    all its views), except memory-mapped files, which live in the shared page
+    cache. Functions, classes and modules are shared by every version and are
+    not followed.
+    """
+    seen = set()
+    stack = list(roots)
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType, BuiltinFunctionType)):
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, np.ndarray):
+            root = obj
+            while isinstance(root.base, np.ndarray):
+                root = root.base
+            if (root is obj or id(root) not in seen) and not isinstance(root, np.memmap):
+                seen.add(id(root))
+                total += root.nbytes
+            if obj.dtype.hasobject:
+                stack.extend(obj.ravel().tolist())
+            continue
+        if isinstance(obj, pd.DataFrame):
+            total += int(obj.memory_usage(deep=True).sum())
+            continue
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
+
+
+def smoke_test(model: LoadedModel):
+    """One Top-K pass and one single-row prediction; raises unless both give the same valid probability."""
+    probs = model.scorer.score_all(SMOKE_APPLICANT)
+    if not len(probs) or not np.all(np.isfinite(probs)) or probs.min() < 0 or probs.max() > 1:
+        raise ValueError(f"{model.version}: Top-K smoke prediction is not a probability vector")
+
+    row = dict(SMOKE_APPLICANT)
+    row["institution_clean"] = model.scorer.institutions[0]
+    first = model.uni_table.iloc[0]
+    for c in model.features:
+        if c not in row:
+            row[c] = first[c] if c in first.index else np.nan
+    p = float(model.pipe.predict_proba(pd.DataFrame([row])[model.features])[0, 1])
+    if not abs(p - probs[0]) <= SMOKE_TOL:
+        raise ValueError(f"{model.version}: single-row prediction {p:.6f} != Top-K path {probs[0]:.6f}")
+
+
+def attach_cube(model: LoadedModel) -> bool:
+    """
+    (Re)opens the version's probability cube if it changed since the last look.
+    A cube that does not match the model is left out with a warning; queries
+    then go to the model. True if model.cube changed.
+    """
+    meta = model.model_dir / CUBE_DIR / "meta.json"
+    stamp = meta.stat().st_mtime_ns if meta.exists() else None
+    if stamp == model.cube_stamp:
+        return False
+    cube = None
+    if stamp is not None:
+        try:
+            cube = ProbCube.open(model.model_dir)
+            why = cube_matches(cube, model)
+        except Exception as e:
+            why = f"{type(e).__name__}: {e}"
+        if why:
+            print(f"[WARN] {model.version}/{CUBE_DIR} not used: {why}")
+            cube = None
+    model.cube, model.cube_stamp = cube, stamp
+    return True
+
+
+def available_backends(model_dir) -> list:
+    return [b for b, name in BACKENDS.items() if (Path(model_dir) / name).exists()]
+
+
+def load_version(model_dir, backend: Optional[str] = BACKEND) -> LoadedModel:
+    model_dir = Path(model_dir)
+    mmap_dir = model_dir / MMAP_NAME
+    if backend is None:
+        found = available_backends(model_dir)
+        if not found:
+            raise FileNotFoundError(f"No model artifact in {model_dir} (expected one of {list(BACKENDS.values())})")
+        backend = found[0]
+    elif backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r} (expected one of {list(BACKENDS)})")
+
+    t0 = time.perf_counter()
+    if backend == "mmap":
+        # arrays and the encoded university block are mapped, nothing is parsed or re-encoded
+        pipe = FlatHGBPredictor.load_mmap(mmap_dir / "model")
+        scorer = TopKScorer.load(pipe, mmap_dir / "uni")
+        uni_table = scorer.uni_table
+    else:
+        if backend == "flat":
+            pipe = FlatHGBPredictor.load(model_dir / FLAT_NAME)
+        else:
+            import joblib
+            pipe = joblib.load(model_dir / "best_model_hgb.joblib")
+        uni_table = pd.read_csv(model_dir / "uni_table.csv")
+        scorer = TopKScorer(pipe, uni_table)
+    info = json.loads((model_dir / "model_info.json").read_text(encoding="utf-8"))
+
+    model = LoadedModel(
+        version=model_dir.name,
+        model_dir=model_dir,
+        pipe=pipe,
+        backend=backend,
+        info=info,
+        features=list(info["features"]),
+        uni_table=uni_table,
+        scorer=scorer,
+    )
+    smoke_test(model)
+    attach_cube(model)
+    model.load_s = time.perf_counter() - t0
+    model.memory_mb = retained_bytes(pipe, model.scorer, uni_table) / 1024 ** 2
+    if backend == "mmap":
+        model.mapped_mb = sum(f.stat().st_size for f in mmap_dir.rglob("*.npy")) / 1024 ** 2
+    if model.cube is not None:
+        model.mapped_mb += model.cube.mapped_mb
+    model.loaded_at = time.time()
+    return model
+
+
+class ModelRegistry:
+    """The live model plus the previous one; start() follows saved_model_hgb/CURRENT in the background."""
+
+    def __init__(self, root=MODEL_ROOT, poll_seconds: float = POLL_SECONDS, backend: Optional[str] = BACKEND):
+        self.root = Path(root)
+        self.poll_seconds = poll_seconds
+        self.backend = backend
+        self._lock = threading.Lock()   # one load / swap at a time; readers never take it
+        self._live = load_version(resolve_model_dir(self.root), backend)
+        self._previous: Optional[LoadedModel] = None
+        self.loaded = {self._live.version: self._live.stats()}
+        self.errors = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self) -> LoadedModel:
+        """The live model. Keep the returned object for the whole request."""
+        return self._live
+
+    def check(self) -> bool:
+        """Loads and swaps in the version CURRENT names, if it changed. True if the live model changed."""
+        with self._lock:
+            target = resolve_model_dir(self.root)
+            name = target.name
+            if name == self._live.version:
+                # a cube built for the live version after it was loaded
+                if attach_cube(self._live):
+                    self.loaded[name] = self._live.stats()
+                    print(f"[OK] Probability cube of {name}: {self.loaded[name]['cube'] or 'removed'}")
+                return False
+            if name in self.errors:
+                return False
+
+            if self._previous is not None and self._previous.version == name:
+                candidate = self._previous
+                how = "was still loaded"
+            else:
+                try:
+                    candidate = load_version(target, self.backend)
+                except Exception as e:
+                    self.errors[name] = f"{type(e).__name__}: {e}"
+                    print(f"[WARN] Model {name} rejected, {self._live.version} stays live: {self.errors[name]}")
+                    return False
+                self.loaded[name] = candidate.stats()
+                how = f"loaded in {candidate.load_s * 1000:.0f} ms, {candidate.memory_mb:.1f} MB"
+
+            self._previous, self._live = self._live, candidate
+        print(f"[OK] Live model: {self._previous.version} -> {candidate.version} ({how})")
+        return True
+
+    def rollback(self) -> str:
+        """Makes the previous version live again (CURRENT is pointed back at it too)."""
+        with self._lock:
+            if self._previous is None:
+                raise RuntimeError("No previous model version is loaded")
+            if current_version(self.root) is not None:
+                set_current(self._previous.version, self.root)
+            self._previous, self._live = self._live, self._previous
+        print(f"[OK] Rolled back: {self._previous.version} -> {self._live.version}")
+        return self._live.version
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check()
+            except Exception as e:  # the watcher must outlive a bad poll (e.g. a version pruned mid-load)
+                print(f"[WARN] Model watcher: {type(e).__name__}: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> list:
+        """Load time / memory of every version loaded so far, with its state."""
+        live, prev = self._live.version, self._previous.version if self._previous else None
+        out = []
+        for name, s in self.loaded.items():
+            state = "live" if name == live else "previous" if name == prev else "unloaded"
+            out.append({**s, "state": state})
+        for name, err in self.errors.items():
+            out.append({"version": name, "state": "rejected", "error": err})
+        return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=f"Load the live model of --root (its {CURRENT_NAME} version).")
+    ap.add_argument("--root", default=str(MODEL_ROOT))
+    ap.add_argument("--watch", type=float, default=0, metavar="SECONDS", help="follow CURRENT this long")
+    ap.add_argument("--backend", default=BACKEND, choices=list(BACKENDS))
+    args = ap.parse_args()
+
+    registry = ModelRegistry(args.root, backend=args.backend)
+    print(f"[OK] Live model: {registry.current().version} ({registry.current().backend})")
+    if args.watch:
+        registry.start()
+        time.sleep(args.watch)
+        registry.stop()
+    print(pd.DataFrame(registry.stats()).to_string(index=False))
@@ -0,0 +1,123 @@
+"""
+Versioned layout of saved_model_hgb/:
+
+    saved_model_hgb/
+        CURRENT            name of the live version ("v3")
+        v1/ v2/ v3/        one complete artifact set each (joblib, flat .npz,
+                           uni_table.csv, model_info.json)
+        model_info.json    search results (hgb_params) read by 'train'
+
+A new version is written into a staging directory, renamed to v{n} and only
+then made live by rewriting CURRENT (temp file + os.replace), so a reader
+never sees a half-written model. The last KEEP_VERSIONS versions are kept for
+rollback. Without a CURRENT file (models saved before versioning) the root
+directory itself is the model.
+
+    python model_versions.py               # list versions
+    python model_versions.py --use v2      # roll back / forward
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Optional
+
+# =========================
+# CONFIG
+# =========================
+MODEL_ROOT = Path("saved_model_hgb")
+CURRENT_NAME = "CURRENT"
+# artifact names inside a version directory (written by hgb_export.py)
+FLAT_NAME = "best_model_hgb_flat.npz"
+MMAP_NAME = "best_model_hgb_mmap"   # fast-start copy: model/*.npy + uni/*.npy, loaded with mmap_mode="r"
+KEEP_VERSIONS = 5
+VERSION_DIR = re.compile(r"^v(\d+)$")
+
+
+def list_versions(root=MODEL_ROOT) -> list:
+    """Version directory names, oldest first."""
+    root = Path(root)
+    if not root.is_dir():
+        return []
+    found = [(int(m.group(1)), p.name) for p in root.iterdir()
+             if p.is_dir() and (m := VERSION_DIR.match(p.name))]
+    return [name for _, name in sorted(found)]
+
+
+def current_version(root=MODEL_ROOT) -> Optional[str]:
+    path = Path(root) / CURRENT_NAME
+    if not path.exists():
+        return None
+    name = path.read_text(encoding="utf-8").strip()
+    return name if (Path(root) / name).is_dir() else None
+
+
+def resolve_model_dir(root=MODEL_ROOT) -> Path:
+    """Directory of the live model: the CURRENT version, else `root` (pre-versioning layout)."""
+    name = current_version(root)
+    return Path(root) / name if name else Path(root)
+
+
+def new_staging_dir(root=MODEL_ROOT) -> Path:
+    staging = Path(root) / f".staging-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    return staging
+
+
+def set_current(name: str, root=MODEL_ROOT):
+    root = Path(root)
+    if not (root / name).is_dir():
+        raise FileNotFoundError(f"No model version {root / name}")
+    tmp = root / f".{CURRENT_NAME}.tmp"
+    tmp.write_text(name + "\n", encoding="utf-8")
+    os.replace(tmp, root / CURRENT_NAME)
+
+
+def publish(staging, root=MODEL_ROOT, keep: int = KEEP_VERSIONS) -> Path:
+    """Turns a finished staging directory into the next version and makes it live."""
+    root = Path(root)
+    versions = list_versions(root)
+    n = int(versions[-1][1:]) + 1 if versions else 1
+    target = root / f"v{n}"
+    os.replace(staging, target)
+    set_current(target.name, root)
+    prune(root, keep)
+    return target
+
+
+def prune(root=MODEL_ROOT, keep: int = KEEP_VERSIONS):
+    """Deletes the oldest versions beyond `keep` (never the live one)."""
+    live = current_version(root)
+    old = [v for v in list_versions(root) if v != live]
+    for name in old[:max(len(old) - (keep - 1), 0)]:
+        shutil.rmtree(Path(root) / name, ignore_errors=True)
+
+
+def describe(root=MODEL_ROOT):
+    live = current_version(root)
+    versions = list_versions(root)
+    if not versions:
+        print(f"[INFO] No versions under {root} (model dir: {resolve_model_dir(root)})")
+        return
+    for name in versions:
+        info_path = Path(root) / name / "model_info.json"
+        info = json.loads(info_path.read_text(encoding="utf-8")) if info_path.exists() else {}
+        lineage = info.get("lineage", {})
+        mark = "*" if name == live else " "
+        print(f"{mark} {name}: {lineage.get('mode', '?'):<8} rows={info.get('n_rows_used', '?'):<6} "
+              f"parent={lineage.get('parent') or '-':<4} {lineage.get('created', '')}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="List / switch the versions under saved_model_hgb.")
+    ap.add_argument("--root", default=str(MODEL_ROOT))
+    ap.add_argument("--use", default=None, metavar="VERSION", help="make VERSION (e.g. v2) the live model")
+    args = ap.parse_args()
+
+    if args.use:
+        set_current(args.use, args.root)
+        print(f"[OK] {args.root}/{CURRENT_NAME} -> {args.use}")
+    describe(args.root)
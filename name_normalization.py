@@ -0,0 +1,150 @@
+"""
+University name normalization shared by QS_Cleaning.py, GradCafe_uni_name_normalization.py
+and sync_gradcafe.py (one definition instead of a copy per script).
+
+normalize_column() normalizes each distinct value once (factorize -> normalize
+the uniques -> broadcast back by code), so the cost follows the number of
+distinct names, not rows. Results are kept in a JSON cache under cache/ that
+survives runs; NameNormalizer counts cache hits / misses.
+
+    python name_normalization.py --bench     # per-row apply vs factorized + cached
+"""
+import argparse
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# =========================
+# CONFIG
+# =========================
+CACHE_PATH = Path("cache/normalized_names.json")
+NORMALIZE_VERSION = "1"   # bump when normalize_name changes (invalidates the cache)
+
+BENCH_DATA = Path("GradCafe/EDA: Gradcafe/gradcafe_eda.csv")
+BENCH_SCALE = 200
+
+PUNCT = re.compile(r"[^a-z0-9\s]")
+SPACES = re.compile(r"\s+")
+
+
+def normalize_name(name) -> str:
+    """
+    Remove punctuation, lowercase, strip spaces:
+    "University of Michigan-Ann Arbor" -> "university of michiganann arbor"
+    """
+    name = str(name).lower()
+    name = PUNCT.sub("", name)     # remove punctuation
+    name = SPACES.sub(" ", name)   # remove multiple spaces
+    return name.strip()
+
+
+class NameNormalizer:
+    """normalize_name with a persistent raw -> normalized cache and hit / miss counters."""
+
+    def __init__(self, cache_path=CACHE_PATH):
+        self.path = Path(cache_path) if cache_path else None
+        self.names = {}
+        if self.path is not None and self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == NORMALIZE_VERSION:
+                self.names = data.get("names", {})
+        self.hits = self.misses = self.rows = 0
+        self._dirty = False
+
+    def normalize_uniques(self, values) -> list:
+        out = []
+        for v in values:
+            key = str(v)
+            hit = self.names.get(key)
+            if hit is None:
+                hit = self.names[key] = normalize_name(key)
+                self.misses += 1
+                self._dirty = True
+            else:
+                self.hits += 1
+            out.append(hit)
+        return out
+
+    def normalize_column(self, values) -> pd.Series:
+        s = pd.Series(values)
+        codes, uniques = pd.factorize(s, use_na_sentinel=False)  # NaN -> "nan", as str(NaN) did
+        normalized = np.array(self.normalize_uniques(uniques), dtype=object)
+        self.rows += len(s)
+        self.save()
+        return pd.Series(normalized[codes], index=s.index, name=s.name)
+
+    def save(self):
+        if self.path is None or not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": NORMALIZE_VERSION, "names": self.names}, ensure_ascii=False),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "rows": self.rows,
+            "distinct": lookups,
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def report(self, label: str = "normalize_name"):
+        st = self.stats()
+        print(f"[INFO] {label}: {st['rows']} rows -> {st['distinct']} distinct names | "
+              f"cache hits {st['cache_hits']}, misses {st['cache_misses']} ({st['hit_rate']:.1%} hit rate)")
+
+
+def normalize_column(values, cache_path=CACHE_PATH) -> pd.Series:
+    """One-shot helper: normalized copy of a column through a NameNormalizer."""
+    norm = NameNormalizer(cache_path)
+    out = norm.normalize_column(values)
+    norm.report()
+    return out
+
+
+def bench(data_path=BENCH_DATA, scale=BENCH_SCALE):
+    names = pd.read_csv(data_path, usecols=["university"])["university"]
+    names = pd.concat([names] * scale, ignore_index=True)
+
+    t0 = time.perf_counter()
+    old = names.apply(normalize_name)
+    t_apply = time.perf_counter() - t0
+
+    runs = {}
+    with_cache = Path("/tmp") / f"bench_normalized_names_{os.getpid()}.json"
+    for label, path in (("factorized, cold cache", with_cache), ("factorized, warm cache", with_cache)):
+        norm = NameNormalizer(path)
+        t0 = time.perf_counter()
+        new = norm.normalize_column(names)
+        runs[label] = (time.perf_counter() - t0, norm.stats())
+        if not new.equals(old):
+            raise AssertionError(f"{label}: output differs from Series.apply(normalize_name)")
+    with_cache.unlink(missing_ok=True)
+
+    print(f"[OK] {len(names)} rows, {names.nunique(dropna=False)} distinct | "
+          f"apply: {t_apply * 1000:.0f} ms")
+    for label, (seconds, st) in runs.items():
+        print(f"[OK] {label}: {seconds * 1000:.0f} ms ({t_apply / seconds:.0f}x) | "
+              f"hit rate {st['hit_rate']:.1%} | identical output")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Shared university name normalization.")
+    ap.add_argument("--bench", action="store_true",
+                    help=f"compare Series.apply with the factorized + cached path on {BENCH_DATA} x{BENCH_SCALE}")
+    args = ap.parse_args()
+
+    if args.bench:
+        bench()
+    else:
+        ap.print_help()
@@ -0,0 +1,470 @@
+"""
+End-to-end pipeline runner: every stage script as one node of a DAG with
+explicit input / output files.
+
+    raw batches -> merge_batches -> clean_gradcafe (+ *_sync.csv) -> merge_clean -> filter_gradcafe -> normalize_gradcafe --+
+    2025_QS_raw.csv -> clean_qs -> slim_qs ------------------------------------------------------------------+-> merge_qs
+    2025_QS_raw.csv -> qs_store -----------------------------------------------------------------------------+      |
+                                                                     hypothesis1 / hypothesis2 / ml / train  <-----+
+
+Each stage runs in its own Python process (python pipeline.py --run-stage NAME,
+cwd = repo root, log in cache/pipeline/logs/NAME.log) and is skipped when its
+key is unchanged: a hash of the stage's input files, the code it runs (its
+script plus every repo module that script imports, transitively) and its
+parameters. So a one-line change in QS_Cleaning.py reruns clean_qs and what is
+downstream of a changed output; the GradCafe branch is skipped. Stages whose
+dependencies are done run concurrently (--jobs), e.g. the QS and GradCafe
+branches, or the hypotheses next to ml / train.
+
+Scraping (scrape_gradcafe.py, sync_gradcafe.py) is not a stage: it needs the
+network and keeps its own resumable store. The DAG starts at the saved batch
+files (scrape_gradcafe.py adds its pages as one more) and the raw rows
+sync_gradcafe.py appended (accepted_sync.csv / rejected_sync.csv, inputs of
+clean_gradcafe), so a rebuild keeps the synced entries.
+
+The hash of every output is recorded after its stage runs. A stage whose
+outputs were changed since by anything but the pipeline is not run, so the
+edit is not overwritten: --force STAGE overwrites it. sync_gradcafe.py records
+the outputs it appends to (record_outputs), since a rebuild reproduces its rows.
+
+    python pipeline.py                 # build everything that is out of date
+    python pipeline.py merge_qs        # only merge_qs and its upstream stages
+    python pipeline.py --status        # what would run, without running it
+    python pipeline.py --force clean_qs
+"""
+import argparse
+import ast
+import glob
+import hashlib
+import inspect
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+ROOT = Path(__file__).resolve().parent
+
+# =========================
+# CONFIG
+# =========================
+STATE_PATH = Path("cache/pipeline/state.json")
+LOG_DIR = Path("cache/pipeline/logs")
+JOBS = os.cpu_count() or 1
+
+GC_SCRAPE = "GradCafe/Data Collection: Web Scraping"
+GC_PRE = "GradCafe/Preprocessing: GradCafe"
+GC_EDA = "GradCafe/EDA: Gradcafe"
+QS_PRE = "QS World Ranking/Preprocessing: QS World Ranking"
+QS_EDA = "QS World Ranking/EDA: QS"
+
+# directories the scripts put on sys.path (for the import scan)
+MODULE_DIRS = [ROOT, ROOT / GC_SCRAPE, ROOT / GC_PRE, ROOT / QS_PRE, ROOT / "Hypothesis"]
+
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[[], None]           # executed in the stage's own process
+    scripts: list                     # files whose code (and repo imports) is part of the key
+    inputs: list                      # files or glob patterns
+    outputs: list
+    params: dict = field(default_factory=dict)
+    key_extra: Optional[Callable[[], object]] = None   # e.g. a config file read by the stage
+
+
+def _module(directory: str, name: str):
+    sys.path.insert(0, str(ROOT / directory))
+    return __import__(name)
+
+
+# =========================
+# stages
+# =========================
+def run_merge_batches():
+    _module(GC_SCRAPE, "merge_gradcafe").main()
+
+
+def run_clean_gradcafe():
+    _module(GC_SCRAPE, "clean_gradcafe").main()
+
+
+def run_merge_clean():
+    _module(GC_SCRAPE, "merge_gradcafe").main(clean=True)
+
+
+def run_filter_gradcafe():
+    _module(GC_PRE, "gradcafe_after_removing").remove_rows(
+        f"{GC_SCRAPE}/gradcafe_cs_ms_all.csv", f"{GC_PRE}/gradcafe_clean_final2.csv")
+
+
+def run_normalize_gradcafe():
+    _module(GC_PRE, "GradCafe_uni_name_normalization").normalize_gradcafe(
+        f"{GC_PRE}/gradcafe_clean_final2.csv", f"{GC_EDA}/gradcafe_eda.csv")
+
+
+def run_clean_qs():
+    _module(QS_PRE, "QS_Cleaning").clean_qs_data(f"{QS_PRE}/2025_QS_raw.csv", f"{QS_PRE}/qs_ranking_clean.csv")
+
+
+def run_slim_qs():
+    _module(QS_PRE, "QS_ranking_removing_columns").slim_qs(
+        f"{QS_PRE}/qs_ranking_clean.csv", f"{QS_EDA}/qs_ranking_eda.csv")
+
+
+def run_qs_store():
+    _module(".", "qs_store").build_store()
+
+
+def run_merge_qs():
+    _module(".", "merge_gradcafe_qs").merge_matched_only(
+        f"{GC_EDA}/gradcafe_eda.csv", f"{QS_EDA}/qs_ranking_eda.csv", "merged_matched_only.csv")
+
+
+def run_hypothesis1():
+    _module("Hypothesis", "hypothesis1").main()
+
+
+def run_hypothesis2():
+    _module("Hypothesis", "hypothesis2").main()
+
+
+def run_ml():
+    _module(".", "ml").main()
+
+
+def run_train():
+    # warm start on appended rows, full refit otherwise (train_best_model_hgb.refresh)
+    _module(".", "train_best_model_hgb").refresh("merged_matched_only.csv", "saved_model_hgb")
+
+
+def _hgb_params():
+    """A 'search' run changes the params train reads from model_info.json."""
+    path = ROOT / "saved_model_hgb" / "model_info.json"
+    return json.loads(path.read_text(encoding="utf-8")).get("hgb_params") if path.exists() else None
+
+
+STAGES = [
+    Stage("merge_batches", run_merge_batches, [f"{GC_SCRAPE}/merge_gradcafe.py"],
+          [f"{GC_SCRAPE}/accepted_batchs/accepted_batch_*.csv", f"{GC_SCRAPE}/rejected_batchs/rejected_batch_*.csv"],
+          [f"{GC_SCRAPE}/accepted_batchs/accepted_full.csv", f"{GC_SCRAPE}/rejected_batchs/rejected_full.csv"]),
+    Stage("clean_gradcafe", run_clean_gradcafe, [f"{GC_SCRAPE}/clean_gradcafe.py"],
+          [f"{GC_SCRAPE}/accepted_batchs/accepted_full.csv", f"{GC_SCRAPE}/rejected_batchs/rejected_full.csv",
+           f"{GC_SCRAPE}/accepted_batchs/accepted_sync.csv", f"{GC_SCRAPE}/rejected_batchs/rejected_sync.csv"],
+          [f"{GC_SCRAPE}/accepted_batchs/gradcafe_accepted_clean.csv",
+           f"{GC_SCRAPE}/rejected_batchs/gradcafe_rejected_clean.csv"]),
+    Stage("merge_clean", run_merge_clean, [f"{GC_SCRAPE}/merge_gradcafe.py"],
+          [f"{GC_SCRAPE}/accepted_batchs/gradcafe_accepted_clean.csv",
+           f"{GC_SCRAPE}/rejected_batchs/gradcafe_rejected_clean.csv"],
+          [f"{GC_SCRAPE}/gradcafe_cs_ms_all.csv"]),
+    Stage("filter_gradcafe", run_filter_gradcafe, [f"{GC_PRE}/gradcafe_after_removing.py"],
+          [f"{GC_SCRAPE}/gradcafe_cs_ms_all.csv"], [f"{GC_PRE}/gradcafe_clean_final2.csv"]),
+    Stage("normalize_gradcafe", run_normalize_gradcafe, [f"{GC_PRE}/GradCafe_uni_name_normalization.py"],
+          [f"{GC_PRE}/gradcafe_clean_final2.csv"], [f"{GC_EDA}/gradcafe_eda.csv"]),
+    Stage("clean_qs", run_clean_qs, [f"{QS_PRE}/QS_Cleaning.py"],
+          [f"{QS_PRE}/2025_QS_raw.csv"], [f"{QS_PRE}/qs_ranking_clean.csv"]),
+    Stage("slim_qs", run_slim_qs, [f"{QS_PRE}/QS_ranking_removing_columns.py"],
+          [f"{QS_PRE}/qs_ranking_clean.csv"], [f"{QS_EDA}/qs_ranking_eda.csv"]),
+    Stage("qs_store", run_qs_store, ["qs_store.py"],
+          [f"{QS_PRE}/2025_QS_raw.csv"], ["QS World Ranking/qs_store.csv"]),
+    Stage("merge_qs", run_merge_qs, ["merge_gradcafe_qs.py"],
+          [f"{GC_EDA}/gradcafe_eda.csv", f"{QS_EDA}/qs_ranking_eda.csv", "QS World Ranking/qs_store.csv"],
+          ["merged_matched_only.csv"]),
+    Stage("hypothesis1", run_hypothesis1, ["Hypothesis/hypothesis1.py"], ["merged_matched_only.csv"],
+          ["results_hyp1/tau_search.csv", "results_hyp1/tau_best.json", "results_hyp1/best_model_summary.txt"]),
+    Stage("hypothesis2", run_hypothesis2, ["Hypothesis/hypothesis2.py"], ["merged_matched_only.csv"],
+          ["results_hyp2/rank_binned_table.csv", "results_hyp2/rank_models_summary.txt"]),
+    Stage("ml", run_ml, ["ml.py"], ["merged_matched_only.csv"],
+          ["results_ml_full/model_metrics.csv", "results_ml_full/SUMMARY.txt"]),
+    Stage("train", run_train, ["train_best_model_hgb.py"], ["merged_matched_only.csv"],
+          ["saved_model_hgb/CURRENT"], key_extra=_hgb_params),
+]
+BY_NAME = {s.name: s for s in STAGES}
+
+
+# =========================
+# hashing
+# =========================
+class HashCache:
+    """sha1 of files, reused while (size, mtime) is unchanged."""
+
+    def __init__(self, entries: dict):
+        self.entries = entries
+
+    def file(self, path: Path) -> Optional[str]:
+        if not path.exists():
+            return None
+        st = path.stat()
+        key = str(path)
+        hit = self.entries.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.entries[key] = [st.st_size, st.st_mtime_ns, h.hexdigest()[:16]]
+        return self.entries[key][2]
+
+
+def local_imports(script: Path, seen=None) -> set:
+    """`script` plus every repo module it imports, transitively (by name, over MODULE_DIRS)."""
+    seen = set() if seen is None else seen
+    script = script.resolve()
+    if script in seen:
+        return seen
+    seen.add(script)
+    tree = ast.parse(script.read_text(encoding="utf-8"))
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(a.name.split(".")[0] for a in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split(".")[0])
+    for name in names:
+        for d in [script.parent] + MODULE_DIRS:
+            candidate = d / f"{name}.py"
+            if candidate.exists():
+                local_imports(candidate, seen)
+                break
+    return seen
+
+
+def expand(patterns: list) -> list:
+    out = []
+    for p in patterns:
+        matches = sorted(glob.glob(str(ROOT / p))) if glob.has_magic(p) else [str(ROOT / p)]
+        out.extend(Path(m) for m in matches)
+    return out
+
+
+def stage_key(stage: Stage, hashes: HashCache) -> dict:
+    code_files = sorted(set().union(*(local_imports(ROOT / s) for s in stage.scripts)))
+    spec = inspect.getsource(stage.run) + repr((stage.inputs, stage.outputs))
+    parts = {
+        "code": {str(p.relative_to(ROOT)): hashes.file(p) for p in code_files},
+        "spec": hashlib.sha1(spec.encode()).hexdigest()[:16],
+        "inputs": {str(p.relative_to(ROOT)): hashes.file(p) for p in expand(stage.inputs)},
+        "params": stage.params,
+        "extra": stage.key_extra() if stage.key_extra else None,
+    }
+    blob = json.dumps(parts, sort_keys=True, default=str).encode()
+    return {"key": hashlib.sha1(blob).hexdigest()[:16], **parts}
+
+
+# =========================
+# DAG
+# =========================
+def dependencies() -> dict:
+    producer = {}
+    for s in STAGES:
+        for out in s.outputs:
+            producer[out] = s.name
+    deps = {}
+    for s in STAGES:
+        deps[s.name] = {producer[i] for i in s.inputs if i in producer and producer[i] != s.name}
+    # cycle check (topological order)
+    order, done = [], set()
+    while len(order) < len(STAGES):
+        ready = [n for n in deps if n not in done and deps[n] <= done]
+        if not ready:
+            raise ValueError(f"Cycle between stages: {sorted(set(deps) - done)}")
+        order.extend(ready)
+        done.update(ready)
+    return deps
+
+
+def upstream(targets: list, deps: dict) -> set:
+    todo, keep = list(targets), set()
+    while todo:
+        name = todo.pop()
+        if name not in keep:
+            keep.add(name)
+            todo.extend(deps[name])
+    return keep
+
+
+def load_state(path=STATE_PATH) -> dict:
+    path = ROOT / path
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"stages": {}, "hashes": {}}
+
+
+def save_state(state: dict, path=STATE_PATH):
+    path = ROOT / path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def output_hashes(stage: Stage, hashes: HashCache) -> dict:
+    return {str(p.relative_to(ROOT)): hashes.file(p) for p in expand(stage.outputs)}
+
+
+def modified_outputs(stage: Stage, state: dict, hashes: HashCache) -> list:
+    """Outputs that exist but differ from what the stage's last run wrote (missing ones are just rebuilt)."""
+    recorded = state["stages"].get(stage.name, {}).get("outputs", {})
+    return [f for f, h in output_hashes(stage, hashes).items()
+            if h is not None and recorded.get(f, h) != h]
+
+
+def is_fresh(stage: Stage, key: dict, state: dict) -> bool:
+    prev = state["stages"].get(stage.name)
+    return (prev is not None and prev.get("key") == key["key"]
+            and all(p.exists() for p in expand(stage.outputs)))
+
+
+def explain(stage: Stage, key: dict, state: dict) -> str:
+    prev = state["stages"].get(stage.name)
+    if prev is None:
+        return "never run"
+    missing = [str(p.relative_to(ROOT)) for p in expand(stage.outputs) if not p.exists()]
+    if missing:
+        return f"missing output {missing[0]}"
+    for part in ("code", "inputs"):
+        changed = [f for f, h in key[part].items() if prev.get(part, {}).get(f) != h]
+        if changed:
+            return f"{part} changed: {changed[0]}" + (f" (+{len(changed) - 1})" if len(changed) > 1 else "")
+    return "stage definition changed" if prev.get("spec") != key["spec"] else "params changed"
+
+
+def file_hashes(paths: list, state_path=STATE_PATH) -> dict:
+    """Hash of each of `paths` (None if missing), keyed by resolved path: `before` for record_outputs."""
+    hashes = HashCache(load_state(state_path).setdefault("hashes", {}))
+    return {str(Path(p).resolve()): hashes.file(Path(p)) for p in paths}
+
+
+def record_outputs(before: dict, state_path=STATE_PATH) -> list:
+    """
+    For tools that append rows a rebuild reproduces (sync_gradcafe.py): the
+    stage outputs in `before` (file_hashes taken before the append) that were
+    still what their stage wrote get their current hash recorded, so the
+    append does not count as an outside change. Returns the recorded paths.
+    """
+    state = load_state(state_path)
+    hashes = HashCache(state.setdefault("hashes", {}))
+    recorded = []
+    for stage in STAGES:
+        prev = state["stages"].get(stage.name)
+        if prev is None:
+            continue
+        outputs = prev.setdefault("outputs", {})
+        for p in expand(stage.outputs):
+            rel = str(p.relative_to(ROOT))
+            old = before.get(str(p.resolve()), False)
+            if old is not False and old is not None and outputs.get(rel, old) == old:
+                outputs[rel] = hashes.file(p)
+                recorded.append(rel)
+    if recorded:
+        save_state(state, state_path)
+    return recorded
+
+
+def run_stage_process(stage: Stage) -> tuple:
+    log = ROOT / LOG_DIR / f"{stage.name}.log"
+    log.parent.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    with open(log, "w", encoding="utf-8") as f:
+        proc = subprocess.run([sys.executable, str(ROOT / "pipeline.py"), "--run-stage", stage.name],
+                              cwd=ROOT, stdout=f, stderr=subprocess.STDOUT)
+    return proc.returncode, time.perf_counter() - t0, log
+
+
+def run(targets=None, jobs=JOBS, force=(), status_only=False) -> dict:
+    deps = dependencies()
+    unknown = [t for t in list(targets or []) + list(force) if t not in BY_NAME]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {unknown}. Stages: {list(BY_NAME)}")
+    selected = upstream(targets, deps) if targets else set(BY_NAME)
+
+    state = load_state()
+    hashes = HashCache(state.setdefault("hashes", {}))
+    done, results = set(), {}
+    running = {}
+
+    def finish(name, result):
+        results[name] = result
+        done.add(name)
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:   # threads only wait on stage processes
+        while len(done) < len(selected):
+            ready = [n for n in (s.name for s in STAGES)
+                     if n in selected and n not in done and n not in running and deps[n] & selected <= done]
+            for name in ready:
+                if len(running) >= max(1, jobs):
+                    break
+                stage = BY_NAME[name]
+                blocked = [d for d in deps[name] & selected if results[d] in ("failed", "refused", "blocked")]
+                if blocked:
+                    print(f"[WARN] {name:<20} blocked ({blocked[0]} {results[blocked[0]]})")
+                    finish(name, "blocked")
+                    continue
+                stale = [d for d in deps[name] & selected if results[d] == "stale"]
+                if status_only and stale:
+                    print(f"[INFO] {name:<20} would run (after {stale[0]})")
+                    finish(name, "stale")
+                    continue
+                key = stage_key(stage, hashes)
+                modified = [] if name in force else modified_outputs(stage, state, hashes)
+                if modified:
+                    print(f"[WARN] {name:<20} not run: {modified[0]}"
+                          + (f" (+{len(modified) - 1})" if len(modified) > 1 else "")
+                          + f" changed outside the pipeline (--force {name} overwrites it)")
+                    finish(name, "refused")
+                    continue
+                if name not in force and is_fresh(stage, key, state):
+                    print(f"[OK]   {name:<20} up to date")
+                    finish(name, "skipped")
+                    continue
+                reason = "forced" if name in force else explain(stage, key, state)
+                if status_only:
+                    print(f"[INFO] {name:<20} would run ({reason})")
+                    finish(name, "stale")
+                    continue
+                print(f"[INFO] {name:<20} running ({reason})")
+                running[name] = (pool.submit(run_stage_process, stage), key)
+
+            if not running:
+                continue
+            finished, _ = wait([f for f, _ in running.values()], return_when=FIRST_COMPLETED)
+            for name in [n for n, (f, _) in running.items() if f in finished]:
+                future, key = running.pop(name)
+                code, seconds, log = future.result()
+                if code == 0:
+                    state["stages"][name] = {**stage_key(BY_NAME[name], hashes), "seconds": round(seconds, 2),
+                                             "outputs": output_hashes(BY_NAME[name], hashes)}
+                    save_state(state)
+                    print(f"[OK]   {name:<20} done in {seconds:.1f}s")
+                    finish(name, "ran")
+                else:
+                    print(f"[WARN] {name:<20} failed (exit {code}) | log: {log.relative_to(ROOT)}")
+                    finish(name, "failed")
+
+    save_state(state)
+    counts = {r: sum(v == r for v in results.values())
+              for r in ("ran", "skipped", "stale", "failed", "refused", "blocked")}
+    print(f"[OK] Pipeline: {', '.join(f'{n} {r}' for r, n in counts.items() if n)} "
+          f"in {time.perf_counter() - t_start:.1f}s (jobs={jobs})")
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Run the project's stage scripts as a cached DAG.")
+    ap.add_argument("targets", nargs="*", help=f"stages to build (with their upstream); default: all of {list(BY_NAME)}")
+    ap.add_argument("--jobs", type=int, default=JOBS, help="stages run at the same time")
+    ap.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="rerun these stages even if up to date")
+    ap.add_argument("--status", action="store_true", help="only report which stages are out of date")
+    ap.add_argument("--run-stage", default=None, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_stage:
+        os.chdir(ROOT)
+        BY_NAME[args.run_stage].run()
+    else:
+        results = run(args.targets, args.jobs, set(args.force), args.status)
+        sys.exit(1 if any(r in ("failed", "refused") for r in results.values()) else 0)
@@ -0,0 +1,462 @@
+"""
+Probability cube: P(accept) precomputed over the demo's whole applicant grid.
+
+The inputs of app_local.py are discrete: GPA 2.50-4.00 in 0.01 steps (151
+values), GRE 130-170 (41), two citizenship values, and the universities of the
+version's uni_table (~160). build_cube() scores every cell once per model
+version: chunks of GPA rows, each one model call (TopKScorer.score_many), spread
+over worker processes that write straight into the memory-mapped output. The
+result is <version>/prob_cube/cube.npy, shape [term, gpa, gre, intl, university],
+quantized to uint8 (p * 255, error <= 1/510) or float16 (error <= 2**-12).
+Program and the term(s) are fixed per cube and recorded in meta.json.
+
+ProbCube answers the what-if queries by indexing the mapped array:
+  point(applicant, institution)   one probability
+  top_k(applicant, k)             the k best universities
+  required_gpa(applicant, p)      per university, the lowest GPA from which
+                                  P(accept) >= p holds up to 4.00 (NaN: never)
+Each returns None off the grid (GPA between 0.01 steps, non-integer or out of
+range GRE, another program / term, an unknown university). WhatIf puts the cube
+in front of a loaded model (model_registry.LoadedModel) and falls back to the
+model for those inputs.
+
+train_best_model_hgb.py builds the cube into every new version; this script
+(re)builds it for an existing one, e.g. with other terms.
+
+    python prob_cube.py                          # build the cube of the live version
+    python prob_cube.py --terms S24 "Fall 2025" --dtype float16 --workers 4
+    python prob_cube.py --check 2000             # cube vs live model on random grid cells
+    python prob_cube.py --bench                  # query latency, cube vs live model
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from model_versions import MODEL_ROOT, resolve_model_dir
+from topk_scoring import top_k_indices
+
+# =========================
+# CONFIG
+# =========================
+CUBE_DIR = "prob_cube"                 # inside the version dir
+GPA_GRID = (2.50, 4.00, 0.01)          # start, stop (inclusive), step: the app's sliders
+GRE_GRID = (130, 170, 1)
+INTL_VALUES = (0, 1)
+CUBE_PROGRAM = "Computer Science Masters"
+CUBE_TERMS = ["S24"]                   # app_local.py's default term
+DTYPE = "uint8"                        # or "float16"
+WORKERS = os.cpu_count() or 1
+CHUNK_GPA = 8                          # GPA rows per task (x 41 GRE x 2 x universities cells)
+# bulk scoring: sklearn's compiled predictor is the fastest here, the flat ones are the fallback
+BUILD_BACKENDS = ["sklearn", "flat", "mmap"]
+TARGET_P = 0.5
+MAX_ERROR = {"uint8": 0.5 / 255, "float16": 2.0 ** -12}  # quantization error bound for p in [0, 1]
+
+CHECK_N = 1000
+CHECK_SEED = 42
+BENCH_REPEATS = 200
+BENCH_MODEL_REPEATS = 10   # the model path of a required-GPA query scores 151 x universities rows
+
+
+def grid(start, stop, step) -> np.ndarray:
+    n = int(round((stop - start) / step)) + 1
+    return np.round(start + step * np.arange(n), 6)
+
+
+def grid_index(values: np.ndarray, v) -> Optional[int]:
+    """Index of v on an evenly spaced grid, None when v lies between or outside its points."""
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    step = values[1] - values[0] if len(values) > 1 else 1.0
+    i = int(round((v - values[0]) / step))
+    if 0 <= i < len(values) and abs(values[i] - v) <= 1e-9:
+        return i
+    return None
+
+
+def quantize(p: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype == "uint8":
+        return np.rint(np.clip(p, 0.0, 1.0) * 255).astype(np.uint8)
+    if dtype == "float16":
+        return p.astype(np.float16)
+    raise ValueError(f"Unknown cube dtype {dtype!r} (expected one of {list(MAX_ERROR)})")
+
+
+def dequantize(q: np.ndarray) -> np.ndarray:
+    if q.dtype == np.uint8:
+        return q.astype(np.float64) / 255
+    return q.astype(np.float64)
+
+
+def required_from(gpa: np.ndarray, probs: np.ndarray, target: float) -> np.ndarray:
+    """
+    probs: [gpa, university]. Per university the lowest GPA from which every
+    higher grid GPA also reaches target (trees need not be monotone in GPA),
+    NaN if even 4.00 does not.
+    """
+    ok = probs >= target
+    from_here = np.logical_and.accumulate(ok[::-1], axis=0)[::-1]
+    first = from_here.argmax(axis=0)
+    reachable = from_here[first, np.arange(probs.shape[1])]
+    return np.where(reachable, gpa[first], np.nan)
+
+
+def grid_applicants(gpa, gre, intl, program, term) -> pd.DataFrame:
+    """Every (gpa, gre, intl) combination, gpa slowest: the cube's cell order."""
+    g, r, c = np.meshgrid(gpa, gre, intl, indexing="ij")
+    return pd.DataFrame({
+        "gpa_raw": g.ravel(),
+        "gre_total": r.ravel().astype(float),
+        "is_international": c.ravel(),
+        "program": program,
+        "term": term,
+    })
+
+
+# =========================
+# build
+# =========================
+_WORKER = {}
+
+
+def _init_worker(model_dir, backend, cube_path, meta):
+    from model_registry import load_version  # the registry imports this module
+    _WORKER.update(
+        scorer=load_version(model_dir, backend).scorer,
+        cube=np.load(cube_path, mmap_mode="r+"),
+        meta=meta,
+    )
+
+
+def _fill(task):
+    """Scores GPA rows i0:i1 of one term and writes them into the cube; returns the max quantization error."""
+    t, i0, i1 = task
+    scorer, cube, meta = _WORKER["scorer"], _WORKER["cube"], _WORKER["meta"]
+    gpa, gre, intl = np.array(meta["gpa"]), np.array(meta["gre"]), np.array(meta["is_international"])
+    X = grid_applicants(gpa[i0:i1], gre, intl, meta["program"], meta["terms"][t])
+    probs = scorer.score_many(X).reshape(i1 - i0, len(gre), len(intl), -1)
+    q = quantize(probs, meta["dtype"])
+    cube[t, i0:i1] = q
+    cube.flush()
+    return float(np.abs(dequantize(q) - probs).max())
+
+
+def build_cube(model_dir, terms=None, program=CUBE_PROGRAM, dtype=DTYPE, workers=WORKERS,
+               chunk=CHUNK_GPA, backend=None) -> Path:
+    """
+    Scores the whole grid with the model in model_dir and writes model_dir/prob_cube
+    (cube.npy + meta.json). A cube already there is replaced only once the new one
+    is complete; a registry that mapped the old file keeps reading it until it
+    picks the new one up.
+    """
+    from model_registry import available_backends, load_version
+
+    model_dir = Path(model_dir)
+    terms = list(terms or CUBE_TERMS)
+    quantize(np.zeros(1), dtype)  # unknown dtype -> error before any work
+    if backend is None:
+        have = available_backends(model_dir)
+        backend = next((b for b in BUILD_BACKENDS if b in have), None)
+        if backend is None:
+            raise FileNotFoundError(f"No model artifact in {model_dir}")
+    institutions = load_version(model_dir, backend).scorer.institutions
+
+    gpa, gre = grid(*GPA_GRID), grid(*GRE_GRID)
+    shape = (len(terms), len(gpa), len(gre), len(INTL_VALUES), len(institutions))
+    meta = {
+        "layout": ["term", "gpa", "gre", "is_international", "institution"],
+        "shape": list(shape),
+        "dtype": dtype,
+        "max_error_bound": MAX_ERROR[dtype],
+        "gpa": gpa.tolist(),
+        "gre": gre.tolist(),
+        "is_international": list(INTL_VALUES),
+        "program": program,
+        "terms": terms,
+        "institutions": [str(u) for u in institutions],
+    }
+
+    final = model_dir / CUBE_DIR
+    staging = model_dir / f".{CUBE_DIR}-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    try:
+        t0 = time.perf_counter()
+        cube_path = staging / "cube.npy"
+        np.lib.format.open_memmap(cube_path, mode="w+", dtype=dtype, shape=shape).flush()
+
+        tasks = [(t, i, min(i + chunk, len(gpa))) for t in range(len(terms)) for i in range(0, len(gpa), chunk)]
+        workers = max(1, min(int(workers), len(tasks)))
+        initargs = (str(model_dir), backend, str(cube_path), meta)
+        if workers == 1:
+            _init_worker(*initargs)
+            errors = [_fill(task) for task in tasks]
+            _WORKER.clear()
+        else:
+            with mp.get_context("spawn").Pool(workers, initializer=_init_worker, initargs=initargs) as pool:
+                errors = list(pool.imap_unordered(_fill, tasks))
+
+        meta.update({
+            "max_error": max(errors),
+            "backend": backend,
+            "workers": workers,
+            "build_s": round(time.perf_counter() - t0, 2),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        if meta["max_error"] > MAX_ERROR[dtype] + 1e-12:
+            raise ValueError(f"Quantization error {meta['max_error']:.2e} above the {dtype} bound")
+        (staging / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+        old = model_dir / f".{CUBE_DIR}-old-{os.getpid()}"
+        if final.exists():
+            os.replace(final, old)
+        os.replace(staging, final)
+        shutil.rmtree(old, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    mb = (final / "cube.npy").stat().st_size / 1024 ** 2
+    print(f"[OK] Probability cube -> {CUBE_DIR}/: {'x'.join(map(str, shape))} {dtype} "
+          f"({mb:.1f} MB) in {meta['build_s']:.1f} s, {workers} worker(s), {backend} | "
+          f"max quantization error {meta['max_error']:.2e}")
+    return final
+
+
+# =========================
+# queries
+# =========================
+class ProbCube:
+    """Read-only view of a built cube; every query is array indexing."""
+
+    def __init__(self, directory, mmap_mode="r"):
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        self.directory = directory
+        self.meta = meta
+        self.cube = np.load(directory / "cube.npy", mmap_mode=mmap_mode)
+        if list(self.cube.shape) != meta["shape"]:
+            raise ValueError(f"{directory}: cube.npy has shape {self.cube.shape}, meta.json says {meta['shape']}")
+        self.gpa = np.array(meta["gpa"])
+        self.gre = np.array(meta["gre"])
+        self.intl = list(meta["is_international"])
+        self.program = meta["program"]
+        self.terms = list(meta["terms"])
+        self.institutions = np.array(meta["institutions"])
+        self.max_error = float(meta["max_error_bound"])
+        self._uni_index = {u: i for i, u in enumerate(meta["institutions"])}
+
+    @classmethod
+    def open(cls, model_dir) -> Optional["ProbCube"]:
+        directory = Path(model_dir) / CUBE_DIR
+        return cls(directory) if (directory / "meta.json").exists() else None
+
+    @property
+    def mapped_mb(self) -> float:
+        return self.cube.nbytes / 1024 ** 2
+
+    def _context(self, applicant: dict):
+        """(term, gre, intl) indices of the applicant, None if any is off the cube."""
+        if str(applicant.get("program")) != self.program or str(applicant.get("term")) not in self.terms:
+            return None
+        j = grid_index(self.gre, applicant.get("gre_total"))
+        k = grid_index(np.array(self.intl, dtype=float), applicant.get("is_international"))
+        if j is None or k is None:
+            return None
+        return self.terms.index(str(applicant.get("term"))), j, k
+
+    def probs(self, applicant: dict) -> Optional[np.ndarray]:
+        """P(accept) at every university (order of self.institutions), None off the grid."""
+        ctx = self._context(applicant)
+        i = grid_index(self.gpa, applicant.get("gpa_raw"))
+        if ctx is None or i is None:
+            return None
+        t, j, k = ctx
+        return dequantize(self.cube[t, i, j, k])
+
+    def point(self, applicant: dict, institution: str) -> Optional[float]:
+        u = self._uni_index.get(str(institution).strip().lower())
+        probs = self.probs(applicant) if u is not None else None
+        return None if probs is None else float(probs[u])
+
+    def top_k(self, applicant: dict, k: int = 10) -> Optional[pd.DataFrame]:
+        probs = self.probs(applicant)
+        return None if probs is None else _top_k(self.institutions, probs, k)
+
+    def required_gpa(self, applicant: dict, target: float = TARGET_P) -> Optional[pd.Series]:
+        """Lowest GPA reaching target per university (the applicant's own GPA is not used)."""
+        ctx = self._context(applicant)
+        if ctx is None:
+            return None
+        t, j, k = ctx
+        req = required_from(self.gpa, dequantize(self.cube[t, :, j, k]), target)
+        return pd.Series(req, index=self.institutions, name="required_gpa")
+
+
+def _top_k(institutions, probs, k) -> pd.DataFrame:
+    # same selection as TopKScorer.top_k; on equal (quantized) values the uni_table order wins
+    idx = top_k_indices(probs, k)
+    return pd.DataFrame({"institution_clean": institutions[idx], "p_accept": probs[idx]})
+
+
+class WhatIf:
+    """
+    Cube lookups for a loaded model, with the model itself for everything off
+    the grid (or when the version has no cube). Every method also returns where
+    the answer came from: "cube" or "model".
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.scorer = model.scorer
+        self.cube = getattr(model, "cube", None)
+
+    def probs(self, applicant: dict):
+        probs = self.cube.probs(applicant) if self.cube is not None else None
+        if probs is not None:
+            return probs, "cube"
+        return self.scorer.score_all(applicant), "model"
+
+    def point(self, applicant: dict, institution: str):
+        inst = str(institution).strip().lower()
+        hits = np.flatnonzero(self.scorer.institutions == inst)
+        if not hits.size:
+            raise KeyError(f"Unknown university {institution!r}")
+        probs, source = self.probs(applicant)
+        return float(probs[hits[0]]), source
+
+    def top_k(self, applicant: dict, k: int = 10):
+        out = self.cube.top_k(applicant, k) if self.cube is not None else None
+        if out is not None:
+            return out, "cube"
+        return self.scorer.top_k(applicant, k), "model"
+
+    def required_gpa(self, applicant: dict, target: float = TARGET_P):
+        out = self.cube.required_gpa(applicant, target) if self.cube is not None else None
+        if out is not None:
+            return out, "cube"
+        gpa = grid(*GPA_GRID)
+        X = grid_applicants(gpa, [applicant.get("gre_total")], [applicant.get("is_international")],
+                            applicant.get("program"), applicant.get("term"))
+        req = required_from(gpa, self.scorer.score_many(X), target)
+        return pd.Series(req, index=self.scorer.institutions, name="required_gpa"), "model"
+
+
+def cube_matches(cube: ProbCube, model) -> Optional[str]:
+    """Why the cube does not belong to model (None if it does): university order, then one cell vs the model."""
+    if not np.array_equal(cube.institutions, model.scorer.institutions.astype(str)):
+        return "built for other universities"
+    applicant = {
+        "gpa_raw": cube.gpa[len(cube.gpa) // 2],
+        "gre_total": cube.gre[len(cube.gre) // 2],
+        "is_international": cube.intl[-1],
+        "program": cube.program,
+        "term": cube.terms[0],
+    }
+    err = float(np.abs(cube.probs(applicant) - model.scorer.score_all(applicant)).max())
+    if err > cube.max_error + 1e-9:
+        return f"differs from the model by {err:.4f} (bound {cube.max_error:.4f})"
+    return None
+
+
+# =========================
+# check / bench
+# =========================
+def _random_applicants(cube: ProbCube, n: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    return [{
+        "gpa_raw": float(rng.choice(cube.gpa)),
+        "gre_total": float(rng.choice(cube.gre)),
+        "is_international": int(rng.choice(cube.intl)),
+        "program": cube.program,
+        "term": str(rng.choice(cube.terms)),
+    } for _ in range(n)]
+
+
+def check(model, n=CHECK_N, seed=CHECK_SEED, target=TARGET_P) -> pd.DataFrame:
+    """Cube vs the live model on n random grid applicants (all universities each)."""
+    cube = model.cube
+    rows = []
+    applicants = _random_applicants(cube, n, seed)
+    exact = model.scorer.score_many(pd.DataFrame(applicants))
+    for a, p in zip(applicants, exact):
+        q = cube.probs(a)
+        top_c = set(cube.top_k(a, 10)["institution_clean"])
+        top_m = set(_top_k(model.scorer.institutions, p, 10)["institution_clean"])
+        rows.append({
+            "max_abs_err": float(np.abs(q - p).max()),
+            "top10_overlap": len(top_c & top_m) / 10,
+            "decision_flips": int(((q >= target) != (p >= target)).sum()),
+        })
+    res = pd.DataFrame(rows)
+    print(f"[OK] {n} grid applicants x {len(cube.institutions)} universities | max |cube - model| "
+          f"{res['max_abs_err'].max():.2e} (bound {cube.max_error:.2e}) | top-10 overlap "
+          f"{res['top10_overlap'].mean():.3f} | p>={target} decisions flipped: "
+          f"{res['decision_flips'].sum()} of {n * len(cube.institutions)}")
+    return res
+
+
+def _per_call_us(fn, args_list) -> float:
+    t0 = time.perf_counter()
+    for a in args_list:
+        fn(a)
+    return (time.perf_counter() - t0) / len(args_list) * 1e6
+
+
+def bench(model, repeats=BENCH_REPEATS) -> pd.DataFrame:
+    """Latency per query: cube lookup vs the live model (point, Top-10, required GPA)."""
+    cube = model.cube
+    applicants = _random_applicants(cube, repeats, CHECK_SEED)
+    uni = cube.institutions[0]
+    live = WhatIf(model)
+    live.cube = None
+    rows = []
+    for query, via_cube, via_model in [
+        ("point", lambda a: cube.point(a, uni), lambda a: live.point(a, uni)),
+        ("top-10", lambda a: cube.top_k(a, 10), lambda a: live.top_k(a, 10)),
+        ("required GPA (all universities)", lambda a: cube.required_gpa(a), lambda a: live.required_gpa(a)),
+    ]:
+        c_us = _per_call_us(via_cube, applicants)
+        live.scorer._applicant_cache.clear()  # every slider move is a new applicant for the model
+        m_us = _per_call_us(via_model, applicants[:BENCH_MODEL_REPEATS])
+        rows.append({"query": query, "cube_us": round(c_us, 1), "model_us": round(m_us, 1),
+                     "speedup": round(m_us / c_us, 1)})
+        print(f"[OK] {query:<32} cube {c_us:9.1f} us | model {m_us:9.1f} us | x{m_us / c_us:.0f}")
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="P(accept) over the demo's applicant grid, per model version.")
+    ap.add_argument("--root", default=str(MODEL_ROOT))
+    ap.add_argument("--version-dir", default=None, help="build for this version dir instead of the live one")
+    ap.add_argument("--terms", nargs="+", default=CUBE_TERMS)
+    ap.add_argument("--program", default=CUBE_PROGRAM)
+    ap.add_argument("--dtype", default=DTYPE, choices=list(MAX_ERROR))
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--check", type=int, nargs="?", const=CHECK_N, default=None, metavar="N",
+                    help="compare the existing cube with the live model on N random grid applicants")
+    ap.add_argument("--bench", action="store_true", help="query latency of the existing cube vs the live model")
+    args = ap.parse_args()
+
+    model_dir = Path(args.version_dir) if args.version_dir else resolve_model_dir(args.root)
+    if args.check is None and not args.bench:
+        build_cube(model_dir, args.terms, args.program, args.dtype, args.workers)
+    else:
+        from model_registry import load_version
+        model = load_version(model_dir)
+        if model.cube is None:
+            raise SystemExit(f"[WARN] No usable {CUBE_DIR} in {model_dir}; build it first (python prob_cube.py)")
+        if args.check is not None:
+            check(model, args.check)
+        if args.bench:
+            bench(model)
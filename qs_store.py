@@ -0,0 +1,242 @@
+"""
+Multi-year / multi-subject QS ranking store.
+
+Every raw QS export (one subject, one edition) carries the edition's rank
+column plus earlier years' ranks ("2025", "2024", ...). ingest() melts each
+file into long rows keyed by (subject, institution_clean, year) and upserts
+them into one table sorted by that key (qs_store.csv + typed Parquet copy).
+When two files give the same key, the row from the file whose edition is that
+year wins, then the newer edition.
+
+attach_ranks() adds to GradCafe rows the rank contemporaneous with their
+`term` ("F20", "Fall 2022", "S15", ...): the latest QS year <= term year
+(TERM_LAG years earlier), found with one pd.merge_asof per subject instead of
+a lookup per row. Rows whose term precedes every ranking of their
+institution fall back to the earliest one (FALLBACK_FORWARD); qs_year tells
+which year was used.
+
+    python qs_store.py                        # rebuild the store from SOURCES
+    python qs_store.py --add export.csv --subject "Mathematics"
+    python qs_store.py --bench 1000000        # merge_asof vs per-row lookup (same result)
+"""
+import argparse
+import bisect
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent
+sys.path.insert(0, str(REPO_ROOT / "QS World Ranking" / "Preprocessing: QS World Ranking"))
+
+from name_normalization import normalize_column, normalize_name  # noqa: E402
+from QS_Cleaning import NUMERIC_COLS, by_unique, clean_qs_frame, parse_rank_column  # noqa: E402
+from table_store import load_table, save_table  # noqa: E402
+
+# =========================
+# CONFIG
+# =========================
+STORE_PATH = Path("QS World Ranking/qs_store.csv")
+DEFAULT_SUBJECT = "Computer Science and Information Systems"
+SOURCES = [  # (raw QS export, subject)
+    ("QS World Ranking/Preprocessing: QS World Ranking/2025_QS_raw.csv", DEFAULT_SUBJECT),
+]
+KEY = ["subject", "institution_clean", "year"]
+TERM_LAG = 0              # QS year = term year - TERM_LAG
+FALLBACK_FORWARD = True   # term older than every ranking -> earliest ranking
+
+TERM_PATTERN = r"^\s*(?P<season>[A-Za-z]+)\.?\s*'?(?P<year>\d{4}|\d{2})\s*$"
+YEAR_COL = re.compile(r"^\d{4}$")
+BENCH_SEED = 42
+
+
+# =========================
+# store
+# =========================
+def ingest_file(path, subject: str, edition: int = None) -> pd.DataFrame:
+    """One raw QS export (sep=";") -> long rows: subject, year, institution_clean, rank, edition (+ indicators)."""
+    df = clean_qs_frame(pd.read_csv(path, sep=";"))
+    df["institution_clean"] = normalize_column(df["Institution"])
+    years = sorted(int(c) for c in df.columns if YEAR_COL.match(str(c)))
+    if not years:
+        raise ValueError(f"{path}: no rank-year columns (e.g. '2025'). Columns: {list(df.columns)}")
+    edition = edition or years[-1]
+
+    info = ["Institution", "Country / Territory"]
+    parts = []
+    for year in years:
+        part = df[["institution_clean"] + [c for c in info if c in df.columns]].copy()
+        part["year"] = year
+        part["rank"] = parse_rank_column(df[str(year)]).to_numpy()
+        # indicator scores describe the edition only
+        for col in NUMERIC_COLS:
+            part[col] = df[col].to_numpy() if year == edition and col in df.columns else np.nan
+        parts.append(part)
+    out = pd.concat(parts, ignore_index=True)
+    out.insert(0, "subject", subject)
+    out["edition"] = edition
+    return out[out["rank"].notna()]
+
+
+def _finalize(rows: pd.DataFrame) -> pd.DataFrame:
+    """Resolves duplicate keys (own edition first, then newest edition) and sorts by KEY."""
+    own = rows["edition"].eq(rows["year"])
+    rows = rows.assign(_own=own).sort_values(KEY + ["_own", "edition", "rank"],
+                                             ascending=[True, True, True, False, False, True])
+    rows = rows.drop_duplicates(subset=KEY, keep="first").drop(columns="_own")
+    rows["year"] = rows["year"].astype("int64")
+    rows["edition"] = rows["edition"].astype("int64")
+    return rows.reset_index(drop=True)
+
+
+def build_store(sources=SOURCES, path=STORE_PATH) -> pd.DataFrame:
+    store = _finalize(pd.concat([ingest_file(p, s) for p, s in sources], ignore_index=True))
+    save_table(store, path)
+    return store
+
+
+def add_source(src, subject: str, path=STORE_PATH, edition: int = None) -> pd.DataFrame:
+    """Upserts one more export into the existing store."""
+    new = ingest_file(src, subject, edition)
+    store = load_store(path)
+    store = _finalize(new if store is None else pd.concat([store, new], ignore_index=True))
+    save_table(store, path)
+    return store
+
+
+def load_store(path=STORE_PATH):
+    """The store sorted by KEY, or None when it has not been built yet."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    store = load_table(path)
+    store["subject"] = store["subject"].astype(str)
+    store["institution_clean"] = store["institution_clean"].astype(str)
+    return store
+
+
+# =========================
+# time-aware join
+# =========================
+def term_year(terms: pd.Series) -> pd.Series:
+    """'F20' / 'Fall 2022' / 'S15' / "Spring '21" -> 2020 / 2022 / 2015 / 2021 (float, NaN if unreadable)."""
+    def parse(v):
+        year = v.astype("string").str.extract(TERM_PATTERN)["year"].astype("float64")
+        return year.where(year >= 100, year + 2000)
+    return by_unique(terms, parse)
+
+
+def attach_ranks(df: pd.DataFrame, store: pd.DataFrame, subject: str = DEFAULT_SUBJECT, term_col: str = "term",
+                 key_col: str = "institution_clean", lag: int = TERM_LAG,
+                 fallback_forward: bool = FALLBACK_FORWARD) -> pd.DataFrame:
+    """
+    Copy of `df` with qs_year and rank_asof: the `subject` rank of each row's
+    institution for the latest QS year <= term year - lag. `key_col` holds the
+    institution_clean key or a QS Institution name (normalized with normalize_name).
+    """
+    ranks = store.loc[store["subject"] == subject, ["institution_clean", "year", "rank"]]
+    keys = pd.Index(ranks["institution_clean"].unique())
+    ranks = pd.DataFrame({
+        "key": keys.get_indexer(ranks["institution_clean"]),
+        "qs_year": ranks["year"].to_numpy(dtype="int64"),
+        "rank": ranks["rank"].to_numpy(dtype=float),
+    }).sort_values("qs_year", kind="stable")
+
+    # institution -> integer key of the store (-1: not ranked), normalized once per distinct name
+    codes, uniques = pd.factorize(df[key_col])
+    unique_keys = keys.get_indexer([normalize_name(u) for u in uniques])
+    row_key = np.where(codes >= 0, unique_keys[codes], -1)
+    lookup = (term_year(df[term_col]) - lag).to_numpy()
+
+    ok = (row_key >= 0) & ~np.isnan(lookup)
+    left = pd.DataFrame({"key": row_key[ok], "year": lookup[ok].astype("int64"), "_row": np.flatnonzero(ok)})
+    left = left.sort_values("year", kind="stable")
+
+    hit = pd.merge_asof(left, ranks, left_on="year", right_on="qs_year", by="key", direction="backward")
+    if fallback_forward:
+        miss = hit["rank"].isna().to_numpy()
+        if miss.any():
+            fwd = pd.merge_asof(left[miss], ranks, left_on="year", right_on="qs_year", by="key", direction="forward")
+            hit.loc[miss, ["qs_year", "rank"]] = fwd[["qs_year", "rank"]].to_numpy()
+
+    qs_year = np.full(len(df), np.nan)
+    rank = np.full(len(df), np.nan)
+    qs_year[hit["_row"].to_numpy()] = hit["qs_year"].to_numpy(dtype=float)
+    rank[hit["_row"].to_numpy()] = hit["rank"].to_numpy(dtype=float)
+    return df.assign(qs_year=qs_year, rank_asof=rank)
+
+
+def _attach_ranks_rowwise(df, store, subject=DEFAULT_SUBJECT, term_col="term", key_col="institution_clean",
+                          lag=TERM_LAG, fallback_forward=FALLBACK_FORWARD):
+    """Per-row bisect lookup with the same rules as attach_ranks (reference for --bench)."""
+    by_inst = {}
+    for inst, g in store[store["subject"] == subject].sort_values("year").groupby("institution_clean"):
+        by_inst[inst] = (g["year"].tolist(), g["rank"].tolist())
+    years = term_year(df[term_col]) - lag
+
+    out_year, out_rank = [], []
+    for inst, y in zip(df[key_col], years):
+        inst = normalize_name(inst)
+        entry = by_inst.get(inst)
+        if entry is None or pd.isna(y):
+            out_year.append(np.nan)
+            out_rank.append(np.nan)
+            continue
+        i = bisect.bisect_right(entry[0], y) - 1
+        if i < 0:
+            i = 0 if fallback_forward else None
+        out_year.append(np.nan if i is None else entry[0][i])
+        out_rank.append(np.nan if i is None else entry[1][i])
+    return df.assign(qs_year=np.array(out_year, dtype=float), rank_asof=np.array(out_rank, dtype=float))
+
+
+def bench(n: int, store: pd.DataFrame, subject=DEFAULT_SUBJECT):
+    rng = np.random.default_rng(BENCH_SEED)
+    insts = store.loc[store["subject"] == subject, "institution_clean"].unique()
+    insts = np.append(insts, ["not a qs university"])
+    terms = np.array([f"F{y:02d}" for y in range(12, 26)] + [f"Fall {y}" for y in range(2012, 2026)]
+                     + ["Spring 2020", "S15", "?"])
+    df = pd.DataFrame({"institution_clean": rng.choice(insts, n), "term": rng.choice(terms, n)})
+
+    t0 = time.perf_counter()
+    fast = attach_ranks(df, store, subject)
+    t_fast = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    slow = _attach_ranks_rowwise(df, store, subject)
+    t_slow = time.perf_counter() - t0
+
+    pd.testing.assert_frame_equal(fast, slow)
+    print(f"[OK] {n} rows x {len(store)} store rows: per-row {t_slow:.2f} s | merge_asof {t_fast:.2f} s "
+          f"({t_slow / t_fast:.0f}x) | identical result, {fast['rank_asof'].notna().mean():.1%} ranked")
+
+
+def summary(store: pd.DataFrame):
+    by = store.groupby(["subject", "year"]).size()
+    print(f"[OK] QS store: {len(store)} rows, {store['institution_clean'].nunique()} institutions")
+    print(by.rename("rows").to_string())
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Multi-year / multi-subject QS ranking store.")
+    ap.add_argument("--store", default=str(STORE_PATH))
+    ap.add_argument("--add", default=None, help="raw QS export (sep=';') to upsert into the store")
+    ap.add_argument("--subject", default=DEFAULT_SUBJECT, help="subject of --add")
+    ap.add_argument("--edition", type=int, default=None, help="edition year of --add (default: its newest rank column)")
+    ap.add_argument("--bench", type=int, default=None, metavar="N",
+                    help="time merge_asof vs a per-row lookup on N synthetic GradCafe rows")
+    args = ap.parse_args()
+
+    if args.bench:
+        store = load_store(args.store)
+        if store is None:
+            store = build_store(path=args.store)
+        bench(args.bench, store)
+    elif args.add:
+        summary(add_source(args.add, args.subject, args.store, args.edition))
+    else:
+        store = build_store(path=args.store)
+        print(f"[OK] Saved → {args.store}")
+        summary(store)
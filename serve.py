@@ -0,0 +1,314 @@
+import argparse
+import json
+import queue
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+
+from model_registry import ModelRegistry
+from prob_cube import TARGET_P, WhatIf
+
+# =========================
+# CONFIG
+# =========================
+MODEL_DIR = Path("saved_model_hgb")  # its CURRENT version, followed by model_registry.py
+HOST = "127.0.0.1"
+PORT = 8000
+
+MAX_BATCH = 256      # max rows per predict_proba call
+MAX_WAIT_MS = 2.0    # how long the batcher waits for more requests to arrive
+
+NUMERIC_FEATURES = ["gpa_raw", "gre_total", "log_rank", "is_international"]
+
+
+class PayloadError(ValueError):
+    pass
+
+
+def parse_k(v) -> int:
+    """Top-K size from a request body: a whole number >= 1."""
+    try:
+        k = int(v)
+        ok = not isinstance(v, bool) and k == float(v) and k >= 1
+    except (TypeError, ValueError, OverflowError):
+        ok = False
+    if not ok:
+        raise PayloadError(f"'k' must be a whole number >= 1, got {v!r}")
+    return k
+
+
+def parse_p(v) -> float:
+    """Target probability from a request body: a number in (0, 1]."""
+    try:
+        p = float(v)
+        ok = not isinstance(v, bool) and 0.0 < p <= 1.0
+    except (TypeError, ValueError):
+        ok = False
+    if not ok:
+        raise PayloadError(f"'p' must be a number in (0, 1], got {v!r}")
+    return p
+
+
+def validate_rows(rows, features):
+    """
+    Checks that every row has all model features and that numeric ones parse.
+    Returns a DataFrame with columns in model order.
+    """
+    if not isinstance(rows, list) or not rows:
+        raise PayloadError("Expected a non-empty list of rows.")
+
+    clean = []
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            raise PayloadError(f"Row {i} is not an object.")
+        missing = [c for c in features if c not in row]
+        if missing:
+            raise PayloadError(f"Row {i} missing features: {missing}")
+
+        out = {}
+        for c in features:
+            v = row[c]
+            if c in NUMERIC_FEATURES:
+                try:
+                    v = float(v)
+                except (TypeError, ValueError):
+                    raise PayloadError(f"Row {i}: '{c}' must be numeric, got {v!r}")
+            elif c == "institution_clean":
+                v = str(v).strip().lower()
+            else:
+                v = str(v)
+            out[c] = v
+        clean.append(out)
+
+    return pd.DataFrame(clean, columns=features)
+
+
+def fill_uni_features(rows, uni_table: pd.DataFrame, features):
+    """
+    Rows without the university-side features (log_rank) get them from the
+    model's uni_table by institution_clean, so clients only send the
+    university name. Values a row brings are kept; unknown names are left to
+    validate_rows.
+    """
+    fill = [c for c in features if c != "institution_clean" and c in uni_table.columns]
+    if not isinstance(rows, list) or not fill:
+        return rows
+    by_name = uni_table.assign(
+        institution_clean=uni_table["institution_clean"].astype(str).str.strip().str.lower()
+    ).drop_duplicates("institution_clean").set_index("institution_clean")[fill]
+    out = []
+    for row in rows:
+        if isinstance(row, dict) and any(c not in row for c in fill):
+            name = str(row.get("institution_clean", "")).strip().lower()
+            if name in by_name.index:
+                row = {**by_name.loc[name].to_dict(), **row}
+        out.append(row)
+    return out
+
+
+class MicroBatcher:
+    """
+    Collects rows from concurrent requests and scores them with one
+    predict_proba call per batch (up to MAX_BATCH rows or MAX_WAIT_MS).
+    """
+
+    def __init__(self, registry: ModelRegistry, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):
+        self.registry = registry
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.q = queue.Queue()
+        self.n_calls = 0
+        self.n_rows = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, X: pd.DataFrame) -> Future:
+        fut = Future()
+        self.q.put((X, fut))
+        return fut
+
+    def _run(self):
+        while True:
+            items = [self.q.get()]
+            n = len(items[0][0])
+            while n < self.max_batch:
+                try:
+                    item = self.q.get(timeout=self.max_wait)
+                except queue.Empty:
+                    break
+                items.append(item)
+                n += len(item[0])
+
+            try:
+                X = pd.concat([x for x, _ in items], ignore_index=True)
+                probs = self.registry.current().pipe.predict_proba(X)[:, 1]
+            except Exception as e:
+                for _, fut in items:
+                    fut.set_exception(e)
+                continue
+
+            self.n_calls += 1
+            self.n_rows += n
+
+            start = 0
+            for x, fut in items:
+                fut.set_result(probs[start:start + len(x)])
+                start += len(x)
+
+
+class ScoringService:
+    """
+    Answers predict / batch / Top-K requests with the live model of a
+    ModelRegistry; new versions under model_dir are swapped in while serving.
+    Point, Top-K and required-GPA queries on the app's input grid are lookups
+    in the version's probability cube (prob_cube.py), the rest uses the model.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, watch: bool = True):
+        self.registry = ModelRegistry(model_dir)
+        if watch:
+            self.registry.start()
+        self.batcher = MicroBatcher(self.registry)
+
+    def predict(self, rows) -> list:
+        model = self.registry.current()
+        rows = fill_uni_features(rows, model.uni_table, model.features)
+        X = validate_rows(rows, model.features)
+        return self.batcher.submit(X).result().tolist()
+
+    def _applicant(self, body: dict):
+        model = self.registry.current()
+        X = validate_rows([body], model.scorer.applicant_features)
+        return WhatIf(model), X.iloc[0].to_dict()
+
+    def topk(self, applicant: dict, k: int = 10) -> dict:
+        whatif, applicant = self._applicant(applicant)
+        out, source = whatif.top_k(applicant, k)
+        return {"top_k": out.to_dict(orient="records"), "source": source}
+
+    def point(self, applicant: dict, institution: str) -> dict:
+        whatif, applicant = self._applicant(applicant)
+        try:
+            p, source = whatif.point(applicant, institution)
+        except KeyError as e:
+            raise PayloadError(str(e.args[0]))
+        return {"p_accept": p, "source": source}
+
+    def required_gpa(self, applicant: dict, target: float = TARGET_P) -> dict:
+        """Per university the lowest GPA (2.50-4.00) from which P(accept) >= target; null if none."""
+        applicant = {"gpa_raw": 0.0, **applicant}  # the applicant's own GPA is not used
+        whatif, applicant = self._applicant(applicant)
+        req, source = whatif.required_gpa(applicant, target)
+        rows = [{"institution_clean": u, "required_gpa": None if g != g else float(g)} for u, g in req.items()]
+        return {"target": target, "required_gpa": rows, "source": source}
+
+    def health(self) -> dict:
+        model = self.registry.current()
+        return {
+            "status": "ok",
+            "model": model.info.get("model"),
+            "version": model.version,
+            "backend": model.backend,
+            "features": model.features,
+            "n_universities": int(len(model.scorer.institutions)),
+            "cube": model.stats()["cube"],
+            "batches": self.batcher.n_calls,
+            "rows_scored": self.batcher.n_rows,
+        }
+
+    def models(self) -> dict:
+        return {"versions": self.registry.stats()}
+
+
+def make_handler(service: ScoringService):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass  # keep the console quiet under load
+
+        def _send(self, code, obj):
+            body = json.dumps(obj).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                return json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError as e:
+                raise PayloadError(f"Invalid JSON: {e}")
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, service.health())
+            elif self.path == "/models":
+                self._send(200, service.models())
+            else:
+                self._send(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            try:
+                body = self._read_json()
+                if self.path == "/predict":
+                    p = service.predict([body])[0]
+                    self._send(200, {"p_accept": p})
+                elif self.path == "/predict_batch":
+                    rows = body.get("rows") if isinstance(body, dict) else body
+                    self._send(200, {"p_accept": service.predict(rows)})
+                elif self.path in ("/topk", "/point", "/required_gpa"):
+                    if not isinstance(body, dict):
+                        raise PayloadError("Expected a JSON object.")
+                    if self.path == "/topk":
+                        self._send(200, service.topk(body, parse_k(body.pop("k", 10))))
+                    elif self.path == "/point":
+                        if "institution_clean" not in body:
+                            raise PayloadError("Missing 'institution_clean'.")
+                        self._send(200, service.point(body, body.pop("institution_clean")))
+                    else:
+                        self._send(200, service.required_gpa(body, parse_p(body.pop("p", TARGET_P))))
+                else:
+                    self._send(404, {"error": f"Unknown path {self.path}"})
+            except PayloadError as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+    return Handler
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # default of 5 drops connections under concurrent load
+
+
+def run(model_dir=MODEL_DIR, host=HOST, port=PORT):
+    service = ScoringService(model_dir)
+    server = Server((host, port), make_handler(service))
+    model = service.registry.current()
+    print(f"[OK] Model {model.version} loaded from {model.model_dir.resolve()} ({model.backend}) | "
+          f"features: {model.features}")
+    print(f"[OK] Serving on http://{host}:{port}  (POST /predict, /predict_batch, /topk, /point, /required_gpa; "
+          f"GET /health, /models)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Headless scoring service for saved_model_hgb.")
+    ap.add_argument("--model-dir", default=str(MODEL_DIR))
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    args = ap.parse_args()
+    run(args.model_dir, args.host, args.port)
@@ -0,0 +1,209 @@
+"""
+Typed storage for the pipeline tables (QS clean, GradCafe clean / normalized,
+merged_matched_only.csv, ...).
+
+save_table() writes the CSV as before plus a typed Parquet copy next to it
+(x.csv -> x.parquet): categoricals for the low-cardinality text columns,
+numbers for the numeric ones. load_table() reads the Parquet copy when it is
+there and not older than the CSV; otherwise it parses the CSV and applies the
+same types, so every script gets identical dtypes and nobody re-runs
+pd.to_numeric(errors="coerce") on its own.
+
+Parquet needs pyarrow (or fastparquet). Without one the CSV is the only copy
+and loading still returns typed frames, only slower.
+
+    python table_store.py --bench            # CSV vs Parquet load at 1x / 10x / 100x
+"""
+import argparse
+import importlib.util
+import io
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# =========================
+# CONFIG
+# =========================
+CATEGORICAL = ["institution_clean", "program", "term", "citizenship", "subject"]
+NUMERIC = [
+    "gpa_raw", "gre_total", "gre_q", "gre_v", "gre_aw",          # GradCafe
+    "Rank2025", "Rank2024",                                     # QS (parsed ranks)
+    "Academic", "Employer", "Citations", "H", "IRN", "Score",   # QS indicators
+    "rank", "qs_year", "rank_asof",                             # QS store / rank at the applicant's term
+]
+PARQUET_SUFFIX = ".parquet"
+
+BENCH_DATA = "merged_matched_only.csv"
+BENCH_SCALES = [1, 10, 100]
+BENCH_REPEATS = 3
+BENCH_SEED = 42
+
+
+def parquet_engine() -> Optional[str]:
+    for name in ("pyarrow", "fastparquet"):
+        if importlib.util.find_spec(name) is not None:
+            return name
+    return None
+
+
+def parquet_path(path) -> Path:
+    return Path(path).with_suffix(PARQUET_SUFFIX)
+
+
+def coerce_types(df: pd.DataFrame) -> pd.DataFrame:
+    """Applies the pipeline dtypes in place (columns already of that type are left alone)."""
+    for col in NUMERIC:
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    for col in CATEGORICAL:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def save_table(df: pd.DataFrame, path, write_csv: bool = True) -> Optional[Path]:
+    """
+    Writes `path` (CSV) and its typed Parquet copy. Returns the Parquet path, or
+    None when no engine is installed / the frame cannot be stored as Parquet.
+    """
+    path = Path(path)
+    df = coerce_types(df.copy())
+    if write_csv:
+        df.to_csv(path, index=False)
+
+    engine = parquet_engine()
+    pq = parquet_path(path)
+    if engine is None:
+        return None
+    try:
+        df.to_parquet(pq, engine=engine, index=False)
+    except (TypeError, ValueError, ImportError) as e:
+        # e.g. an object column holding both numbers and strings; the CSV is still complete
+        pq.unlink(missing_ok=True)
+        print(f"[WARN] {pq.name}: not written ({type(e).__name__}: {e}); loaders will use the CSV")
+        return None
+    return pq
+
+
+def load_table(path, columns: Optional[list] = None, prefer_parquet: bool = True) -> pd.DataFrame:
+    """
+    Loads a pipeline table with the pipeline dtypes. `path` may name the CSV or
+    the Parquet file; the Parquet copy is used unless it is missing, older than
+    the CSV (e.g. rows were appended by sync_gradcafe.py) or unreadable here.
+    """
+    path = Path(path)
+    csv_path = path if path.suffix != PARQUET_SUFFIX else path.with_suffix(".csv")
+    pq = parquet_path(path)
+
+    engine = parquet_engine()
+    if prefer_parquet and engine is not None and pq.exists():
+        if not csv_path.exists() or pq.stat().st_mtime >= csv_path.stat().st_mtime:
+            return coerce_types(pd.read_parquet(pq, engine=engine, columns=columns))
+        print(f"[INFO] {pq.name} is older than {csv_path.name}; reading the CSV")
+
+    head = pd.read_csv(csv_path, nrows=0).columns
+    dtype = {c: "category" for c in CATEGORICAL if c in head}
+    return coerce_types(pd.read_csv(csv_path, usecols=columns, dtype=dtype))
+
+
+def load_csv_tail(path, offset: int):
+    """
+    Rows of a CSV after byte `offset` (the rows appended since it had that size),
+    same dtypes as load_table. Returns (rows, end): a last line still being
+    written is left out, and `end` is the offset to continue from next time.
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = max(offset, len(header))
+        f.seek(start)
+        tail = f.read()
+    tail = tail[:tail.rfind(b"\n") + 1]
+    head = pd.read_csv(io.BytesIO(header), nrows=0).columns
+    dtype = {c: "category" for c in CATEGORICAL if c in head}
+    return coerce_types(pd.read_csv(io.BytesIO(header + tail), dtype=dtype)), start + len(tail)
+
+
+# =========================
+# benchmark
+# =========================
+def _best_time(fn, repeats: int):
+    best, out = float("inf"), None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def _old_load(path) -> pd.DataFrame:
+    """What the scripts did before: parse the CSV, then coerce the numeric columns."""
+    df = pd.read_csv(path)
+    for col in NUMERIC:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def bench(data_path=BENCH_DATA, scales=BENCH_SCALES, repeats=BENCH_REPEATS) -> pd.DataFrame:
+    engine = parquet_engine()
+    if engine is None:
+        print("[WARN] No Parquet engine (pip install pyarrow); only the CSV loaders are measured")
+    base = pd.read_csv(data_path)
+    rng = np.random.default_rng(BENCH_SEED)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in scales:
+            csv_path = Path(tmp) / f"merged_x{scale}.csv"
+            # resampled rows, not back-to-back copies, so Parquet's compression is not flattered
+            df = base.iloc[rng.integers(0, len(base), len(base) * scale)].reset_index(drop=True)
+            df.to_csv(csv_path, index=False)
+            pq = save_table(df, csv_path, write_csv=False)
+            del df
+
+            loaders = {
+                "csv (read_csv + to_numeric)": lambda: _old_load(csv_path),
+                "csv typed (load_table)": lambda: load_table(csv_path, prefer_parquet=False),
+            }
+            if pq is not None:
+                loaders["parquet (load_table)"] = lambda: load_table(csv_path)
+
+            for name, fn in loaders.items():
+                seconds, out = _best_time(fn, repeats)
+                file_path = pq if name.startswith("parquet") else csv_path
+                rows.append({
+                    "scale": scale,
+                    "rows": len(out),
+                    "format": name,
+                    "file_mb": round(file_path.stat().st_size / 1024 ** 2, 2),
+                    "load_s": round(seconds, 4),
+                    "memory_mb": round(out.memory_usage(deep=True).sum() / 1024 ** 2, 2),
+                })
+                r = rows[-1]
+                print(f"[OK] x{scale:<4} {name:<32} {r['rows']:>8} rows | file {r['file_mb']:>8.2f} MB | "
+                      f"load {r['load_s']:>7.3f} s | in memory {r['memory_mb']:>8.2f} MB")
+    return pd.DataFrame(rows)
+
+
+def main(out: Optional[str] = None):
+    res = bench()
+    if out:
+        res.to_csv(out, index=False)
+        print(f"[OK] Saved -> {out}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Typed CSV / Parquet storage for the pipeline tables.")
+    ap.add_argument("--bench", action="store_true",
+                    help=f"compare CSV and Parquet load time / memory of {BENCH_DATA} at 1x, 10x, 100x")
+    ap.add_argument("--out", default=None, help="with --bench: also write the results to this CSV")
+    args = ap.parse_args()
+
+    if args.bench:
+        main(args.out)
+    else:
+        ap.print_help()
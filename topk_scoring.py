@@ -0,0 +1,213 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from flat_predictor import FlatHGBPredictor
+
+# Columns that describe the university, not the applicant
+UNI_FEATURES = ["institution_clean", "log_rank"]
+
+
+def norm(s: str) -> str:
+    return str(s).strip().lower()
+
+
+def output_columns_by_feature(pre) -> dict:
+    """
+    Maps every input feature of a fitted ColumnTransformer to the indices
+    of the output columns it produces (scaler / ordinal -> 1 column, one-hot -> 1 per category).
+    """
+    # sklearn is imported here so the flat-model serving path never loads it
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder
+
+    out = {}
+    for name, trans, cols in pre.transformers_:
+        if name == "remainder" or trans == "drop":
+            continue
+        start = pre.output_indices_[name].start
+        last = trans.steps[-1][1] if isinstance(trans, Pipeline) else trans
+
+        if isinstance(last, OneHotEncoder):
+            widths = [len(c) for c in last.categories_]
+        else:
+            widths = [1] * len(cols)
+
+        for col, w in zip(cols, widths):
+            out[col] = np.arange(start, start + w)
+            start += w
+    return out
+
+
+def placeholder_values(pre) -> dict:
+    """A value per input feature that the fitted transformers accept (first category / 0.0)."""
+    from sklearn.pipeline import Pipeline
+
+    out = {}
+    for name, trans, cols in pre.transformers_:
+        if name == "remainder" or trans == "drop":
+            continue
+        last = trans.steps[-1][1] if isinstance(trans, Pipeline) else trans
+        for j, col in enumerate(cols):
+            # one-hot and ordinal encoders both expose categories_
+            out[col] = last.categories_[j][0] if hasattr(last, "categories_") else 0.0
+    return out
+
+
+def top_k_indices(probs: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k largest probs, highest first. Ties, also at the k-th place,
+    go to the lower index (uni_table order), so equal scores always give the same list.
+    """
+    if int(k) < 1:
+        raise ValueError(f"k must be >= 1, got {k}")
+    k = min(int(k), len(probs))
+    kth = np.partition(probs, len(probs) - k)[len(probs) - k]
+    above = np.flatnonzero(probs > kth)
+    idx = np.concatenate([above, np.flatnonzero(probs == kth)[:k - len(above)]])
+    return idx[np.lexsort((idx, -probs[idx]))]
+
+
+class TopKScorer:
+    """
+    Scores one applicant against every university in uni_table.
+
+    The university-side block (one-hot institution columns, log_rank) is
+    transformed once here; per request only the applicant row is encoded and
+    broadcast into the precomputed matrix, then the model is called once.
+
+    `pipe` is either the sklearn Pipeline or a FlatHGBPredictor. save() /
+    load() keep the encoded block as .npy files, so a server can map it
+    instead of re-encoding uni_table.csv at startup.
+    """
+
+    def __init__(self, pipe, uni_table: pd.DataFrame):
+        self._bind(pipe)
+        if isinstance(pipe, FlatHGBPredictor):
+            cols = pipe.columns_by_feature()
+            placeholders = pipe.placeholder_values()
+        else:
+            pre = pipe.named_steps["preprocess"]
+            cols = output_columns_by_feature(pre)
+            placeholders = placeholder_values(pre)
+
+        uni = uni_table.copy()
+        uni["institution_clean"] = uni["institution_clean"].astype(str).map(norm)
+        if "log_rank" in self.features and "log_rank" not in uni.columns:
+            uni["log_rank"] = np.log(pd.to_numeric(uni["Rank2025"], errors="coerce").clip(lower=1))
+        uni = uni.drop_duplicates("institution_clean").reset_index(drop=True)
+        self.uni_table = uni
+        self.institutions = uni["institution_clean"].to_numpy()
+
+        uni_features = [c for c in self.features if c in UNI_FEATURES]
+        self.applicant_features = [c for c in self.features if c not in UNI_FEATURES]
+        self.applicant_cols = np.concatenate(
+            [cols[c] for c in self.applicant_features]
+        ) if self.applicant_features else np.array([], dtype=int)
+
+        # Applicant columns get overwritten per request, so any placeholder works here
+        template = self._applicant_frame(placeholders, len(uni))
+        for c in uni_features:
+            template[c] = uni[c].to_numpy()
+        self.uni_block = np.ascontiguousarray(self._transform(template), dtype=np.float64)
+        self._uni_first = {c: template[c].iloc[0] for c in uni_features}
+
+        self._applicant_cache = {}
+
+    def _bind(self, pipe):
+        if isinstance(pipe, FlatHGBPredictor):
+            self.features = list(pipe.features)
+            self._transform = pipe.transform
+            self._predict_proba = pipe.predict_proba_encoded
+        else:
+            pre = pipe.named_steps["preprocess"]
+            self.features = list(pre.feature_names_in_)
+            self._transform = lambda X: pre.transform(X[self.features])
+            self._predict_proba = pipe.steps[-1][1].predict_proba
+
+    def save(self, directory):
+        """Encoded university block, institutions and uni table columns as .npy files (+ meta.json)."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "uni_block.npy", self.uni_block)
+        np.save(directory / "institutions.npy", self.institutions.astype(str))
+        np.save(directory / "applicant_cols.npy", self.applicant_cols)
+        for c in self.uni_table.columns:
+            col = self.uni_table[c].to_numpy()
+            np.save(directory / f"col_{c}.npy", col.astype(str) if col.dtype == object else col)
+        meta = {
+            "features": self.features,
+            "applicant_features": self.applicant_features,
+            "uni_columns": list(self.uni_table.columns),
+            "uni_first": {c: v.item() if hasattr(v, "item") else v for c, v in self._uni_first.items()},
+        }
+        (directory / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    @classmethod
+    def load(cls, pipe, directory, mmap_mode="r"):
+        """Scorer from save() output; the block is memory-mapped, nothing is re-encoded."""
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        self = cls.__new__(cls)
+        self._bind(pipe)
+        if self.features != meta["features"]:
+            raise ValueError(f"{directory}: block was encoded for {meta['features']}, model has {self.features}")
+
+        self.uni_block = np.load(directory / "uni_block.npy", mmap_mode=mmap_mode)
+        self.institutions = np.load(directory / "institutions.npy", mmap_mode=mmap_mode)
+        self.applicant_features = meta["applicant_features"]
+        self.applicant_cols = np.load(directory / "applicant_cols.npy")
+        self.uni_table = pd.DataFrame({c: np.load(directory / f"col_{c}.npy") for c in meta["uni_columns"]})
+        self._uni_first = meta["uni_first"]
+        self._applicant_cache = {}
+        return self
+
+    def _applicant_frame(self, applicant: dict, n_rows: int = 1) -> pd.DataFrame:
+        data = {}
+        for c in self.applicant_features:
+            v = applicant.get(c, np.nan)
+            data[c] = [v] * n_rows
+        return pd.DataFrame(data)
+
+    def _applicant_vector(self, applicant: dict) -> np.ndarray:
+        key = tuple(applicant.get(c) for c in self.applicant_features)
+        vec = self._applicant_cache.get(key)
+        if vec is None:
+            X = self._applicant_frame(applicant)
+            for c, v in self._uni_first.items():
+                X[c] = v
+            vec = self._transform(X)[0, self.applicant_cols]
+            if len(self._applicant_cache) > 4096:
+                self._applicant_cache.clear()
+            self._applicant_cache[key] = vec
+        return vec
+
+    def score_all(self, applicant: dict) -> np.ndarray:
+        """P(accept) for every university, in the order of self.institutions."""
+        X = self.uni_block.copy()
+        X[:, self.applicant_cols] = self._applicant_vector(applicant)
+        return self._predict_proba(X)[:, 1]
+
+    def score_many(self, applicants: pd.DataFrame) -> np.ndarray:
+        """
+        score_all for many applicants in one model call: rows = applicants,
+        columns = universities (order of self.institutions).
+        """
+        X = applicants.reindex(columns=self.applicant_features).reset_index(drop=True)
+        for c, v in self._uni_first.items():
+            X[c] = v
+        vecs = self._transform(X)[:, self.applicant_cols]
+        block = np.repeat(self.uni_block[None], len(vecs), axis=0)
+        block[:, :, self.applicant_cols] = vecs[:, None, :]
+        probs = self._predict_proba(block.reshape(-1, block.shape[2]))[:, 1]
+        return probs.reshape(len(vecs), -1)
+
+    def top_k(self, applicant: dict, k: int = 10) -> pd.DataFrame:
+        probs = self.score_all(applicant)
+        idx = top_k_indices(probs, k)
+        return pd.DataFrame({
+            "institution_clean": self.institutions[idx],
+            "p_accept": probs[idx],
+        })
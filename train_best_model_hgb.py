@@ -1,82 +1,217 @@
+import hashlib
 import json
+import shutil
+import time
+from itertools import islice
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import pandas as pd
 import joblib
 
+import sklearn
 from sklearn.model_selection import train_test_split
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
 from sklearn.ensemble import HistGradientBoostingClassifier
 
+from flat_predictor import FlatHGBPredictor
+from feature_store import CATEGORICAL_FEATURES, NUMERIC_FEATURES, build_features, load_features
+from hgb_export import FLAT_NAME, MMAP_NAME, check_mmap_parity, check_parity, export_flat_model, export_mmap_model
+from hgb_search import successive_halving
+from model_versions import MODEL_ROOT, current_version, new_staging_dir, publish
+from prob_cube import build_cube
+from qs_store import attach_ranks, load_store
+from table_store import load_csv_tail
+
 RANDOM_STATE = 42
 
-def prepare_data(df: pd.DataFrame):
-    if "decision" not in df.columns:
-        raise ValueError("Expected 'decision' column.")
-
-    y = df["decision"].astype(str).str.lower().map({"accepted": 1, "rejected": 0})
-    mask = y.isin([0, 1])
-    df = df.loc[mask].copy()
-    y = y.loc[mask].astype(int)
-
-    feature_candidates = [
-        "gpa_raw", "gre_total", "log_rank", "is_international",
-        "institution_clean", "program", "term"
-    ]
-    features = [c for c in feature_candidates if c in df.columns]
-    if not features:
-        raise ValueError("No usable feature columns found.")
+# 'refresh': rows appended to the input since the live version
+MIN_NEW_ROWS = 50        # fewer usable new rows -> the live version stays
+WARM_EXTRA_ITER = 5      # trees added per warm-start refresh
+REFIT_GROWTH = 0.25      # rows added since the last full fit > this share of its rows -> full refit
+DRIFT_MAX = 0.5          # mean shift of a numeric feature, in training stds -> full refit
+UNSEEN_MAX = 0.2         # share of new rows from institutions the encoder never saw -> full refit
+LABEL_SHIFT_MAX = 0.15   # change of the acceptance rate -> full refit
+WARM_TOL = 1e-12         # existing trees must predict exactly as before the warm start
+# warm_start() swaps private HGB methods (_preprocess_X, _bin_data); only the
+# scikit-learn versions they were checked against warm start, others refit
+WARM_START_SKLEARN = ("1.8",)
+WARM_START_HOOKS = ("_preprocessor", "_bin_mapper", "_check_categories", "_preprocess_X", "_bin_data")
 
-    X = df[features].copy()
+BUILD_CUBE = True        # P(accept) over the app's whole input grid in every version (prob_cube.py)
 
-    for c in ["gpa_raw", "gre_total", "log_rank"]:
-        if c in X.columns:
-            X[c] = pd.to_numeric(X[c], errors="coerce")
+# "native": ordinal codes + HGB categorical_features (no rows x vocabulary matrix)
+# "dense":  one-hot as before (HGB does not accept sparse input)
+ENCODING = "native"
+MAX_NATIVE_CATEGORIES = 255  # HGB max_bins
 
-    if "is_international" in X.columns:
-        X["is_international"] = X["is_international"].astype(str).str.lower().map(
-            {"1": 1, "0": 0, "true": 1, "false": 0, "international": 1, "american": 0}
-        )
-        X["is_international"] = pd.to_numeric(X["is_international"], errors="coerce")
+def prepare_data(df: pd.DataFrame):
+    """feature_store frame -> (X, y, features); the same features serve.py expects."""
+    features = [c for c in NUMERIC_FEATURES + CATEGORICAL_FEATURES if c in df.columns]
+    if not features:
+        raise ValueError("No usable feature columns found.")
 
-    must_have = [c for c in ["gpa_raw", "gre_total", "log_rank"] if c in X.columns]
-    if must_have:
-        ok = X[must_have].notna().all(axis=1)
-        X = X.loc[ok].copy()
-        y = y.loc[ok].copy()
+    must_have = [c for c in ["gpa_raw", "gre_total", "log_rank"] if c in df.columns]
+    ok = df[must_have].notna().all(axis=1)
+    X = df.loc[ok, features].copy()
+    y = df.loc[ok, "y"].astype(int)
 
     return X, y, features
 
-def build_preprocessor(X: pd.DataFrame) -> ColumnTransformer:
+def build_preprocessor(X: pd.DataFrame, encoding: str = ENCODING) -> ColumnTransformer:
     numeric_features = [c for c in X.columns if c in ["gpa_raw", "gre_total", "log_rank", "is_international"]]
     categorical_features = [c for c in X.columns if c not in numeric_features]
 
-    ohe = OneHotEncoder(handle_unknown="ignore", sparse_output=False)
+    if encoding == "native":
+        enc = ("ord", OrdinalEncoder(
+            handle_unknown="use_encoded_value", unknown_value=-1,
+            max_categories=MAX_NATIVE_CATEGORIES
+        ))
+    elif encoding == "dense":
+        enc = ("ohe", OneHotEncoder(handle_unknown="ignore", sparse_output=False))
+    else:
+        raise ValueError(f"Unknown encoding: {encoding!r}")
 
     return ColumnTransformer(
         transformers=[
             ("num", Pipeline([("scaler", StandardScaler())]), numeric_features),
-            ("cat", Pipeline([("ohe", ohe)]), categorical_features),
+            ("cat", Pipeline([enc]), categorical_features),
         ],
         remainder="drop"
     )
 
-def main(
+def categorical_indices(pre: ColumnTransformer) -> list:
+    """Output positions of the categorical block, for HGB(categorical_features=...)."""
+    n_num = len(pre.transformers[0][2])
+    return list(range(n_num, n_num + len(pre.transformers[1][2])))
+
+def load_info(out_dir) -> dict:
+    path = Path(out_dir) / "model_info.json"
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+def search(
     input_path="merged_matched_only.csv",
     out_dir="saved_model_hgb"
 ):
+    """Tunes HGB with cached successive halving and stores the best config in model_info.json."""
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    df = pd.read_csv(input_path)
+    df = load_features(input_path)
     X, y, features = prepare_data(df)
 
-    preprocessor = build_preprocessor(X)
+    result = successive_halving(X, y, build_preprocessor, categorical_indices, ENCODING, RANDOM_STATE)
+
+    info = load_info(out_dir)
+    info["hgb_params"] = result.pop("params")
+    info["search"] = result
+    (out_dir / "model_info.json").write_text(json.dumps(info, indent=2), encoding="utf-8")
+
+    print(f"[OK] Best params: {info['hgb_params']} | CV ROC-AUC={result['cv_roc_auc']:.4f}")
+    print(f"[OK] Cache: {result['cache']}")
+    print(f"[OK] Saved -> {out_dir / 'model_info.json'} (run 'train' to use it)")
+
+def prefix_hash(path, n_bytes: int) -> str:
+    """sha1 of the first n_bytes of a file (tells an append from a rewrite)."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        remaining = n_bytes
+        while remaining > 0:
+            block = f.read(min(1 << 20, remaining))
+            if not block:
+                break
+            h.update(block)
+            remaining -= len(block)
+    return h.hexdigest()[:16]
+
+def data_stats(X: pd.DataFrame, y: pd.Series) -> dict:
+    num = [c for c in NUMERIC_FEATURES if c in X.columns]
+    return {
+        "mean": {c: float(X[c].mean()) for c in num},
+        "std": {c: float(X[c].std()) for c in num},
+        "label_rate": float(y.mean()),
+    }
+
+def build_uni_table(df: pd.DataFrame, prev: Optional[pd.DataFrame] = None, store=None) -> pd.DataFrame:
+    """
+    One row per institution, sorted by name, ranked as of the newest QS year:
+    the `store` rank for that year (qs_store.attach_ranks) where the store has
+    the institution, else its row with the latest qs_year (rows without one
+    rank below every year). With `prev`, its rows compete with the new ones,
+    so the result is the same as a rebuild on all rows.
+    """
+    cols = ["institution_clean"]
+    for c in ("log_rank", "Rank2025", "qs_year"):
+        if c in df.columns: cols.append(c)
+
+    table = df[cols].dropna(subset=["institution_clean"])
+    table = table.astype({"institution_clean": str})
+    if prev is not None:
+        table = pd.concat([prev.astype({"institution_clean": str}), table], ignore_index=True)
+    # full sort key: rows of one institution and year agree, but any tie is still broken the same way
+    table = table.sort_values(cols, na_position="first", kind="stable")
+    table = table.drop_duplicates("institution_clean", keep="last").reset_index(drop=True)
+
+    if store is not None and "log_rank" in table.columns:
+        newest = int(store["year"].max())
+        hit = attach_ranks(table.assign(term=f"Fall {newest}"), store, lag=0, fallback_forward=False)
+        ok = hit["rank_asof"].notna().to_numpy()
+        table.loc[ok, "log_rank"] = np.log(hit.loc[ok, "rank_asof"].clip(lower=1))
+        table.loc[ok, "qs_year"] = hit.loc[ok, "qs_year"]
+    return table
+
+def check_uni_table(df: pd.DataFrame, table: pd.DataFrame, store=None, seed=RANDOM_STATE):
+    """Raises if the uni table of a shuffled `df` differs from `table`."""
+    shuffled = df.sample(frac=1.0, random_state=seed)
+    pd.testing.assert_frame_equal(build_uni_table(shuffled, store=store), table)
+
+def write_version(pipe, X, uni_table, info, root):
+    """Writes every artifact into a staging dir, then publishes it as the next version."""
+    staging = new_staging_dir(root)
+    try:
+        joblib.dump(pipe, staging / "best_model_hgb.joblib")
+
+        # flat NumPy copy for the serving path (no sklearn needed to load it)
+        flat_path = export_flat_model(pipe, staging / FLAT_NAME)
+        parity_err = check_parity(pipe, FlatHGBPredictor.load(flat_path), X)
+
+        # same arrays as uncompressed .npy files (+ the encoded Top-K block) for mmap loading
+        mmap_path = export_mmap_model(pipe, uni_table, staging / MMAP_NAME)
+        parity_err = max(parity_err, check_mmap_parity(pipe, mmap_path, uni_table, X))
+
+        uni_table.to_csv(staging / "uni_table.csv", index=False)
+        (staging / "model_info.json").write_text(json.dumps(info, indent=2), encoding="utf-8")
+        if BUILD_CUBE:
+            build_cube(staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return publish(staging, root), parity_err
+
+def main(
+    input_path="merged_matched_only.csv",
+    out_dir=MODEL_ROOT
+):
+    """Full fit on input_path, published as a new version under out_dir."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    n_bytes = Path(input_path).stat().st_size
+    df = load_features(input_path)
+    X, y, features = prepare_data(df)
+
+    preprocessor = build_preprocessor(X, ENCODING)
+
+    # tuned config from a previous 'search' run, if any
+    prev_info = load_info(out_dir)
+    hgb_params = prev_info.get("hgb_params", {})
 
-    model = HistGradientBoostingClassifier(random_state=RANDOM_STATE)
+    model = HistGradientBoostingClassifier(random_state=RANDOM_STATE, **hgb_params)
+    if ENCODING == "native":
+        model.set_params(categorical_features=categorical_indices(preprocessor))
     pipe = Pipeline(steps=[
         ("preprocess", preprocessor),
         ("model", model),
@@ -84,27 +219,224 @@ def main(
 
     pipe.fit(X, y)
 
-    joblib.dump(pipe, out_dir / "best_model_hgb.joblib")
-
-    
-    cols = ["institution_clean"]
-    if "log_rank" in df.columns: cols.append("log_rank")
-    if "Rank2025" in df.columns: cols.append("Rank2025")
-
-    uni_table = df[cols].dropna(subset=["institution_clean"]).drop_duplicates("institution_clean")
-    uni_table.to_csv(out_dir / "uni_table.csv", index=False)
-
     info = {
         "features": features,
         "n_rows_used": int(len(X)),
         "target_mapping": {"accepted": 1, "rejected": 0},
         "model": "HistGradientBoostingClassifier",
+        "encoding": ENCODING,
+    }
+    if hgb_params:
+        info["hgb_params"] = hgb_params
+        info["search"] = prev_info.get("search")
+    # what 'refresh' needs to read only the rows appended after this fit
+    info["data"] = {
+        "path": str(input_path),
+        "bytes": n_bytes,
+        "sha1": prefix_hash(input_path, n_bytes),
+        "rows": int(len(X)),
+        "base_rows": int(len(X)),
+        **data_stats(X, y),
+    }
+    info["lineage"] = {
+        "mode": "full",
+        "parent": current_version(out_dir),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "n_iter": int(model.n_iter_),
     }
-    (out_dir / "model_info.json").write_text(json.dumps(info, indent=2), encoding="utf-8")
 
-    print(f"[OK] Saved model -> {out_dir/'best_model_hgb.joblib'}")
-    print(f"[OK] Saved uni table -> {out_dir/'uni_table.csv'}")
+    store = load_store()
+    uni_table = build_uni_table(df, store=store)
+    check_uni_table(df, uni_table, store)
+    version_dir, parity_err = write_version(pipe, X, uni_table, info, out_dir)
+
+    print(f"[OK] Saved model -> {version_dir/'best_model_hgb.joblib'} (live: {out_dir/'CURRENT'} -> {version_dir.name})")
+    print(f"[OK] Saved flat model -> {version_dir/FLAT_NAME} + {MMAP_NAME}/ (parity max |diff| = {parity_err:.2e})")
+    print(f"[OK] Saved uni table -> {version_dir/'uni_table.csv'} "
+          f"({len(uni_table)} institutions, ranked as of QS "
+          f"{'store ' + str(int(store['year'].max())) if store is not None else 'latest qs_year'}, "
+          "same for any row order)")
     print(f"[OK] Rows used: {len(X)} | Features: {features}")
+    print(f"[OK] HGB params: {hgb_params or 'sklearn defaults'}")
+
+def refit_reason(pipe, X_new: pd.DataFrame, y_new: pd.Series, data: dict) -> Optional[str]:
+    """Why the new rows need a full refit instead of a warm start (None: warm start is fine)."""
+    grown = data["rows"] - data["base_rows"] + len(X_new)
+    if grown > REFIT_GROWTH * data["base_rows"]:
+        return f"{grown} rows added since the last full fit (> {REFIT_GROWTH:.0%} of {data['base_rows']})"
+
+    for col, mean in data["mean"].items():
+        std = data["std"][col] if data["std"][col] > 0 else 1.0
+        shift = abs(float(X_new[col].mean()) - mean) / std
+        if shift > DRIFT_MAX:
+            return f"{col} mean shifted by {shift:.2f} std (> {DRIFT_MAX})"
+
+    cat = pipe.named_steps["preprocess"].named_transformers_["cat"]
+    cat_cols = list(pipe.named_steps["preprocess"].transformers_[1][2])
+    if "institution_clean" in cat_cols:
+        known = cat[-1].categories_[cat_cols.index("institution_clean")]
+        inst = X_new["institution_clean"].dropna().astype(str)
+        unseen = float((~inst.isin(known)).mean()) if len(inst) else 0.0
+        if unseen > UNSEEN_MAX:
+            return f"{unseen:.0%} of the new rows are from institutions the model has not seen (> {UNSEEN_MAX:.0%})"
+
+    label_shift = abs(float(y_new.mean()) - data["label_rate"])
+    if label_shift > LABEL_SHIFT_MAX:
+        return f"acceptance rate shifted by {label_shift:.2f} (> {LABEL_SHIFT_MAX})"
+    return None
+
+def warm_start_unsupported(pipe: Pipeline) -> Optional[str]:
+    """Why warm_start() cannot run on this scikit-learn / model (None: it can)."""
+    version = ".".join(sklearn.__version__.split(".")[:2])
+    if version not in WARM_START_SKLEARN:
+        return f"warm start not verified for scikit-learn {sklearn.__version__} (checked: {', '.join(WARM_START_SKLEARN)})"
+    model = pipe.named_steps["model"]
+    missing = [a for a in WARM_START_HOOKS if not hasattr(model, a)]
+    if missing:
+        return f"HistGradientBoostingClassifier has no {', '.join(missing)} in scikit-learn {sklearn.__version__}"
+    return None
+
+def warm_start(pipe: Pipeline, X_new: pd.DataFrame, y_new: pd.Series, extra_iter: int = WARM_EXTRA_ITER) -> float:
+    """
+    Adds `extra_iter` trees fitted on the new rows to the pipeline's HGB, in place.
+
+    Nothing that maps features to tree inputs is refitted: the preprocessor
+    only transforms, and the HGB keeps its own category encoder and bin
+    thresholds (fit() would rebuild both from the new rows, and the existing
+    trees would then be scored on other codes / bins). Returns the max change
+    of the existing trees' predictions, which must be 0.
+    """
+    A = pipe.named_steps["preprocess"].transform(X_new)
+    model = pipe.named_steps["model"]
+    n_old = model.n_iter_
+    p_old = model.predict_proba(A)[:, 1]
+
+    encoder, mapper = model._preprocessor, model._bin_mapper
+
+    def preprocess_X(X, *, reset):
+        X = encoder.transform(X)
+        return (X, model._check_categories()) if reset else X
+
+    def bin_data(X, is_training_data):
+        model._bin_mapper = mapper
+        return mapper.transform(X)
+
+    early_stopping = model.early_stopping
+    if encoder is not None:
+        model._preprocess_X = preprocess_X
+    model._bin_data = bin_data
+    model.set_params(warm_start=True, max_iter=n_old + extra_iter, early_stopping=False)
+    try:
+        model.fit(A, y_new)
+    finally:
+        vars(model).pop("_preprocess_X", None)
+        vars(model).pop("_bin_data", None)
+        model.set_params(warm_start=False, early_stopping=early_stopping)
+
+    p_kept = next(islice(model.staged_predict_proba(A), n_old - 1, None))[:, 1]
+    err = float(np.max(np.abs(p_kept - p_old))) if len(A) else 0.0
+    if err > WARM_TOL:
+        raise AssertionError(f"Warm start changed the existing trees' predictions by {err:.3e}")
+    return err
+
+def refresh(
+    input_path="merged_matched_only.csv",
+    out_dir=MODEL_ROOT
+):
+    """
+    Brings the live model up to date with the rows appended to input_path since
+    it was trained: a warm start on those rows only, or a full refit when the
+    file was rewritten, has grown past REFIT_GROWTH or the new rows drift.
+    """
+    out_dir = Path(out_dir)
+    live = current_version(out_dir)
+    info = load_info(out_dir / live) if live else {}
+    data = info.get("data")
+    n_bytes = Path(input_path).stat().st_size
+
+    reason = None
+    if not data:
+        reason = "no versioned model trained on a known file yet"
+    elif Path(data["path"]).resolve() != Path(input_path).resolve():
+        reason = f"{live} was trained on {data['path']}"
+    elif n_bytes < data["bytes"] or prefix_hash(input_path, data["bytes"]) != data["sha1"]:
+        reason = f"{input_path} was rewritten, not appended to"
+    elif load_info(out_dir).get("hgb_params", {}) != info.get("hgb_params", {}):
+        reason = "tuned HGB params changed since the last full fit"
+    if reason:
+        print(f"[INFO] Full refit: {reason}")
+        return main(input_path, out_dir)
+
+    if n_bytes == data["bytes"]:
+        print(f"[OK] No rows appended to {input_path} since {live}; nothing to do")
+        return
+
+    t0 = time.perf_counter()
+    rows, end = load_csv_tail(input_path, data["bytes"])
+    new = build_features(rows)
+    X_new, y_new, features = prepare_data(new)
+    if features != info["features"]:
+        print(f"[INFO] Full refit: feature columns changed ({info['features']} -> {features})")
+        return main(input_path, out_dir)
+    if len(X_new) < MIN_NEW_ROWS:
+        print(f"[INFO] {len(X_new)} new usable rows (< MIN_NEW_ROWS={MIN_NEW_ROWS}); {live} stays live")
+        return
+
+    pipe = joblib.load(out_dir / live / "best_model_hgb.joblib")
+    reason = warm_start_unsupported(pipe) or refit_reason(pipe, X_new, y_new, data)
+    if reason:
+        print(f"[INFO] Full refit: {reason}")
+        return main(input_path, out_dir)
+
+    print(f"[INFO] Warm start: {len(X_new)} new rows, scikit-learn {sklearn.__version__}")
+    n_old = int(pipe.named_steps["model"].n_iter_)
+    try:
+        kept_err = warm_start(pipe, X_new, y_new)
+    except (AttributeError, TypeError, AssertionError) as e:
+        # the private hooks changed shape, or the existing trees moved
+        print(f"[WARN] Warm start failed ({type(e).__name__}: {e})")
+        print("[INFO] Full refit: warm start failed")
+        return main(input_path, out_dir)
+    t_fit = time.perf_counter() - t0
+
+    uni_table = build_uni_table(new, pd.read_csv(out_dir / live / "uni_table.csv", float_precision="round_trip"),
+                                store=load_store())
+    info["n_rows_used"] = int(info["n_rows_used"] + len(X_new))
+    info["data"].update({
+        "bytes": end,
+        "sha1": prefix_hash(input_path, end),
+        "rows": int(data["rows"] + len(X_new)),
+    })
+    info["lineage"] = {
+        "mode": "warm",
+        "parent": live,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "n_iter": int(pipe.named_steps["model"].n_iter_),
+        "new_rows": int(len(X_new)),
+        "sklearn": sklearn.__version__,
+    }
+
+    version_dir, parity_err = write_version(pipe, X_new, uni_table, info, out_dir)
+
+    print(f"[OK] Warm start on {len(X_new)} new rows: {n_old} -> {info['lineage']['n_iter']} trees "
+          f"in {t_fit:.2f} s (existing trees unchanged, max |diff| = {kept_err:.1e})")
+    print(f"[OK] Saved -> {version_dir} (live: {out_dir/'CURRENT'} -> {version_dir.name}, "
+          f"flat parity {parity_err:.2e})")
+    print(f"[OK] Rows since the last full fit: {info['data']['rows'] - info['data']['base_rows']} "
+          f"/ {info['data']['base_rows']} (full refit above {REFIT_GROWTH:.0%})")
 
 if __name__ == "__main__":
-    main()
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Train (or tune) the production HGB model.")
+    ap.add_argument("command", nargs="?", default="train", choices=["train", "search", "refresh"])
+    ap.add_argument("--input", default="merged_matched_only.csv")
+    ap.add_argument("--out-dir", default=str(MODEL_ROOT))
+    args = ap.parse_args()
+
+    if args.command == "search":
+        search(args.input, args.out_dir)
+    elif args.command == "refresh":
+        refresh(args.input, args.out_dir)
+    else:
+        main(args.input, args.out_dir)